@@ -123,26 +123,20 @@ if [[ ${flag_run_status} == 0 ]]; then
 
     file_log=add_attribute_2d_3d_nc.${cycle}
     
-    rm -f $DATA/mpmdscript_add_attr
-
-    echo "${USHstofs3d}/${fn_ush_script_attr} 1 > $DATA/${file_log}_1 " >> $DATA/mpmdscript_add_attr
-    echo "${USHstofs3d}/${fn_ush_script_attr} 2 > $DATA/${file_log}_2 " >> $DATA/mpmdscript_add_attr
-    echo "${USHstofs3d}/${fn_ush_script_attr} 3 > $DATA/${file_log}_3 " >> $DATA/mpmdscript_add_attr
-#    echo "${USHstofs3d}/${fn_ush_script_attr} 4 > $DATA/${file_log}_4 " >> $DATA/mpmdscript_add_attr
-#    echo "${USHstofs3d}/${fn_ush_script_attr} 5 > $DATA/${file_log}_5 " >> $DATA/mpmdscript_add_attr
-#    echo "${USHstofs3d}/${fn_ush_script_attr} 6 > $DATA/${file_log}_6 " >> $DATA/mpmdscript_add_attr
-#    echo "${USHstofs3d}/${fn_ush_script_attr} 7 > $DATA/${file_log}_7 " >> $DATA/mpmdscript_add_attr
-#    echo "${USHstofs3d}/${fn_ush_script_attr} 8 > $DATA/${file_log}_8 " >> $DATA/mpmdscript_add_attr
-#    echo "${USHstofs3d}/${fn_ush_script_attr} 9 > $DATA/${file_log}_9 " >> $DATA/mpmdscript_add_attr
-#    echo "${USHstofs3d}/${fn_ush_script_attr} 10 > $DATA/${file_log}_10 " >> $DATA/mpmdscript_add_attr
-
-    chmod 775 $DATA/mpmdscript_add_attr
-    export MP_PGMMODEL=mpmd
-#    mpiexec --oversubscribe -np 10 cfp $DATA/mpmdscript_add_attr
-    $DATA/mpmdscript_add_attr
-
-
-    export err=$?
+    # The three passes are independent and run at the same time, each with
+    # its own log. Under `stofs post` the add_attr task of
+    # examples/config_schism_post_python.yaml (policy: mpmd) runs them through
+    # mpiexec cfp instead.
+    pids_attr=()
+    for k_pass in 1 2 3; do
+        ${USHstofs3d}/${fn_ush_script_attr} ${k_pass} > $DATA/${file_log}_${k_pass} 2>&1 &
+        pids_attr+=($!)
+    done
+
+    export err=0
+    for pid_attr in ${pids_attr[@]}; do
+        wait ${pid_attr} || err=$?
+    done
     if [ $err -ne 0 ];
     then
        msg=" Execution of $pgm did not complete normally, WARNING"
@@ -0,0 +1,271 @@
+import os
+import sys
+from datetime import datetime, timedelta
+from typing import Optional
+
+from .execution_policy import ExecutionMode
+from .model_factory import model_factory
+from .script_runner import ProcessSupervisor
+from .stofs_config import StofsConfig
+from .stofs_logger import get_stofs_logger
+from .stofs_schema import STAGE_NAMES
+from .stofs_task import StofsTask
+from .task_graph import TaskGraph
+
+log = get_stofs_logger()
+
+# The stages of a cycle, in the order they run
+STAGE_ORDER = STAGE_NAMES
+
+# The stages which run the model itself, and so write the hotstart file of the next cycle
+MODEL_RUN_STAGES = ["nowcast", "forecast"]
+
+CYCLE_FORMAT = "%Y%m%d%H"
+
+
+def cycle_range(start: str, end: str, interval: float = 24.0) -> list[str]:
+    """
+    List the cycles from start to end inclusive.
+
+    Args:
+        start (str): The first cycle as YYYYMMDDHH.
+        end (str): The last cycle as YYYYMMDDHH.
+        interval (float): The time between cycles in hours. Defaults to 24.
+
+    Returns:
+        list[str]: The cycles as YYYYMMDDHH.
+    """
+    try:
+        first = datetime.strptime(start, CYCLE_FORMAT)
+        last = datetime.strptime(end, CYCLE_FORMAT)
+    except ValueError:
+        msg = f"Cycles must be given as YYYYMMDDHH, got {start} and {end}"
+        raise ValueError(msg) from None
+    if last < first:
+        msg = f"The last cycle {end} is before the first cycle {start}"
+        raise ValueError(msg)
+    if interval <= 0:
+        msg = f"The cycle interval must be positive, got {interval}"
+        raise ValueError(msg)
+
+    cycles = []
+    cycle = first
+    while cycle <= last:
+        cycles.append(cycle.strftime(CYCLE_FORMAT))
+        cycle += timedelta(hours=interval)
+    return cycles
+
+
+def node_name(stage: str, cycle: str) -> str:
+    """
+    Get the name of the graph node which runs a stage of a cycle.
+
+    Args:
+        stage (str): The name of the stage.
+        cycle (str): The cycle as YYYYMMDDHH.
+
+    Returns:
+        str: The node name, <stage>@<cycle>.
+    """
+    return f"{stage}@{cycle}"
+
+
+class Backfill:
+    """
+    Class which runs a range of consecutive cycles as one pipeline.
+
+    Every stage of every cycle is a node of a dependency graph, and is run as
+    its own `stofs <stage>` process with PDY and cyc set for its cycle. The
+    stages of a cycle run in order, and the only dependency between cycles is
+    the hotstart chain: the hotstart_to stage of a cycle waits for the
+    hotstart_from stage of the cycle before it. Everything else overlaps, so
+    the preparation of the next cycle runs while the model runs the current
+    one, and the post-processing of a cycle runs while the model runs the
+    next one. A range of cycles then takes about as long as its model runs.
+
+    Since cycles overlap, each cycle gets its own working directory in DATA,
+    shared by its stages as in an operational run, and each stage its own
+    jobid.
+    """
+
+    def __init__(
+        self,
+        config_file: str,
+        cycles: list[str],
+        *,
+        stages: Optional[list[str]] = None,
+        hotstart_from: Optional[str] = None,
+        hotstart_to: Optional[str] = None,
+        stage_arguments: Optional[list[str]] = None,
+    ) -> None:
+        """
+        Initialize the Backfill.
+
+        Args:
+            config_file (str): The configuration file of the workflow.
+            cycles (list[str]): The cycles to run, in order.
+            stages (list[str], optional): The stages to run, defaults to every
+                stage which has scripts or configured tasks.
+            hotstart_from (str, optional): The stage which writes the hotstart file for
+                the next cycle, defaults to the first model run stage which is run.
+            hotstart_to (str, optional): The stage which reads the hotstart file of the
+                previous cycle, defaults to hotstart_from.
+            stage_arguments (list[str], optional): Extra arguments passed to each stage,
+                i.e. ["--jobs", "4", "--resume"].
+        """
+        self.__config_file = os.path.abspath(config_file)
+        self.__config = StofsConfig(config_file=config_file)
+        self.__cycles = cycles
+        if stages is None:
+            stages = self.__stages_with_work(self.__config)
+        for stage in stages:
+            if stage not in STAGE_ORDER:
+                msg = f"Unknown stage {stage}"
+                raise ValueError(msg)
+        self.__stages = sorted(stages, key=STAGE_ORDER.index)
+        if not self.__stages:
+            msg = "There are no stages to run"
+            raise ValueError(msg)
+
+        if hotstart_from is None:
+            hotstart_from = next(
+                (stage for stage in self.__stages if stage in MODEL_RUN_STAGES),
+                self.__stages[0],
+            )
+        self.__hotstart_from = hotstart_from
+        self.__hotstart_to = hotstart_to if hotstart_to is not None else hotstart_from
+        for stage in (self.__hotstart_from, self.__hotstart_to):
+            if stage not in self.__stages:
+                msg = f"The hotstart stage {stage} is not one of the stages being run"
+                raise ValueError(msg)
+        self.__stage_arguments = stage_arguments if stage_arguments is not None else []
+
+    def graph(self) -> TaskGraph:
+        """
+        Build the dependency graph of the stages of every cycle.
+
+        Returns:
+            TaskGraph: The graph, with one node for each stage of each cycle.
+        """
+        tasks = []
+        for index, cycle in enumerate(self.__cycles):
+            for position, stage in enumerate(self.__stages):
+                depends_on = []
+                if position > 0:
+                    depends_on.append(node_name(self.__stages[position - 1], cycle))
+                if stage == self.__hotstart_to and index > 0:
+                    depends_on.append(
+                        node_name(self.__hotstart_from, self.__cycles[index - 1])
+                    )
+                tasks.append(
+                    StofsTask(
+                        node_name(stage, cycle),
+                        ExecutionMode.LEGACY,
+                        [stage],
+                        depends_on=depends_on,
+                    )
+                )
+        return TaskGraph(tasks)
+
+    def run(self, jobs: int = 2) -> None:
+        """
+        Run every stage of every cycle, with up to jobs stages running at once.
+
+        Args:
+            jobs (int): The maximum number of stages to run concurrently. Defaults to 2.
+        """
+        graph = self.graph()
+        # Each stage counts as one unit, so the hotstart chain, which is the
+        # longest chain of the graph, is always started first
+        estimates = {task.name(): 1.0 for task in graph.tasks()}
+        log.info(
+            f"Running {len(self.__stages)} stages of {len(self.__cycles)} cycles "
+            f"({self.__cycles[0]} to {self.__cycles[-1]}), hotstart chain "
+            f"{self.__hotstart_from} -> {self.__hotstart_to}"
+        )
+        graph.execute(self.__run_node, jobs=jobs, estimates=estimates)
+
+    def environment(self, cycle: str, stage: str) -> dict[str, str]:
+        """
+        Get the environment a stage of a cycle runs with.
+
+        The working directory is $DATAROOT/<name>.<cycle> (or data/<name>.<cycle>
+        in the state directory without DATAROOT), replacing any exported DATA,
+        which would otherwise be shared by the cycles running at once.
+
+        Args:
+            cycle (str): The cycle as YYYYMMDDHH.
+            stage (str): The name of the stage.
+
+        Returns:
+            dict[str, str]: The environment of the workflow with PDY, cyc, DATA and jobid set.
+        """
+        data_root = os.environ.get(
+            "DATAROOT", os.path.join(self.__config.state_directory, "data")
+        )
+        environment = dict(os.environ)
+        environment["PDY"] = cycle[:8]
+        environment["cyc"] = cycle[8:]
+        environment["DATA"] = os.path.join(
+            data_root, f"{self.__config.model_name}.{cycle}"
+        )
+        environment["jobid"] = f"{self.__config.model_name}_{stage}.{cycle}"
+        return environment
+
+    def __run_node(self, task: StofsTask) -> None:
+        """
+        Run one stage of one cycle as a separate workflow process.
+
+        Args:
+            task (StofsTask): The graph node, named <stage>@<cycle>.
+        """
+        stage, _, cycle = task.name().partition("@")
+        command = [
+            sys.executable,
+            "-m",
+            "StofsWorkflow.cli",
+            stage.replace("_", "-"),
+            "--config",
+            self.__config_file,
+            "--cycle",
+            cycle,
+            *self.__stage_arguments,
+        ]
+        environment = self.environment(cycle, stage)
+        log_file = os.path.join(
+            self.__config.state_directory, "logs", "backfill", f"{cycle}.{stage}.log"
+        )
+        os.makedirs(environment["DATA"], exist_ok=True)
+        log.info(f"Running {stage} for cycle {cycle}, output in {log_file}")
+        supervisor = ProcessSupervisor(command, log_file, environment=environment)
+        exit_code = supervisor.run()
+        if exit_code != 0:
+            log.error(
+                f"{stage} for cycle {cycle} failed with return code {exit_code}, "
+                f"last lines of {log_file}:\n" + "\n".join(supervisor.tail())
+            )
+            msg = f"{stage} for cycle {cycle} failed with return code {exit_code}"
+            raise RuntimeError(msg)
+        log.info(
+            f"{stage} for cycle {cycle} finished in "
+            f"{supervisor.resource_usage().wall_time:.1f}s"
+        )
+
+    @staticmethod
+    def __stages_with_work(config: StofsConfig) -> list[str]:
+        """
+        Find the stages which have scripts or configured tasks.
+
+        Args:
+            config (StofsConfig): The workflow configuration.
+
+        Returns:
+            list[str]: The names of the stages, in order.
+        """
+        task_list = type(model_factory(config)).TASK_LIST
+        return [
+            stage
+            for stage in STAGE_ORDER
+            if config.stage_tasks.get(stage)
+            or task_list[stage].legacy_task_list() is not None
+        ]
@@ -0,0 +1,241 @@
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from typing import Optional
+
+from .execution_policy import ExecutionMode
+from .model_factory import model_factory
+from .resources import ResourcePool, ResourceRequest
+from .stofs_config import StofsConfig
+from .stofs_logger import get_stofs_logger
+from .stofs_model import StofsModel
+from .stofs_run_options import StofsRunOptions
+from .stofs_task import StofsTask
+from .task_graph import TaskGraph
+
+log = get_stofs_logger()
+
+
+class Batch:
+    """
+    Class which runs a stage of several workflow configurations together,
+    i.e. the members of an ensemble, or ADCIRC and SCHISM side by side.
+
+    The task graphs of the members are merged into one graph, run by one
+    scheduler on one pool of node resources, and members with the same Python
+    settings share one pool of warm workers. A task is identified by what it
+    runs, the files it reads and writes, and the identity of the tasks it
+    depends on. Tasks of different members with the same identity, i.e. the
+    same GFS sflux build, are run once, and the copies in the other members
+    are recorded as completed once it has succeeded. Only tasks which declare
+    their outputs are shared, since two tasks which write the same outputs
+    cannot both run anyway.
+
+    Each member keeps its own run state, metrics and trace, so a member can
+    later be resumed on its own, and so the members must not share a state
+    directory. Tasks are named <member>/<task> in the log.
+    """
+
+    def __init__(
+        self,
+        config_files: list[str],
+        stage: str,
+        options: Optional[StofsRunOptions] = None,
+    ) -> None:
+        """
+        Initialize the Batch.
+
+        Args:
+            config_files (list[str]): The configuration files of the members.
+            stage (str): The name of the stage to run.
+            options (StofsRunOptions, optional): The run options shared by every member.
+        """
+        self.__options = options if options is not None else StofsRunOptions()
+        self.__stage = stage
+        self.__models: dict[str, StofsModel] = {}
+        for config_file in config_files:
+            name = os.path.splitext(os.path.basename(config_file))[0]
+            if name in self.__models:
+                name = f"{name}.{len(self.__models)}"
+            config = StofsConfig(config_file=config_file)
+            self.__models[name] = model_factory(config, self.__options)
+        if not self.__models:
+            msg = "A batch needs at least one configuration"
+            raise ValueError(msg)
+        self.__check_state_directories()
+        self.__share_python_pools()
+        self.__resource_pool = ResourcePool(
+            next(iter(self.__models.values())).config().node
+        )
+        for model in self.__models.values():
+            model._share_resource_pool(self.__resource_pool)
+
+    def members(self) -> list[str]:
+        """
+        Get the names of the members, which are the names of their configuration files.
+
+        Returns:
+            list[str]: The member names.
+        """
+        return list(self.__models)
+
+    def run(self) -> None:
+        """
+        Run the stage for every member.
+        """
+        for name, model in self.__models.items():
+            if model._backend() != "local":
+                msg = f"A batch runs on the local backend only, {name} uses {model._backend()}"
+                raise ValueError(msg)
+
+        with ExitStack() as stack:
+            graphs = {}
+            estimates: dict[str, float] = {}
+            for name, model in self.__models.items():
+                stage_task = type(model).TASK_LIST[self.__stage]
+                graph, member_estimates, _ = stack.enter_context(
+                    model._stage(stage_task)
+                )
+                graphs[name] = graph
+                estimates.update(
+                    {
+                        f"{name}/{task}": duration
+                        for task, duration in member_estimates.items()
+                    }
+                )
+
+            with ThreadPoolExecutor(max_workers=len(self.__models)) as pool:
+                for future in [
+                    pool.submit(model._prepare_stage)
+                    for model in self.__models.values()
+                ]:
+                    future.result()
+
+            graph, runners = self.__merge(graphs)
+            graph.execute(
+                lambda node: runners[node.name()][0](),
+                jobs=self.__options.jobs,
+                estimates=estimates,
+                resource_pool=self.__resource_pool,
+                resources=lambda node: runners[node.name()][1],
+            )
+
+    def __merge(self, graphs: dict[str, TaskGraph]) -> tuple[TaskGraph, dict]:
+        """
+        Merge the graphs of the members, running tasks with the same identity once.
+
+        Args:
+            graphs (dict[str, TaskGraph]): The graph of each member.
+
+        Returns:
+            tuple[TaskGraph, dict]: The merged graph, and for each of its nodes
+                the function which runs it and the resources it holds.
+        """
+        nodes = []
+        runners = {}
+        owners: dict[str, str] = {}
+        shared = 0
+        for name, member_graph in graphs.items():
+            model = self.__models[name]
+            keys: dict[str, str] = {}
+            for task in member_graph.tasks():
+                node = f"{name}/{task.name()}"
+                depends_on = [
+                    f"{name}/{dependency}" for dependency in task.depends_on()
+                ]
+                keys[task.name()] = self.__task_key(model, task, node, keys)
+                owner = owners.setdefault(keys[task.name()], node)
+                if owner == node:
+                    runners[node] = (
+                        lambda model=model, task=task: model._run_and_record(task),
+                        model._resource_request(task),
+                    )
+                else:
+                    shared += 1
+                    depends_on.append(owner)
+                    runners[node] = (
+                        lambda model=model, task=task, owner=owner: (
+                            model._record_shared(task, owner)
+                        ),
+                        ResourceRequest(cores=0),
+                    )
+                nodes.append(
+                    StofsTask(node, ExecutionMode.LEGACY, [node], depends_on=depends_on)
+                )
+
+        log.info(
+            f"Running stage {self.__stage} for {len(graphs)} members: "
+            f"{len(nodes) - shared} tasks, {shared} shared between members"
+        )
+        return TaskGraph(nodes), runners
+
+    @staticmethod
+    def __task_key(
+        model: StofsModel, task: StofsTask, node: str, keys: dict[str, str]
+    ) -> str:
+        """
+        Get the identity of a task.
+
+        Args:
+            model (StofsModel): The model of the member the task belongs to.
+            task (StofsTask): The task.
+            node (str): The name of the task in the merged graph.
+            keys (dict[str, str]): The identities of the member's tasks seen so far.
+
+        Returns:
+            str: A hash of what the task runs, its inputs and outputs and the
+                identities of its dependencies, or the node name for a task
+                which declares no outputs and so is never shared.
+        """
+        if not task.outputs():
+            return node
+        identity = {
+            "mode": str(task.mode()),
+            "command": model._task_command(task),
+            "inputs": sorted(model._task_inputs(task)),
+            "outputs": sorted(task.outputs()),
+            "depends_on": sorted(keys[dependency] for dependency in task.depends_on()),
+        }
+        return hashlib.sha256(json.dumps(identity).encode()).hexdigest()
+
+    def __check_state_directories(self) -> None:
+        """
+        Check that every member has its own state directory, since the run
+        state of a stage and the fingerprints of tasks with the same name
+        would otherwise overwrite each other.
+
+        Raises:
+            ValueError: If two members share a state directory.
+        """
+        owners: dict[str, str] = {}
+        for name, model in self.__models.items():
+            directory = os.path.abspath(model.config().state_directory)
+            owner = owners.setdefault(directory, name)
+            if owner != name:
+                msg = (
+                    f"Members {owner} and {name} share the state directory "
+                    f"{directory}, set a separate state_directory for each member"
+                )
+                raise ValueError(msg)
+
+    def __share_python_pools(self) -> None:
+        """
+        Let members with the same Python settings use the worker pool of the
+        first of them, so that the workers and their loaded data are shared.
+        """
+        owners: dict[str, StofsModel] = {}
+        for model in self.__models.values():
+            config = model.config()
+            settings = json.dumps(
+                [
+                    config.python_preload,
+                    config.python_paths,
+                    config.python_loaders,
+                ],
+                sort_keys=True,
+            )
+            owner = owners.setdefault(settings, model)
+            if owner is not model:
+                model._share_python_pool(owner)
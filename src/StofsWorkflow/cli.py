@@ -2,12 +2,63 @@ import argparse
 import sys
 
 from .executor import (
+    execute_backfill,
+    execute_batch,
+    execute_cache,
+    execute_check_inputs,
     execute_forecast,
     execute_nowcast,
+    execute_perf_report,
     execute_post,
     execute_prep_forecast,
     execute_prep_nowcast,
+    execute_publish,
+    execute_serve,
+    execute_submit,
+    execute_wait_completion,
 )
+from .stofs_schema import STAGE_NAMES
+
+
+def add_execution_arguments(p: argparse.ArgumentParser) -> None:
+    """
+    Add the arguments which control how a stage is executed
+
+    Args:
+        p: argparse.ArgumentParser object for the subcommand
+
+    Returns:
+        None
+    """
+    p.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Maximum number of independent tasks to run concurrently",
+    )
+    p.add_argument(
+        "--cycle",
+        type=str,
+        default=None,
+        help="Cycle being run (YYYYMMDDHH), defaults to $PDY$cyc",
+    )
+    p.add_argument(
+        "--resume",
+        action="store_true",
+        help="Skip tasks and scripts which completed successfully in a previous run of this cycle",
+    )
+    p.add_argument(
+        "--force",
+        action="store_true",
+        help="Run tasks even when their declared outputs are up to date",
+    )
+    p.add_argument(
+        "--backend",
+        type=str,
+        choices=["local", "slurm"],
+        default=None,
+        help="Run tasks as local processes or as SLURM jobs, defaults to the configured backend",
+    )
 
 
 def generate_prep_nowcast_subparser(sp: argparse._SubParsersAction) -> None:
@@ -24,6 +75,7 @@ def generate_prep_nowcast_subparser(sp: argparse._SubParsersAction) -> None:
     p.add_argument(
         "--config", type=str, help="Path to the yaml configuration file", required=True
     )
+    add_execution_arguments(p)
     p.set_defaults(func=execute_prep_nowcast)
 
 
@@ -41,6 +93,7 @@ def generate_nowcast_subparser(sp: argparse._SubParsersAction) -> None:
     p.add_argument(
         "--config", type=str, help="Path to the yaml configuration file", required=True
     )
+    add_execution_arguments(p)
     p.set_defaults(func=execute_nowcast)
 
 
@@ -58,6 +111,7 @@ def generate_prep_forecast_subparser(sp: argparse._SubParsersAction) -> None:
     p.add_argument(
         "--config", type=str, help="Path to the yaml configuration file", required=True
     )
+    add_execution_arguments(p)
     p.set_defaults(func=execute_prep_forecast)
 
 
@@ -75,6 +129,7 @@ def generate_forecast_subparser(sp: argparse._SubParsersAction) -> None:
     p.add_argument(
         "--config", type=str, help="Path to the yaml configuration file", required=True
     )
+    add_execution_arguments(p)
     p.set_defaults(func=execute_forecast)
 
 
@@ -92,9 +147,378 @@ def generate_post_subparser(sp: argparse._SubParsersAction) -> None:
     p.add_argument(
         "--config", type=str, help="Path to the yaml configuration file", required=True
     )
+    add_execution_arguments(p)
     p.set_defaults(func=execute_post)
 
 
+def generate_perf_subparser(sp: argparse._SubParsersAction) -> None:
+    """
+    Command line interface for the performance history reports
+
+    Args:
+        sp: argparse._SubParsersAction object
+
+    Returns:
+        None
+    """
+    p = sp.add_parser("perf", help="Performance history of the workflow")
+    perf_sp = p.add_subparsers(dest="perf_command", required=True)
+
+    report = perf_sp.add_parser(
+        "report", help="Report task duration trends, percentiles and regressions"
+    )
+    report.add_argument(
+        "--config", type=str, help="Path to the yaml configuration file", required=True
+    )
+    report.add_argument(
+        "--stage", type=str, default=None, help="Only report the tasks of this stage"
+    )
+    report.add_argument(
+        "--baseline",
+        type=int,
+        default=10,
+        help="Number of previous runs used as the baseline for regressions",
+    )
+    report.add_argument(
+        "--threshold",
+        type=float,
+        default=0.2,
+        help="Fractional slowdown against the baseline reported as a regression",
+    )
+    report.set_defaults(func=execute_perf_report)
+
+
+def generate_serve_subparser(sp: argparse._SubParsersAction) -> None:
+    """
+    Command line interface for the warm-worker server
+
+    Args:
+        sp: argparse._SubParsersAction object
+
+    Returns:
+        None
+    """
+    p = sp.add_parser(
+        "serve", help="Run a server which keeps warm Python workers for a cycle"
+    )
+    p.add_argument(
+        "--config", type=str, help="Path to the yaml configuration file", required=True
+    )
+    p.add_argument(
+        "--cycle",
+        type=str,
+        default=None,
+        help="Cycle being run (YYYYMMDDHH), defaults to $PDY$cyc",
+    )
+    p.add_argument(
+        "--socket",
+        type=str,
+        default=None,
+        help="Unix domain socket to listen on, defaults to the configured socket",
+    )
+    p.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Number of worker processes, defaults to the configured number",
+    )
+    p.set_defaults(func=execute_serve)
+
+
+def generate_submit_subparser(sp: argparse._SubParsersAction) -> None:
+    """
+    Command line interface for submitting tasks to the warm-worker server
+
+    Args:
+        sp: argparse._SubParsersAction object
+
+    Returns:
+        None
+    """
+    p = sp.add_parser(
+        "submit", help="Run a Python task on a running server and wait for it"
+    )
+    p.add_argument("--config", type=str, help="Path to the yaml configuration file")
+    p.add_argument(
+        "--socket",
+        type=str,
+        default=None,
+        help="Unix domain socket of the server, defaults to the configured socket",
+    )
+    p.add_argument("--task", type=str, default=None, help="Configured task to run")
+    p.add_argument(
+        "--entry-point",
+        type=str,
+        default=None,
+        help="Entry point (module:function) to run instead of the task's own",
+    )
+    p.add_argument(
+        "--timeout", type=float, default=None, help="Timeout of the entry point"
+    )
+    p.add_argument(
+        "--cycle",
+        type=str,
+        default=None,
+        help="Cycle the task belongs to, defaults to the server's cycle",
+    )
+    p.add_argument(
+        "--ping", action="store_true", help="Check that the server is running"
+    )
+    p.add_argument("--shutdown", action="store_true", help="Stop the server")
+    p.add_argument(
+        "argv",
+        nargs=argparse.REMAINDER,
+        help="Command line arguments seen by the entry point through sys.argv",
+    )
+    p.set_defaults(func=execute_submit)
+
+
+def generate_wait_completion_subparser(sp: argparse._SubParsersAction) -> None:
+    """
+    Command line interface for waiting on the model run
+
+    Args:
+        sp: argparse._SubParsersAction object
+
+    Returns:
+        None
+    """
+    p = sp.add_parser(
+        "wait-completion",
+        help="Wait until the model run has completed, as set in the configuration",
+    )
+    p.add_argument(
+        "--config", type=str, help="Path to the yaml configuration file", required=True
+    )
+    p.set_defaults(func=execute_wait_completion)
+
+
+def generate_backfill_subparser(sp: argparse._SubParsersAction) -> None:
+    """
+    Command line interface for running a range of cycles
+
+    Args:
+        sp: argparse._SubParsersAction object
+
+    Returns:
+        None
+    """
+    p = sp.add_parser(
+        "backfill",
+        help="Run a range of cycles, overlapping the stages of consecutive cycles",
+    )
+    p.add_argument(
+        "--config", type=str, help="Path to the yaml configuration file", required=True
+    )
+    p.add_argument(
+        "--start", type=str, required=True, help="First cycle to run (YYYYMMDDHH)"
+    )
+    p.add_argument(
+        "--end", type=str, required=True, help="Last cycle to run (YYYYMMDDHH)"
+    )
+    p.add_argument("--interval", type=float, default=24.0, help="Hours between cycles")
+    p.add_argument(
+        "--parallel",
+        type=int,
+        default=2,
+        help="Maximum number of stages, of any cycle, to run concurrently",
+    )
+    p.add_argument(
+        "--stages",
+        type=str,
+        nargs="+",
+        choices=STAGE_NAMES,
+        default=None,
+        help="Stages to run for each cycle, defaults to every stage with work to do",
+    )
+    p.add_argument(
+        "--hotstart-from",
+        type=str,
+        choices=STAGE_NAMES,
+        default=None,
+        help="Stage which writes the hotstart file of the next cycle, defaults to the first model run stage",
+    )
+    p.add_argument(
+        "--hotstart-to",
+        type=str,
+        choices=STAGE_NAMES,
+        default=None,
+        help="Stage which reads the hotstart file of the previous cycle, defaults to --hotstart-from",
+    )
+    add_execution_arguments(p)
+    p.set_defaults(func=execute_backfill)
+
+
+def generate_batch_subparser(sp: argparse._SubParsersAction) -> None:
+    """
+    Command line interface for running a stage of several configurations together
+
+    Args:
+        sp: argparse._SubParsersAction object
+
+    Returns:
+        None
+    """
+    p = sp.add_parser(
+        "batch",
+        help="Run a stage of several configurations on one scheduler, running shared tasks once",
+    )
+    p.add_argument(
+        "configs", type=str, nargs="+", help="Paths to the yaml configuration files"
+    )
+    p.add_argument(
+        "--stage", type=str, choices=STAGE_NAMES, required=True, help="Stage to run"
+    )
+    add_execution_arguments(p)
+    p.set_defaults(func=execute_batch)
+
+
+def generate_publish_subparser(sp: argparse._SubParsersAction) -> None:
+    """
+    Command line interface for publishing products
+
+    Args:
+        sp: argparse._SubParsersAction object
+
+    Returns:
+        None
+    """
+    p = sp.add_parser(
+        "publish",
+        help="Validate, copy and verify the products in a manifest, then send their alerts",
+    )
+    p.add_argument(
+        "--manifest", type=str, required=True, help="Path to the yaml product manifest"
+    )
+    p.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Number of files to publish at once, defaults to the manifest's",
+    )
+    p.add_argument(
+        "--no-alert",
+        action="store_true",
+        help="Do not run the alert command, i.e. when SENDDBN is not YES",
+    )
+    p.set_defaults(func=execute_publish)
+
+
+def generate_check_inputs_subparser(sp: argparse._SubParsersAction) -> None:
+    """
+    Command line interface for checking upstream inputs
+
+    Args:
+        sp: argparse._SubParsersAction object
+
+    Returns:
+        None
+    """
+    p = sp.add_parser(
+        "check-inputs",
+        help="Check that the upstream inputs of a cycle are ready and write their file lists",
+    )
+    p.add_argument(
+        "--config", type=str, help="Path to the yaml configuration file", required=True
+    )
+    p.add_argument(
+        "--cycle",
+        type=str,
+        default=None,
+        help="Cycle being run (YYYYMMDDHH), defaults to $PDY$cyc",
+    )
+    p.add_argument(
+        "--sources",
+        type=str,
+        nargs="+",
+        default=None,
+        help="Upstream sources to check, defaults to every configured source",
+    )
+    p.add_argument(
+        "--workers", type=int, default=16, help="Number of files checked at once"
+    )
+    p.add_argument(
+        "--no-wait",
+        action="store_true",
+        help="Use the backup of any primary file which is not ready now",
+    )
+    p.set_defaults(func=execute_check_inputs)
+
+
+def generate_cache_subparser(sp: argparse._SubParsersAction) -> None:
+    """
+    Command line interface for the caches of processed products
+
+    Args:
+        sp: argparse._SubParsersAction object
+
+    Returns:
+        None
+    """
+    p = sp.add_parser(
+        "cache",
+        help="Fetch, store or build processed products, i.e. GFS sflux slices or RTOFS subsets, or prune a cache",
+    )
+    p.add_argument(
+        "action",
+        choices=["fetch", "store", "run", "build", "prune"],
+        help="fetch exits with code 1 when the product is not in the cache, "
+        "run builds the product with --command when it is not, "
+        "build does the same for every product of --list",
+    )
+    p.add_argument(
+        "--config", type=str, help="Path to the yaml configuration file", required=True
+    )
+    p.add_argument(
+        "--name", type=str, required=True, help="Name of the cache, i.e. gfs_sflux"
+    )
+    p.add_argument(
+        "--source",
+        type=str,
+        nargs="+",
+        default=None,
+        help="Files the product is made from",
+    )
+    p.add_argument(
+        "--recipe",
+        type=str,
+        nargs="*",
+        default=[],
+        help="How the product is made, i.e. the variables and subset",
+    )
+    p.add_argument(
+        "--output", type=str, default=None, help="The product to fetch or store"
+    )
+    p.add_argument(
+        "--list",
+        type=str,
+        default=None,
+        help="File listing the products for build, one per line as the product path followed by its source files",
+    )
+    p.add_argument(
+        "--command",
+        type=str,
+        default=None,
+        help="Command which builds a product for run or build, with {output} replaced by the product path "
+        "and {source} by its source files",
+    )
+    p.add_argument(
+        "--workers", type=int, default=1, help="Number of products built at once"
+    )
+    p.add_argument(
+        "--link",
+        action="store_true",
+        help="Hard link a fetched product instead of copying it, for products which are only read",
+    )
+    p.add_argument(
+        "--max-age-days",
+        type=float,
+        default=None,
+        help="Prune entries unused for this many days, defaults to the configured age",
+    )
+    p.set_defaults(func=execute_cache)
+
+
 def stofs_cli() -> None:
     """
     Set up the initial CLI for the workflow manager.
@@ -112,6 +536,15 @@ def stofs_cli() -> None:
     generate_prep_forecast_subparser(sp)
     generate_forecast_subparser(sp)
     generate_post_subparser(sp)
+    generate_perf_subparser(sp)
+    generate_serve_subparser(sp)
+    generate_submit_subparser(sp)
+    generate_wait_completion_subparser(sp)
+    generate_backfill_subparser(sp)
+    generate_batch_subparser(sp)
+    generate_publish_subparser(sp)
+    generate_check_inputs_subparser(sp)
+    generate_cache_subparser(sp)
 
     args = p.parse_args()
 
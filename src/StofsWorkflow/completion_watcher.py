@@ -0,0 +1,337 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+
+from .stofs_logger import get_stofs_logger
+
+log = get_stofs_logger()
+
+# inotify constants from <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+INOTIFY_EVENT_HEADER = struct.Struct("iIII")
+
+
+@dataclass
+class CompletionCriteria:
+    """
+    Criteria used to detect that the model run has completed.
+
+    The run is complete once marker_text appears in marker_file (SCHISM writes
+    "Run completed successfully" to outputs/mirror.out), or once final_file has
+    been written and closed. The stage named by stage waits for completion
+    before any of its tasks run, for at most timeout seconds. Files are checked
+    at least every poll_interval seconds, since inotify does not see writes
+    made on other nodes of a parallel file system. Only when settle_time is
+    set is a final file which has not changed size for that many seconds also
+    treated as closed, since the models append to their final output in bursts
+    and a pause between writes would otherwise start the next stage on a
+    partial file.
+    """
+
+    marker_file: Optional[str] = field(default=None)
+    marker_text: str = field(default="Run completed successfully")
+    final_file: Optional[str] = field(default=None)
+    stage: str = field(default="post")
+    timeout: float = field(default=18000.0)
+    poll_interval: float = field(default=5.0)
+    settle_time: Optional[float] = field(default=None)
+
+    @staticmethod
+    def from_dict(attributes: dict) -> "CompletionCriteria":
+        """
+        Create the completion criteria from a validated configuration dictionary.
+
+        Args:
+            attributes (dict): The completion section of the configuration file.
+
+        Returns:
+            CompletionCriteria: The completion criteria.
+        """
+
+        def expand(path: Optional[str]) -> Optional[str]:
+            if path is None:
+                return None
+            return os.path.abspath(os.path.expandvars(path))
+
+        return CompletionCriteria(
+            marker_file=expand(attributes.get("marker_file")),
+            marker_text=attributes.get("marker_text", "Run completed successfully"),
+            final_file=expand(attributes.get("final_file")),
+            stage=attributes.get("stage", "post"),
+            timeout=attributes.get("timeout", 18000.0),
+            poll_interval=attributes.get("poll_interval", 5.0),
+            settle_time=attributes.get("settle_time"),
+        )
+
+
+class Inotify:
+    """
+    Class representing an inotify instance, accessed through the C library.
+    """
+
+    def __init__(self) -> None:
+        """
+        Initialize the inotify instance.
+
+        Raises:
+            OSError: If inotify is not available.
+        """
+        library = ctypes.util.find_library("c")
+        if library is None:
+            msg = "The C library could not be found"
+            raise OSError(msg)
+        self.__libc = ctypes.CDLL(library, use_errno=True)
+        if not hasattr(self.__libc, "inotify_init1"):
+            msg = "inotify is not available"
+            raise OSError(msg)
+        self.__fd = self.__libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.__fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+
+    def add_watch(self, path: str, mask: int) -> None:
+        """
+        Watch a file or directory for events.
+
+        Args:
+            path (str): The path to watch.
+            mask (int): The events to watch for.
+        """
+        if self.__libc.inotify_add_watch(self.__fd, os.fsencode(path), mask) < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno), path)
+
+    def wait(self, timeout: float) -> list[tuple[int, str]]:
+        """
+        Wait for events.
+
+        Args:
+            timeout (float): The longest time to wait in seconds.
+
+        Returns:
+            list[tuple[int, str]]: The mask and file name of each event, empty on timeout.
+        """
+        readable, _, _ = select.select([self.__fd], [], [], max(timeout, 0.0))
+        if not readable:
+            return []
+        try:
+            data = os.read(self.__fd, 65536)
+        except BlockingIOError:
+            return []
+
+        events = []
+        offset = 0
+        while offset + INOTIFY_EVENT_HEADER.size <= len(data):
+            _, mask, _, length = INOTIFY_EVENT_HEADER.unpack_from(data, offset)
+            offset += INOTIFY_EVENT_HEADER.size
+            name = data[offset : offset + length].rstrip(b"\0").decode(errors="replace")
+            offset += length
+            events.append((mask, name))
+        return events
+
+    def close(self) -> None:
+        """
+        Close the inotify instance.
+        """
+        os.close(self.__fd)
+
+
+def watch_directories(directories: set[str]) -> Optional[Inotify]:
+    """
+    Set up inotify watches for files being created, written and closed in directories.
+
+    Args:
+        directories (set[str]): The directories to watch.
+
+    Returns:
+        Optional[Inotify]: The inotify instance, or None if the directories cannot be watched.
+    """
+    try:
+        inotify = Inotify()
+    except OSError as e:
+        log.info(f"inotify is not available ({e}), polling for changes")
+        return None
+    try:
+        for directory in directories:
+            inotify.add_watch(
+                directory, IN_MODIFY | IN_CLOSE_WRITE | IN_CREATE | IN_MOVED_TO
+            )
+    except OSError as e:
+        log.info(f"Unable to watch {e.filename} ({e.strerror}), polling for changes")
+        inotify.close()
+        return None
+    return inotify
+
+
+class CompletionWatcher:
+    """
+    Class which waits for a model run to complete.
+
+    Changes to the watched files are picked up through inotify when it is
+    available, so that completion is seen within moments rather than on the
+    next ten-minute check of the legacy scripts. The files are also stat-ed at
+    every poll interval, which is the only mechanism used when inotify is not
+    available and which catches writes made from other nodes.
+    """
+
+    def __init__(self, criteria: CompletionCriteria) -> None:
+        """
+        Initialize the CompletionWatcher.
+
+        Args:
+            criteria (CompletionCriteria): The criteria which define completion.
+        """
+        if criteria.marker_file is None and criteria.final_file is None:
+            msg = "Completion requires a marker_file or a final_file"
+            raise ValueError(msg)
+        self.__criteria = criteria
+        self.__marker_offset = 0
+        self.__marker_tail = b""
+        self.__final_size = None
+        self.__final_stable_since = None
+        self.__reason: Optional[str] = None
+
+    def wait(self) -> str:
+        """
+        Wait until the model run is complete.
+
+        Returns:
+            str: A description of the event which showed that the run completed.
+
+        Raises:
+            TimeoutError: If the run does not complete within the timeout.
+        """
+        criteria = self.__criteria
+        deadline = time.monotonic() + criteria.timeout
+        inotify = watch_directories(
+            {
+                os.path.dirname(path)
+                for path in (criteria.marker_file, criteria.final_file)
+                if path is not None
+            }
+        )
+        if (
+            inotify is None
+            and criteria.marker_file is None
+            and criteria.settle_time is None
+        ):
+            log.warning(
+                f"Without inotify {criteria.final_file} cannot be seen to close, "
+                "set a marker_file or settle_time to poll for completion"
+            )
+        closed_files: set[str] = set()
+        try:
+            while True:
+                reason = self.check(closed_files)
+                if reason is not None:
+                    return reason
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    msg = f"Model run did not complete within {criteria.timeout:g}s"
+                    raise TimeoutError(msg)
+
+                wait_time = min(criteria.poll_interval, remaining)
+                if inotify is None:
+                    time.sleep(wait_time)
+                else:
+                    for mask, name in inotify.wait(wait_time):
+                        if mask & IN_CLOSE_WRITE:
+                            closed_files.add(name)
+        finally:
+            if inotify is not None:
+                inotify.close()
+
+    def check(self, closed_files: Optional[set[str]] = None) -> Optional[str]:
+        """
+        Check whether the run has completed, without waiting. Once the run
+        has been seen to complete, every later check reports it as complete.
+
+        Args:
+            closed_files (set[str], optional): The names of the files inotify saw being closed after writing.
+
+        Returns:
+            Optional[str]: A description of the completion, or None if the run has not completed.
+        """
+        if self.__reason is None:
+            self.__reason = self.__completion_reason(closed_files)
+        return self.__reason
+
+    def __completion_reason(self, closed_files: Optional[set[str]]) -> Optional[str]:
+        """
+        Look for the completion of the run in what has changed since the last check.
+
+        Args:
+            closed_files (set[str], optional): The names of the files inotify saw being closed after writing.
+
+        Returns:
+            Optional[str]: A description of the completion, or None if the run has not completed.
+        """
+        criteria = self.__criteria
+        if criteria.marker_file is not None and self.__marker_found():
+            return f"found '{criteria.marker_text}' in {criteria.marker_file}"
+
+        if criteria.final_file is None:
+            return None
+        if closed_files and os.path.basename(criteria.final_file) in closed_files:
+            return f"{criteria.final_file} was closed"
+        if criteria.settle_time is not None and self.__final_file_settled():
+            return (
+                f"{criteria.final_file} has not changed for {criteria.settle_time:g}s"
+            )
+        return None
+
+    def __final_file_settled(self) -> bool:
+        """
+        Check whether the final file has stopped growing for the settle time.
+
+        Returns:
+            bool: True if the size of the final file has not changed for the settle time.
+        """
+        try:
+            size = os.stat(self.__criteria.final_file).st_size
+        except FileNotFoundError:
+            return False
+        now = time.monotonic()
+        if size != self.__final_size:
+            self.__final_size = size
+            self.__final_stable_since = now
+            return False
+        return now - self.__final_stable_since >= self.__criteria.settle_time
+
+    def __marker_found(self) -> bool:
+        """
+        Read what has been appended to the marker file and look for the marker text.
+
+        Returns:
+            bool: True if the marker text has been written.
+        """
+        marker = self.__criteria.marker_text.encode()
+        try:
+            with open(self.__criteria.marker_file, "rb") as f:
+                f.seek(0, os.SEEK_END)
+                if f.tell() < self.__marker_offset:
+                    # The file was replaced or truncated, so read it again from the start
+                    self.__marker_offset = 0
+                    self.__marker_tail = b""
+                f.seek(self.__marker_offset)
+                data = f.read()
+        except FileNotFoundError:
+            return False
+
+        self.__marker_offset += len(data)
+        text = self.__marker_tail + data
+        if marker in text:
+            return True
+        self.__marker_tail = text[-(len(marker) - 1) :] if len(marker) > 1 else b""
+        return False
@@ -1,6 +1,10 @@
+from __future__ import annotations
+
 from dataclasses import dataclass, field
 from enum import Enum
 
+from .resources import parse_memory
+
 
 class ExecutionMode(Enum):
     """
@@ -29,6 +33,7 @@ class ExecutionPolicy(Enum):
     UNKNOWN = 0
     SERIAL = 1
     PARALLEL = 2
+    MPMD = 3
 
     def __str__(self) -> str:
         """
@@ -39,12 +44,84 @@ class ExecutionPolicy(Enum):
         """
         return self.name
 
+    @staticmethod
+    def from_string(policy: str) -> ExecutionPolicy:
+        """
+        Convert a string to an ExecutionPolicy enum.
+
+        Args:
+            policy (str): The string representation of the execution policy.
+
+        Returns:
+            ExecutionPolicy: The corresponding ExecutionPolicy enum.
+        """
+        if policy.upper() == "SERIAL":
+            return ExecutionPolicy.SERIAL
+        if policy.upper() == "PARALLEL":
+            return ExecutionPolicy.PARALLEL
+        if policy.upper() == "MPMD":
+            return ExecutionPolicy.MPMD
+        return ExecutionPolicy.UNKNOWN
+
 
 @dataclass
 class ExecutionAttributes:
     """
     Attributes for execution policies.
+
+    The num_processes attribute is the number of MPI ranks used to launch
+    each script, while max_concurrent is the number of scripts within a
+    task which may run at the same time under the PARALLEL and MPMD
+    policies, all of them when it is not set. Under the MPMD policy each
+    script is a command line. When max_concurrent is not set the commands
+    run together as the ranks of one cfp job, and otherwise up to
+    max_concurrent of them run at once as separate processes, so that a
+    max_concurrent of 1 runs them one at a time. A script which fails or
+    exceeds its timeout (in seconds) is retried up to retries times, waiting
+    retry_backoff seconds before the first retry and doubling the wait before
+    each subsequent one. When sample_interval is set, the process tree of
+    each script is sampled at that interval in seconds.
+
+    The cores, memory (in megabytes) and io_class attributes describe what the
+    task holds while it runs, so that the local scheduler can pack concurrent
+    tasks onto the node. The cores default to one for each process the task
+    may run at once. A scratch task runs in node-local scratch space, with
+    its declared inputs staged in and its declared outputs published back.
     """
 
     policy: ExecutionPolicy = field(default=ExecutionPolicy.SERIAL)
     num_processes: int = field(default=1)
+    max_concurrent: int | None = field(default=None)
+    timeout: float | None = field(default=None)
+    retries: int = field(default=0)
+    retry_backoff: float = field(default=30.0)
+    sample_interval: float | None = field(default=None)
+    cores: int | None = field(default=None)
+    memory_mb: float = field(default=0.0)
+    io_class: str | None = field(default=None)
+    scratch: bool = field(default=False)
+
+    @staticmethod
+    def from_dict(attributes: dict) -> ExecutionAttributes:
+        """
+        Create the execution attributes from a validated configuration dictionary.
+
+        Args:
+            attributes (dict): The task section of the configuration file.
+
+        Returns:
+            ExecutionAttributes: The execution attributes for the task.
+        """
+        return ExecutionAttributes(
+            policy=ExecutionPolicy.from_string(attributes.get("policy", "serial")),
+            num_processes=attributes.get("num_processes", 1),
+            max_concurrent=attributes.get("max_concurrent"),
+            timeout=attributes.get("timeout"),
+            retries=attributes.get("retries", 0),
+            retry_backoff=attributes.get("retry_backoff", 30.0),
+            sample_interval=attributes.get("sample_interval"),
+            cores=attributes.get("cores"),
+            memory_mb=parse_memory(attributes.get("memory", 0)),
+            io_class=attributes.get("io_class"),
+            scratch=attributes.get("scratch", False),
+        )
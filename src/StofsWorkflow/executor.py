@@ -1,4 +1,5 @@
 import argparse
+from typing import Optional
 
 from .stofs_stage import Stage
 
@@ -81,9 +82,17 @@ def execute_stage(stage: Stage, args: argparse.Namespace) -> None:
     """
     from .model_factory import model_factory
     from .stofs_config import StofsConfig
+    from .stofs_run_options import StofsRunOptions, default_cycle
 
     config = StofsConfig(config_file=args.config)
-    model = model_factory(config)
+    options = StofsRunOptions(
+        jobs=args.jobs,
+        cycle=args.cycle if args.cycle is not None else default_cycle(),
+        resume=args.resume,
+        force=args.force,
+        backend=args.backend,
+    )
+    model = model_factory(config, options)
 
     if stage == Stage.PREP_NOWCAST:
         model.prep_nowcast()
@@ -98,3 +107,328 @@ def execute_stage(stage: Stage, args: argparse.Namespace) -> None:
     else:
         msg = f"Unknown stage: {stage}"
         raise ValueError(msg)
+
+
+def execute_perf_report(args: argparse.Namespace) -> None:
+    """
+    Print the performance report of the workflow's task history.
+
+    Args:
+        args: Command line arguments.
+
+    Returns:
+        None
+    """
+    from .perf_database import PerfDatabase
+    from .stofs_config import StofsConfig
+
+    config = StofsConfig(config_file=args.config)
+    database = PerfDatabase(config.state_directory)
+    summaries = database.report(
+        config.model_name,
+        stage=args.stage,
+        baseline=args.baseline,
+        threshold=args.threshold,
+    )
+
+    if not summaries:
+        print(f"No task history found in {database.filename()}")
+        return
+
+    def seconds(value: Optional[float]) -> str:
+        return f"{value:.1f}" if value is not None else "-"
+
+    header = f"{'stage':<15} {'task':<25} {'runs':>5} {'p50':>9} {'p90':>9} {'p95':>9} {'latest':>9} {'baseline':>9} {'change':>8}  trend"
+    print(header)
+    print("-" * len(header))
+    for summary in summaries:
+        change = (
+            f"{summary['change'] * 100:+.0f}%" if summary["change"] is not None else "-"
+        )
+        flag = "  REGRESSION" if summary["regression"] else ""
+        print(
+            f"{summary['stage']:<15} {summary['task']:<25} {summary['runs']:>5} "
+            f"{seconds(summary['p50']):>9} {seconds(summary['p90']):>9} "
+            f"{seconds(summary['p95']):>9} {seconds(summary['latest']):>9} "
+            f"{seconds(summary['baseline']):>9} {change:>8}  {summary['trend']}{flag}"
+        )
+
+
+def execute_serve(args: argparse.Namespace) -> None:
+    """
+    Run the warm-worker server for the Python tasks of a cycle.
+
+    Args:
+        args: Command line arguments.
+
+    Returns:
+        None
+    """
+    from .stofs_config import StofsConfig
+    from .stofs_run_options import default_cycle
+    from .stofs_server import StofsServer
+
+    config = StofsConfig(config_file=args.config)
+    server = StofsServer(
+        config,
+        args.cycle if args.cycle is not None else default_cycle(),
+        socket_path=args.socket,
+        workers=args.workers,
+    )
+    server.serve()
+
+
+def execute_submit(args: argparse.Namespace) -> None:
+    """
+    Submit a request to a running server, print its response and exit with
+    the exit code of the entry point.
+
+    Args:
+        args: Command line arguments.
+
+    Returns:
+        None
+    """
+    import json
+    import sys
+
+    from .stofs_server import submit_request
+
+    if args.socket is not None:
+        socket_path = args.socket
+    elif args.config is not None:
+        from .stofs_config import StofsConfig
+
+        socket_path = StofsConfig(config_file=args.config).python_socket
+    else:
+        msg = "Either --socket or --config must be given"
+        raise ValueError(msg)
+
+    if args.ping:
+        request = {"command": "ping"}
+    elif args.shutdown:
+        request = {"command": "shutdown"}
+    else:
+        fields = {
+            "task": args.task,
+            "entry_point": args.entry_point,
+            "argv": [arg for arg in args.argv if arg != "--"] or None,
+            "timeout": args.timeout,
+            "cycle": args.cycle,
+        }
+        request = {key: value for key, value in fields.items() if value is not None}
+        if not request:
+            msg = "One of --task, --entry-point, --ping or --shutdown must be given"
+            raise ValueError(msg)
+
+    response = submit_request(socket_path, request)
+    print(json.dumps(response, indent=2))
+    if "error" in response:
+        print(response["error"], file=sys.stderr)
+    sys.exit(response.get("exit_code", 0))
+
+
+def execute_wait_completion(args: argparse.Namespace) -> None:
+    """
+    Wait for the model run to complete, as set in the configuration.
+
+    Args:
+        args: Command line arguments.
+
+    Returns:
+        None
+    """
+    import sys
+
+    from .completion_watcher import CompletionWatcher
+    from .stofs_config import StofsConfig
+
+    config = StofsConfig(config_file=args.config)
+    if config.completion is None:
+        msg = f"No completion section in {args.config}"
+        raise ValueError(msg)
+    try:
+        reason = CompletionWatcher(config.completion).wait()
+    except TimeoutError as e:
+        print(e, file=sys.stderr)
+        sys.exit(1)
+    print(f"Model run completed: {reason}")
+
+
+def execute_backfill(args: argparse.Namespace) -> None:
+    """
+    Run a range of cycles as one pipeline.
+
+    Args:
+        args: Command line arguments.
+
+    Returns:
+        None
+    """
+    from .backfill import Backfill, cycle_range
+
+    stage_arguments = ["--jobs", str(args.jobs)]
+    if args.resume:
+        stage_arguments.append("--resume")
+    if args.force:
+        stage_arguments.append("--force")
+    if args.backend is not None:
+        stage_arguments.extend(["--backend", args.backend])
+
+    backfill = Backfill(
+        args.config,
+        cycle_range(args.start, args.end, args.interval),
+        stages=args.stages,
+        hotstart_from=args.hotstart_from,
+        hotstart_to=args.hotstart_to,
+        stage_arguments=stage_arguments,
+    )
+    backfill.run(jobs=args.parallel)
+
+
+def execute_batch(args: argparse.Namespace) -> None:
+    """
+    Run a stage of several configurations on one scheduler.
+
+    Args:
+        args: Command line arguments.
+
+    Returns:
+        None
+    """
+    from .batch import Batch
+    from .stofs_run_options import StofsRunOptions, default_cycle
+
+    options = StofsRunOptions(
+        jobs=args.jobs,
+        cycle=args.cycle if args.cycle is not None else default_cycle(),
+        resume=args.resume,
+        force=args.force,
+        backend=args.backend,
+    )
+    Batch(args.configs, args.stage, options).run()
+
+
+def execute_publish(args: argparse.Namespace) -> None:
+    """
+    Publish the products listed in a manifest.
+
+    Args:
+        args: Command line arguments.
+
+    Returns:
+        None
+    """
+    from .publisher import publish_manifest
+
+    publish_manifest(args.manifest, workers=args.workers, alert=not args.no_alert)
+
+
+def execute_check_inputs(args: argparse.Namespace) -> None:
+    """
+    Check that the upstream inputs of a cycle are ready, and write their file lists.
+
+    Args:
+        args: Command line arguments.
+
+    Returns:
+        None
+    """
+    from .input_readiness import check_upstream
+    from .stofs_config import StofsConfig
+    from .stofs_run_options import default_cycle
+
+    config = StofsConfig(config_file=args.config)
+    names = args.sources if args.sources else list(config.upstream)
+    for name in names:
+        if name not in config.upstream:
+            msg = f"No upstream source {name} in {args.config}"
+            raise ValueError(msg)
+    check_upstream(
+        [config.upstream[name] for name in names],
+        args.cycle if args.cycle is not None else default_cycle(),
+        wait=not args.no_wait,
+        workers=args.workers,
+    )
+
+
+def execute_cache(args: argparse.Namespace) -> None:
+    """
+    Fetch a product from, or store a product in, a cache of processed
+    products, or prune the cache. A fetch which misses exits with code 1.
+    Run fetches the product, or builds it with a command when it is not in
+    the cache, waiting for another task which is already building it. Build
+    does the same for every product of a list, several at once.
+
+    Args:
+        args: Command line arguments.
+
+    Returns:
+        None
+    """
+    import os
+    import sys
+
+    from .product_cache import (
+        ProductCache,
+        build_products,
+        command_builder,
+        read_product_list,
+    )
+    from .stofs_config import StofsConfig
+
+    config = StofsConfig(config_file=args.config)
+    cache = ProductCache(os.path.join(config.cache.directory, args.name))
+
+    if args.action == "prune":
+        cache.prune(
+            args.max_age_days
+            if args.max_age_days is not None
+            else config.cache.max_age_days
+        )
+        return
+
+    if args.action == "build":
+        if args.list is None or args.command is None:
+            msg = "cache build needs --list and --command"
+            raise ValueError(msg)
+
+        def build(sources: list[str], destination: str) -> None:
+            command_builder(args.command, sources)(destination)
+
+        # The command names its files through {source} and {output}, so it
+        # is the same for every product and each product is keyed by its sources
+        build_products(
+            cache,
+            read_product_list(args.list),
+            [*args.recipe, args.command],
+            build,
+            workers=args.workers,
+        )
+        return
+
+    if not args.source or args.output is None:
+        msg = f"cache {args.action} needs --source and --output"
+        raise ValueError(msg)
+    if args.action == "run":
+        if args.command is None:
+            msg = "cache run needs --command"
+            raise ValueError(msg)
+        # The command is part of how the product is made, so tasks which run
+        # the same command on the same files share the product
+        recipe = [*args.recipe, args.command]
+        cache.produce(
+            cache.key(args.source, recipe),
+            args.output,
+            command_builder(args.command, args.source),
+            link=args.link,
+            metadata={"sources": args.source, "recipe": recipe},
+        )
+        return
+
+    key = cache.key(args.source, args.recipe)
+    if args.action == "fetch":
+        if not cache.fetch(key, args.output, link=args.link):
+            sys.exit(1)
+    else:
+        cache.store(key, args.output, {"sources": args.source, "recipe": args.recipe})
@@ -0,0 +1,237 @@
+import fcntl
+import hashlib
+import json
+import os
+import threading
+from typing import Optional
+
+from .stofs_logger import get_stofs_logger
+
+try:
+    import xxhash
+except ImportError:
+    # xxhash is in the fast extra, blake2b is used without it
+    xxhash = None
+
+log = get_stofs_logger()
+
+HASH_BLOCK_SIZE = 4 * 1024 * 1024
+
+
+def new_hasher() -> tuple[object, str]:
+    """
+    Create the hasher used for file contents.
+
+    xxhash is used when it is installed, otherwise blake2b from the standard
+    library.
+
+    Returns:
+        tuple[object, str]: The hasher, with update() and hexdigest() methods,
+            and the name of its algorithm.
+    """
+    if xxhash is not None:
+        return xxhash.xxh3_64(), "xxh3_64"
+    return hashlib.blake2b(digest_size=16), "blake2b"
+
+
+def hash_file(path: str) -> str:
+    """
+    Compute a content hash of a file.
+
+    The algorithm is part of the returned string so that hashes from
+    different algorithms never compare equal.
+
+    Args:
+        path (str): The path of the file to hash.
+
+    Returns:
+        str: The hash of the file contents, prefixed with the algorithm name.
+    """
+    hasher, algorithm = new_hasher()
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(HASH_BLOCK_SIZE)
+            if not block:
+                break
+            hasher.update(block)
+
+    return f"{algorithm}:{hasher.hexdigest()}"
+
+
+class FingerprintCache:
+    """
+    Class representing the fingerprints of the files read and written by tasks.
+
+    A fingerprint is the size, modification time and content hash of a file.
+    The hash of a file is only recomputed when its size or modification time
+    changes, so checking an unchanged file costs a single stat. The fingerprints
+    seen when each task last succeeded are kept so that a task can be skipped
+    when its inputs and outputs are unchanged.
+
+    Several workflow processes (i.e. the stages of a backfill) may share the
+    cache file. Each save merges the entries this process changed into the
+    file on disk under a lock, so that the entries of the others are kept.
+    """
+
+    FINGERPRINT_FILE = "fingerprints.json"
+
+    def __init__(self, state_directory: str) -> None:
+        """
+        Initialize the FingerprintCache, reading any existing cache from disk.
+
+        Args:
+            state_directory (str): The directory where the cache file is kept.
+        """
+        self.__filename = os.path.join(
+            state_directory, FingerprintCache.FINGERPRINT_FILE
+        )
+        self.__lock = threading.Lock()
+        self.__changed_files: set[str] = set()
+        self.__changed_tasks: set[str] = set()
+        self.__files, self.__tasks = self.__load()
+
+    def __load(self) -> tuple[dict[str, dict], dict[str, dict]]:
+        """
+        Read the cache file.
+
+        Returns:
+            tuple[dict[str, dict], dict[str, dict]]: The fingerprints of the
+                files and of the tasks, empty if there is no readable cache.
+        """
+        if not os.path.exists(self.__filename):
+            return {}, {}
+        try:
+            with open(self.__filename) as f:
+                data = json.load(f)
+            return data.get("files", {}), data.get("tasks", {})
+        except (OSError, ValueError) as e:
+            log.warning(f"Ignoring unreadable fingerprint cache {self.__filename}: {e}")
+            return {}, {}
+
+    def fingerprint(self, path: str) -> Optional[dict]:
+        """
+        Get the fingerprint of a file.
+
+        Args:
+            path (str): The path of the file.
+
+        Returns:
+            Optional[dict]: The size, mtime_ns and hash of the file, or None if it does not exist.
+        """
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+
+        with self.__lock:
+            cached = self.__files.get(path)
+        if (
+            cached is not None
+            and cached["size"] == stat.st_size
+            and cached["mtime_ns"] == stat.st_mtime_ns
+        ):
+            return cached
+
+        fingerprint = {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "hash": hash_file(path),
+        }
+        with self.__lock:
+            self.__files[path] = fingerprint
+            self.__changed_files.add(path)
+        return fingerprint
+
+    def is_up_to_date(
+        self, task_name: str, inputs: list[str], outputs: list[str]
+    ) -> bool:
+        """
+        Check if the outputs of a task are up to date with respect to its inputs.
+
+        The outputs are up to date when they all exist and either every output
+        is newer than every input, or the contents of the inputs and outputs
+        are identical to those recorded when the task last succeeded.
+
+        Args:
+            task_name (str): The name of the task.
+            inputs (list[str]): The files read by the task.
+            outputs (list[str]): The files written by the task.
+
+        Returns:
+            bool: True if the task does not need to be run.
+        """
+        if not outputs or not all(os.path.exists(path) for path in outputs):
+            return False
+
+        if inputs and all(os.path.exists(path) for path in inputs):
+            newest_input = max(os.stat(path).st_mtime_ns for path in inputs)
+            oldest_output = min(os.stat(path).st_mtime_ns for path in outputs)
+            if oldest_output > newest_input:
+                return True
+
+        with self.__lock:
+            recorded = self.__tasks.get(task_name)
+        if recorded is None:
+            return False
+
+        return recorded == self.__task_fingerprints(inputs, outputs)
+
+    def record(self, task_name: str, inputs: list[str], outputs: list[str]) -> None:
+        """
+        Record the fingerprints of a task's files after it has succeeded.
+
+        Args:
+            task_name (str): The name of the task.
+            inputs (list[str]): The files read by the task.
+            outputs (list[str]): The files written by the task.
+        """
+        fingerprints = self.__task_fingerprints(inputs, outputs)
+        with self.__lock:
+            self.__tasks[task_name] = fingerprints
+            self.__changed_tasks.add(task_name)
+            self.__save()
+
+    def __task_fingerprints(self, inputs: list[str], outputs: list[str]) -> dict:
+        """
+        Get the content hashes of the files read and written by a task.
+
+        Args:
+            inputs (list[str]): The files read by the task.
+            outputs (list[str]): The files written by the task.
+
+        Returns:
+            dict: The hash of each input and output, None for missing files.
+        """
+
+        def file_hash(path: str) -> Optional[str]:
+            fingerprint = self.fingerprint(path)
+            return fingerprint["hash"] if fingerprint is not None else None
+
+        return {
+            "inputs": {path: file_hash(path) for path in inputs},
+            "outputs": {path: file_hash(path) for path in outputs},
+        }
+
+    def __save(self) -> None:
+        """
+        Merge the entries changed by this process into the cache on disk,
+        replacing the previous file atomically.
+        """
+        os.makedirs(os.path.dirname(self.__filename), exist_ok=True)
+        with open(f"{self.__filename}.lock", "a") as lock:
+            try:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+            except OSError as e:
+                # i.e. a Lustre file system mounted without flock support
+                log.warning(f"Saving {self.__filename} without a lock: {e}")
+            files, tasks = self.__load()
+            files.update({path: self.__files[path] for path in self.__changed_files})
+            tasks.update({name: self.__tasks[name] for name in self.__changed_tasks})
+            self.__files, self.__tasks = files, tasks
+            self.__changed_files.clear()
+            self.__changed_tasks.clear()
+
+            temporary_filename = f"{self.__filename}.tmp.{os.getpid()}"
+            with open(temporary_filename, "w") as f:
+                json.dump({"files": files, "tasks": tasks}, f, indent=2)
+            os.replace(temporary_filename, self.__filename)
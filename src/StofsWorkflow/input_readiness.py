@@ -0,0 +1,483 @@
+import os
+import threading
+import time
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Optional
+
+from .resources import parse_size
+from .stofs_logger import get_stofs_logger
+
+log = get_stofs_logger()
+
+CYCLE_FORMAT = "%Y%m%d%H"
+
+
+@dataclass
+class UpstreamInput:
+    """
+    An input read from an upstream system: the file of the current cycle
+    followed by the files of earlier cycles which can stand in for it.
+    """
+
+    name: str
+    candidates: list[str]
+
+
+@dataclass
+class UpstreamSource:
+    """
+    A set of files produced by an upstream system, i.e. the GFS forecast hours.
+
+    The primary template names the file of each forecast hour, with {pdy},
+    {cyc} and {hour} replaced. Each window is the forecast hours first to last
+    (by step) of the cycle offset by the given hours from the cycle being run,
+    so that a forcing series can be pieced together from the first hours of
+    several earlier cycles. A source without windows is a single file of the
+    cycle. A file which is missing, smaller than min_size bytes or modified
+    less than settle_time seconds ago is not ready. When the primary file of
+    an hour is not ready by the deadline (seconds after the scan starts), the
+    backup template (the primary template if not given) is tried for each of
+    backup_cycles, hours relative to the cycle being run, with the forecast
+    hour shifted so that the file is valid at the same time. The files found
+    are written, one per line, to list_file, and the scan fails when more than
+    allow_missing files are found for neither cycle.
+    """
+
+    name: str
+    primary: str
+    backup: Optional[str] = field(default=None)
+    backup_cycles: list[int] = field(default_factory=list)
+    windows: list[tuple[int, int, int, int]] = field(default_factory=list)
+    min_size: int = field(default=0)
+    settle_time: float = field(default=0.0)
+    deadline: float = field(default=0.0)
+    poll_interval: float = field(default=30.0)
+    list_file: Optional[str] = field(default=None)
+    allow_missing: int = field(default=0)
+
+    @staticmethod
+    def from_dict(name: str, attributes: dict) -> "UpstreamSource":
+        """
+        Create an upstream source from a validated configuration dictionary.
+
+        Args:
+            name (str): The name of the source.
+            attributes (dict): The source's entry in the upstream section of the configuration file.
+
+        Returns:
+            UpstreamSource: The upstream source.
+        """
+        windows = [
+            (
+                window.get("cycle", 0),
+                window["first"],
+                window["last"],
+                window.get("step", 1),
+            )
+            for window in attributes.get("windows", [])
+        ]
+        if "hours" in attributes:
+            hours = attributes["hours"]
+            windows.insert(0, (0, hours["first"], hours["last"], hours.get("step", 1)))
+        return UpstreamSource(
+            name=name,
+            primary=os.path.expandvars(attributes["primary"]),
+            backup=os.path.expandvars(attributes["backup"])
+            if "backup" in attributes
+            else None,
+            backup_cycles=attributes.get("backup_cycles", []),
+            windows=windows,
+            min_size=parse_size(attributes.get("min_size", 0)),
+            settle_time=attributes.get("settle_time", 0.0),
+            deadline=attributes.get("deadline", 0.0),
+            poll_interval=attributes.get("poll_interval", 30.0),
+            list_file=os.path.expandvars(attributes["list_file"])
+            if "list_file" in attributes
+            else None,
+            allow_missing=attributes.get("allow_missing", 0),
+        )
+
+    def inputs(self, cycle: str) -> list[UpstreamInput]:
+        """
+        Get the inputs of a cycle.
+
+        Args:
+            cycle (str): The cycle as YYYYMMDDHH.
+
+        Returns:
+            list[UpstreamInput]: One input for each forecast hour of each
+                window, in order, or a single input when the source has no
+                windows.
+        """
+        start = datetime.strptime(cycle, CYCLE_FORMAT)
+        windows = self.windows if self.windows else [(0, 0, 0, 1)]
+        inputs = []
+        for window_offset, first, last, step in windows:
+            window_cycle = start + timedelta(hours=window_offset)
+            for hour in range(first, last + 1, step):
+                candidates = [UpstreamSource.__render(self.primary, window_cycle, hour)]
+                for offset in self.backup_cycles:
+                    # The forecast hour of the backup cycle valid at the same time
+                    backup_hour = window_offset + hour - offset
+                    if backup_hour < 0 or offset == window_offset:
+                        continue
+                    candidates.append(
+                        UpstreamSource.__render(
+                            self.backup if self.backup is not None else self.primary,
+                            start + timedelta(hours=offset),
+                            backup_hour,
+                        )
+                    )
+                if not self.windows:
+                    name = self.name
+                elif window_offset == 0:
+                    name = f"{self.name} f{hour:03d}"
+                else:
+                    name = f"{self.name} {window_cycle:%Y%m%d%H} f{hour:03d}"
+                inputs.append(UpstreamInput(name, candidates))
+        return inputs
+
+    @staticmethod
+    def __render(template: str, cycle: datetime, hour: int) -> str:
+        """
+        Fill in the file name template of a cycle and forecast hour.
+
+        Args:
+            template (str): The template.
+            cycle (datetime): The cycle.
+            hour (int): The forecast hour.
+
+        Returns:
+            str: The path of the file.
+        """
+        return template.format(
+            pdy=cycle.strftime("%Y%m%d"), cyc=cycle.strftime("%H"), hour=hour
+        )
+
+
+class StatCache:
+    """
+    Class which caches the metadata of upstream files during a scan.
+
+    Each directory is listed once per poll, so a file which does not exist yet
+    costs no stat call, and the size and modification time of each existing
+    file are read once per poll however many inputs refer to it. On a
+    parallel file system a listing is much cheaper than a failed stat of each
+    missing file.
+    """
+
+    def __init__(self) -> None:
+        """
+        Initialize the StatCache.
+        """
+        self.__lock = threading.Lock()
+        self.__listings: dict[str, set[str]] = {}
+        self.__stats: dict[str, Optional[tuple[int, float]]] = {}
+
+    def clear(self) -> None:
+        """
+        Forget everything, so that the next poll sees the current state of the files.
+        """
+        with self.__lock:
+            self.__listings.clear()
+            self.__stats.clear()
+
+    def stat(self, path: str) -> Optional[tuple[int, float]]:
+        """
+        Get the size and modification time of a file.
+
+        Args:
+            path (str): The path of the file.
+
+        Returns:
+            Optional[tuple[int, float]]: The size in bytes and modification
+                time of the file, or None if it does not exist.
+        """
+        with self.__lock:
+            if path in self.__stats:
+                return self.__stats[path]
+
+        directory, name = os.path.split(path)
+        result = None
+        if name in self.__listing(directory):
+            try:
+                stat = os.stat(path)
+                result = (stat.st_size, stat.st_mtime)
+            except OSError:
+                pass
+        with self.__lock:
+            self.__stats[path] = result
+        return result
+
+    def __listing(self, directory: str) -> set[str]:
+        """
+        Get the names of the files in a directory.
+
+        Args:
+            directory (str): The directory.
+
+        Returns:
+            set[str]: The names, empty if the directory does not exist.
+        """
+        with self.__lock:
+            if directory in self.__listings:
+                return self.__listings[directory]
+        try:
+            names = set(os.listdir(directory))
+        except OSError:
+            names = set()
+        with self.__lock:
+            self.__listings[directory] = names
+        return names
+
+
+@dataclass
+class ScanResult:
+    """
+    The outcome of a scan: for each input, in order, the file to use and
+    whether it is the primary file, a backup or missing.
+    """
+
+    inputs: list[UpstreamInput] = field(default_factory=list)
+    files: list[Optional[str]] = field(default_factory=list)
+    sources: list[str] = field(default_factory=list)
+
+    def count(self, source: str) -> int:
+        """
+        Count the inputs which were found in a given way.
+
+        Args:
+            source (str): primary, backup or missing.
+
+        Returns:
+            int: The number of inputs.
+        """
+        return self.sources.count(source)
+
+    def write_list(self, list_file: str) -> None:
+        """
+        Write the files found, one per line and in order, for the shell scripts which read them.
+
+        Args:
+            list_file (str): The file to write.
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(list_file)), exist_ok=True)
+        temporary = f"{list_file}.tmp"
+        with open(temporary, "w") as f:
+            f.writelines(f"{path}\n" for path in self.files if path is not None)
+        os.replace(temporary, list_file)
+
+
+class InputScanner:
+    """
+    Class which checks whether upstream inputs are ready.
+
+    Every poll checks all of the inputs which are not yet ready at once, from
+    a pool of threads, since a stat on a parallel file system costs a round
+    trip to the metadata server and the round trips overlap. An input is
+    reported as soon as its primary file is ready, so that processing can
+    start on the first files while the scan waits for the rest. Inputs whose
+    primary file is not ready by the deadline fall back to the first backup
+    which is.
+    """
+
+    def __init__(
+        self,
+        *,
+        workers: int = 16,
+        min_size: int = 0,
+        settle_time: float = 0.0,
+        cache: Optional[StatCache] = None,
+    ) -> None:
+        """
+        Initialize the InputScanner.
+
+        Args:
+            workers (int): The number of files checked at once. Defaults to 16.
+            min_size (int): The size in bytes below which a file is not ready. Defaults to 0.
+            settle_time (float): The time in seconds since the last modification
+                before which a file is not ready. Defaults to 0.
+            cache (StatCache, optional): The cache of file metadata, which may be
+                shared by scanners of files in the same directories.
+        """
+        self.__workers = workers
+        self.__min_size = min_size
+        self.__settle_time = settle_time
+        self.__cache = cache if cache is not None else StatCache()
+
+    def is_ready(self, path: str) -> bool:
+        """
+        Check whether a file is ready to be read.
+
+        Args:
+            path (str): The path of the file.
+
+        Returns:
+            bool: True if the file exists, is big enough and is not being written.
+        """
+        stat = self.__cache.stat(path)
+        if stat is None:
+            return False
+        size, mtime = stat
+        return size >= self.__min_size and time.time() - mtime >= self.__settle_time
+
+    def scan_iter(
+        self,
+        inputs: list[UpstreamInput],
+        *,
+        deadline: float = 0.0,
+        poll_interval: float = 30.0,
+    ) -> Iterator[tuple[int, Optional[str], str]]:
+        """
+        Find the file to use for each input, reporting each as soon as it is found.
+
+        Args:
+            inputs (list[UpstreamInput]): The inputs.
+            deadline (float): How long to wait for the primary files, in seconds. Defaults to 0.
+            poll_interval (float): The time between checks in seconds. Defaults to 30.
+
+        Yields:
+            tuple[int, Optional[str], str]: The index of an input, the file to
+                use (None if there is none) and primary, backup or missing.
+        """
+        end_time = time.monotonic() + deadline
+        pending = list(range(len(inputs)))
+        with ThreadPoolExecutor(max_workers=self.__workers) as pool:
+            while True:
+                self.__cache.clear()
+                ready = list(
+                    pool.map(
+                        lambda index: self.is_ready(inputs[index].candidates[0]),
+                        pending,
+                    )
+                )
+                for index, is_ready in zip(pending, ready):
+                    if is_ready:
+                        yield index, inputs[index].candidates[0], "primary"
+                pending = [
+                    index for index, is_ready in zip(pending, ready) if not is_ready
+                ]
+                remaining = end_time - time.monotonic()
+                if not pending or remaining <= 0:
+                    break
+                log.info(
+                    f"Waiting for {len(pending)} of {len(inputs)} inputs, "
+                    f"i.e. {inputs[pending[0]].candidates[0]}, for up to {remaining:.0f}s"
+                )
+                time.sleep(min(poll_interval, remaining))
+
+            backups = list(
+                pool.map(lambda index: self.__backup(inputs[index]), pending)
+            )
+        for index, backup in zip(pending, backups):
+            yield index, backup, "backup" if backup is not None else "missing"
+
+    def scan(
+        self,
+        inputs: list[UpstreamInput],
+        *,
+        deadline: float = 0.0,
+        poll_interval: float = 30.0,
+    ) -> ScanResult:
+        """
+        Find the file to use for each input.
+
+        Args:
+            inputs (list[UpstreamInput]): The inputs.
+            deadline (float): How long to wait for the primary files, in seconds. Defaults to 0.
+            poll_interval (float): The time between checks in seconds. Defaults to 30.
+
+        Returns:
+            ScanResult: The file to use for each input, in order.
+        """
+        files: list[Optional[str]] = [None] * len(inputs)
+        sources = ["missing"] * len(inputs)
+        for index, path, source in self.scan_iter(
+            inputs, deadline=deadline, poll_interval=poll_interval
+        ):
+            files[index] = path
+            sources[index] = source
+        return ScanResult(inputs, files, sources)
+
+    def __backup(self, upstream_input: UpstreamInput) -> Optional[str]:
+        """
+        Find the first backup of an input which is ready.
+
+        Args:
+            upstream_input (UpstreamInput): The input.
+
+        Returns:
+            Optional[str]: The backup file, or None if none is ready.
+        """
+        for path in upstream_input.candidates[1:]:
+            if self.is_ready(path):
+                return path
+        return None
+
+
+def check_upstream(
+    sources: list[UpstreamSource], cycle: str, *, wait: bool = True, workers: int = 16
+) -> dict[str, ScanResult]:
+    """
+    Find the files of upstream sources for a cycle, write their list files
+    and check that enough of them were found.
+
+    Args:
+        sources (list[UpstreamSource]): The upstream sources.
+        cycle (str): The cycle as YYYYMMDDHH.
+        wait (bool): Wait up to each source's deadline for its primary files. Defaults to True.
+        workers (int): The number of files each source checks at once. Defaults to 16.
+
+    Returns:
+        dict[str, ScanResult]: The result of each source.
+
+    Raises:
+        RuntimeError: If more files of a source are missing than it allows.
+    """
+    cache = StatCache()
+
+    def scan(source: UpstreamSource) -> ScanResult:
+        start_time = time.monotonic()
+        scanner = InputScanner(
+            workers=workers,
+            min_size=source.min_size,
+            settle_time=source.settle_time,
+            cache=cache,
+        )
+        result = scanner.scan(
+            source.inputs(cycle),
+            deadline=source.deadline if wait else 0.0,
+            poll_interval=source.poll_interval,
+        )
+        log.info(
+            f"{source.name}: {result.count('primary')} primary, "
+            f"{result.count('backup')} backup and {result.count('missing')} missing "
+            f"of {len(result.files)} files, checked in {time.monotonic() - start_time:.1f}s"
+        )
+        for upstream_input, source_type in zip(result.inputs, result.sources):
+            if source_type == "missing":
+                log.warning(
+                    f"No file for {upstream_input.name}, tried "
+                    + ", ".join(upstream_input.candidates)
+                )
+        if source.list_file is not None:
+            result.write_list(source.list_file)
+        return result
+
+    with ThreadPoolExecutor(max_workers=max(len(sources), 1)) as pool:
+        results = dict(
+            zip((source.name for source in sources), pool.map(scan, sources))
+        )
+
+    failures = [
+        f"{source.name} is missing {results[source.name].count('missing')} files"
+        for source in sources
+        if results[source.name].count("missing") > source.allow_missing
+    ]
+    if failures:
+        msg = "Upstream inputs are not ready: " + "; ".join(failures)
+        raise RuntimeError(msg)
+    return results
@@ -1,17 +1,22 @@
+from typing import Optional
+
 from .adcircmodel import AdcircModel
 from .model_type import ModelType
 from .schismmodel import SchismModel
 from .stofs_config import StofsConfig
 from .stofs_model import StofsModel
+from .stofs_run_options import StofsRunOptions
 
 
-def model_factory(config: StofsConfig) -> StofsModel:
+def model_factory(
+    config: StofsConfig, options: Optional[StofsRunOptions] = None
+) -> StofsModel:
     """
     Factory function to create a model instance based on the configuration object.
     """
     if config.model_type == ModelType.ADCIRC_MODEL:
-        return AdcircModel(config)
+        return AdcircModel(config, options)
     if config.model_type == ModelType.SCHISM_MODEL:
-        return SchismModel(config)
+        return SchismModel(config, options)
     msg = f"Unknown model type: {config.model_type}"
     raise ValueError(msg)
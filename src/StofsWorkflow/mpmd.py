@@ -0,0 +1,264 @@
+import dataclasses
+import os
+import shlex
+import shutil
+import time
+from collections.abc import Callable
+from typing import TYPE_CHECKING, Optional
+
+from .execution_policy import ExecutionAttributes
+from .script_runner import ProcessSupervisor, ScriptError
+from .stofs_logger import get_stofs_logger
+from .stofs_task import StofsTask
+
+if TYPE_CHECKING:
+    from .stofs_model import StofsModel
+
+log = get_stofs_logger()
+
+# The MPI launcher and the command farm run by each of its ranks on WCOSS2
+MPI_LAUNCHER = "mpiexec"
+CFP = "cfp"
+
+
+def cfp_command(command_file: str, num_commands: int) -> Optional[list[str]]:
+    """
+    Get the command which runs the lines of a command file as the ranks of
+    one MPI job through cfp.
+
+    Args:
+        command_file (str): The command file, with one command per line.
+        num_commands (int): The number of commands in the file.
+
+    Returns:
+        Optional[list[str]]: The launch command, or None if mpiexec or cfp is not available.
+    """
+    launcher = shutil.which(MPI_LAUNCHER)
+    cfp = shutil.which(CFP)
+    if launcher is None or cfp is None:
+        return None
+    return [launcher, "-n", str(num_commands), cfp, command_file]
+
+
+def write_command_file(
+    command_file: str,
+    commands: dict[int, list[str]],
+    log_files: dict[int, str],
+    status_prefix: str,
+) -> None:
+    """
+    Write a cfp command file.
+
+    Each line runs one command with its output written to its own log file,
+    and leaves its exit code, start time and end time in <status_prefix>.<index>,
+    since cfp only reports whether any of the commands failed.
+
+    Args:
+        command_file (str): The command file to write.
+        commands (dict[int, list[str]]): The command of each step, by step index.
+        log_files (dict[int, str]): The log file of each step, by step index.
+        status_prefix (str): The prefix of the exit status file of each step.
+    """
+    os.makedirs(os.path.dirname(command_file), exist_ok=True)
+    lines = []
+    for index, command in commands.items():
+        status_file = f"{status_prefix}.{index}"
+        if os.path.exists(status_file):
+            os.unlink(status_file)
+        os.makedirs(os.path.dirname(log_files[index]), exist_ok=True)
+        step = (
+            "start=$(date +%s.%N); "
+            f"{shlex.join(command)} >> {shlex.quote(log_files[index])} 2>&1; "
+            "code=$?; "
+            f'echo "$code $start $(date +%s.%N)" > {shlex.quote(status_file)}; '
+            "exit $code"
+        )
+        lines.append(f"/bin/bash -c {shlex.quote(step)}")
+    with open(command_file, "w") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def read_status(status_prefix: str, index: int) -> Optional[tuple[int, float, float]]:
+    """
+    Read the exit status file left by a step.
+
+    Args:
+        status_prefix (str): The prefix of the exit status file of each step.
+        index (int): The step index.
+
+    Returns:
+        Optional[tuple[int, float, float]]: The exit code, start time and end
+            time of the step, or None if the step did not finish.
+    """
+    try:
+        with open(f"{status_prefix}.{index}") as f:
+            exit_code, start_time, end_time = f.read().split()
+        return int(exit_code), float(start_time), float(end_time)
+    except (OSError, ValueError):
+        return None
+
+
+def run_mpmd(
+    model: "StofsModel",
+    task: StofsTask,
+    execution_attributes: ExecutionAttributes,
+    run_separately: Callable[[ExecutionAttributes], None],
+) -> None:
+    """
+    Run the command lines of an MPMD task of a model at the same time.
+
+    When mpiexec and cfp are available, the commands run as the ranks of a
+    single MPI job, otherwise (or when max_concurrent limits how many may
+    run at once) each command is started as its own process. Either way
+    every command has its own log file and exit code, and commands which
+    completed in the run being resumed are skipped. Commands which fail
+    under cfp are retried as separate processes.
+
+    Args:
+        model (StofsModel): The model the task belongs to.
+        task (StofsTask): The task whose commands are run.
+        execution_attributes (ExecutionAttributes): The execution attributes for the task
+        run_separately (Callable[[ExecutionAttributes], None]): Runs each command
+            of the task as its own process, with the given execution attributes.
+    """
+    run_state = model._run_state()
+    pending = {
+        index: script
+        for index, script in enumerate(task.legacy_task_list())
+        if run_state is None
+        or not run_state.is_script_complete(task.name(), index, script)
+    }
+    directory = os.path.join(
+        model.config().state_directory, "mpmd", model.options().cycle
+    )
+    command_file = os.path.join(directory, f"{task.name()}.cmdfile")
+    launch = None
+    if len(pending) > 1 and execution_attributes.max_concurrent is None:
+        launch = cfp_command(command_file, len(pending))
+    if launch is None:
+        run_separately(execution_attributes)
+        return
+
+    failures = _run_cfp(
+        model,
+        task,
+        pending,
+        launch,
+        command_file=command_file,
+        status_prefix=os.path.join(directory, f"{task.name()}.status"),
+        execution_attributes=execution_attributes,
+    )
+    if not failures:
+        return
+    if execution_attributes.retries > 0:
+        log.warning(
+            f"Retrying {len(failures)} failed commands of task {task.name()} "
+            f"in {execution_attributes.retry_backoff:g}s"
+        )
+        time.sleep(execution_attributes.retry_backoff)
+        run_separately(
+            dataclasses.replace(
+                execution_attributes,
+                retries=execution_attributes.retries - 1,
+                retry_backoff=execution_attributes.retry_backoff * 2,
+            )
+        )
+        return
+    msg = f"{len(failures)} of {len(pending)} commands failed: " + "; ".join(failures)
+    raise ScriptError(msg, next(iter(failures.values())))
+
+
+def _run_cfp(
+    model: "StofsModel",
+    task: StofsTask,
+    pending: dict[int, str],
+    launch: list[str],
+    *,
+    command_file: str,
+    status_prefix: str,
+    execution_attributes: ExecutionAttributes,
+) -> dict[str, int]:
+    """
+    Run the command lines of an MPMD task as one MPI job through cfp, and
+    record the exit code of each command.
+
+    Args:
+        model (StofsModel): The model the task belongs to.
+        task (StofsTask): The task whose commands are run.
+        pending (dict[int, str]): The command lines to run, by index.
+        launch (list[str]): The mpiexec command which runs cfp.
+        command_file (str): The cfp command file.
+        status_prefix (str): The prefix of the exit status file of each command.
+        execution_attributes (ExecutionAttributes): The execution attributes for the task
+
+    Returns:
+        dict[str, int]: The exit code of each failed command, by a description of its failure.
+    """
+    log_files = {
+        index: model._log_file(
+            f"{task.name()}.{index}.{os.path.basename(shlex.split(script)[0])}"
+        )
+        for index, script in pending.items()
+    }
+    write_command_file(
+        command_file,
+        {
+            index: model._script_command(task, script)
+            for index, script in pending.items()
+        },
+        log_files,
+        status_prefix,
+    )
+    log_file = model._log_file(f"{task.name()}.cfp")
+    log.info(
+        f"Running {len(pending)} commands of task {task.name()} through cfp, "
+        f"output in {log_file}"
+    )
+    supervisor = ProcessSupervisor(
+        launch,
+        log_file,
+        timeout=execution_attributes.timeout,
+        sample_interval=execution_attributes.sample_interval,
+        environment=model._environment(task.name(), model._threads(task)),
+        cwd=model._work_directory(task.name()),
+    )
+    start_time = time.time()
+    with model._trace().span(
+        f"{task.name()} cfp", "script", {"task": task.name()}
+    ) as span_args:
+        exit_code = supervisor.run()
+        span_args["exit_code"] = exit_code
+
+    run_state = model._run_state()
+    failures = {}
+    for index, script in pending.items():
+        status = read_status(status_prefix, index)
+        step_exit_code = status[0] if status is not None else (exit_code or 1)
+        model._record_script(
+            {
+                "task": task.name(),
+                "script": script,
+                "exit_code": step_exit_code,
+                "timed_out": status is None and supervisor.timed_out(),
+                "start_time": status[1] if status is not None else start_time,
+                "wall_time": status[2] - status[1] if status is not None else 0.0,
+            }
+        )
+        if run_state is not None:
+            run_state.finish_script(task.name(), index, script, step_exit_code)
+        if step_exit_code != 0:
+            log.error(
+                f"Command {script} failed with return code {step_exit_code}, "
+                f"output in {log_files[index]}"
+            )
+            failures[f"{script} failed with return code {step_exit_code}"] = (
+                step_exit_code
+            )
+
+    usage = supervisor.resource_usage()
+    log.info(
+        f"cfp finished {len(pending) - len(failures)} of {len(pending)} commands "
+        f"of task {task.name()} in {usage.wall_time:.1f}s "
+        f"(user {usage.user_time:.1f}s, sys {usage.system_time:.1f}s)"
+    )
+    return failures
@@ -0,0 +1,270 @@
+import os
+import sqlite3
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from statistics import median
+from typing import Optional
+
+SCRIPT_METRICS = [
+    "wall_time",
+    "user_time",
+    "system_time",
+    "max_rss_kb",
+    "read_bytes",
+    "write_bytes",
+    "read_chars",
+    "write_chars",
+]
+
+SPARK_CHARACTERS = "▁▂▃▄▅▆▇█"
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    """
+    Compute a percentile of a list of values using linear interpolation.
+
+    Args:
+        values (list[float]): The values.
+        fraction (float): The percentile as a fraction between 0 and 1.
+
+    Returns:
+        float: The percentile of the values.
+    """
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def sparkline(values: list[float]) -> str:
+    """
+    Draw a list of values as a line of block characters.
+
+    Args:
+        values (list[float]): The values, oldest first.
+
+    Returns:
+        str: One character per value, scaled between the smallest and largest value.
+    """
+    low, high = min(values), max(values)
+    if high == low:
+        return SPARK_CHARACTERS[0] * len(values)
+    scale = (len(SPARK_CHARACTERS) - 1) / (high - low)
+    return "".join(SPARK_CHARACTERS[round((v - low) * scale)] for v in values)
+
+
+class PerfDatabase:
+    """
+    Class representing the historical performance database of the workflow.
+
+    The timings of every task and the resource usage of every script are
+    appended to a SQLite database in the state directory. The database is the
+    source of the task durations used to prioritise the critical path, and of
+    the trends reported by `stofs perf report`.
+    """
+
+    DATABASE_FILE = "perf.sqlite"
+
+    def __init__(self, state_directory: str) -> None:
+        """
+        Initialize the PerfDatabase, creating the database if it does not exist.
+
+        Args:
+            state_directory (str): The directory where the database is kept.
+        """
+        os.makedirs(state_directory, exist_ok=True)
+        self.__filename = os.path.join(state_directory, PerfDatabase.DATABASE_FILE)
+        with self.__connect() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS task_runs ("
+                "cycle TEXT, stage TEXT, task TEXT, start_time REAL, "
+                "duration REAL, exit_code INTEGER, model TEXT)"
+            )
+            columns = [
+                row[1] for row in connection.execute("PRAGMA table_info(task_runs)")
+            ]
+            if "model" not in columns:
+                # Databases written before runs were recorded by model
+                connection.execute("ALTER TABLE task_runs ADD COLUMN model TEXT")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS script_runs ("
+                "cycle TEXT, stage TEXT, task TEXT, script TEXT, start_time REAL, "
+                "exit_code INTEGER, timed_out INTEGER, "
+                + ", ".join(f"{metric} REAL" for metric in SCRIPT_METRICS)
+                + ")"
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS task_runs_model_task "
+                "ON task_runs (model, stage, task, start_time)"
+            )
+
+    def filename(self) -> str:
+        """
+        Get the path of the database file.
+
+        Returns:
+            str: The path of the database file.
+        """
+        return self.__filename
+
+    @contextmanager
+    def __connect(self) -> Iterator[sqlite3.Connection]:
+        """
+        Open a connection to the database, committing and closing it when done.
+        A connection is opened for each operation so that the database can be
+        used from several threads.
+
+        Yields:
+            sqlite3.Connection: The database connection.
+        """
+        connection = sqlite3.connect(self.__filename, timeout=60)
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def record_task(
+        self,
+        model: str,
+        cycle: str,
+        stage: str,
+        task: str,
+        duration: float,
+        *,
+        exit_code: int = 0,
+        start_time: Optional[float] = None,
+    ) -> None:
+        """
+        Record the execution of a task.
+
+        Args:
+            model (str): The name of the model configuration the task belongs to.
+            cycle (str): The cycle the task was run for.
+            stage (str): The stage the task belongs to.
+            task (str): The name of the task.
+            duration (float): The wall time of the task in seconds.
+            exit_code (int): The exit code of the task. Defaults to 0.
+            start_time (float, optional): The start time of the task, defaults to now minus the duration.
+        """
+        if start_time is None:
+            start_time = time.time() - duration
+        with self.__connect() as connection:
+            connection.execute(
+                "INSERT INTO task_runs "
+                "(model, cycle, stage, task, start_time, duration, exit_code) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (model, cycle, stage, task, start_time, duration, exit_code),
+            )
+
+    def record_script(self, record: dict) -> None:
+        """
+        Record the execution and resource usage of a script.
+
+        Args:
+            record (dict): The script metrics, as written to the cycle's metrics file.
+        """
+        columns = ["cycle", "stage", "task", "script", "start_time", "exit_code"]
+        values = [record.get(column) for column in columns]
+        values.append(int(record.get("timed_out", False)))
+        values.extend(record.get(metric, 0) for metric in SCRIPT_METRICS)
+        with self.__connect() as connection:
+            connection.execute(
+                f"INSERT INTO script_runs VALUES ({', '.join('?' * len(values))})",
+                values,
+            )
+
+    def task_durations(
+        self, model: str, stage: str, task: str, limit: int
+    ) -> list[float]:
+        """
+        Get the most recent durations of a task's successful runs. Tasks are
+        identified by model and stage as well as by name, since the built-in
+        task names (i.e. post) are the same in every configuration.
+
+        Args:
+            model (str): The name of the model configuration the task belongs to.
+            stage (str): The stage the task belongs to.
+            task (str): The name of the task.
+            limit (int): The maximum number of durations to return.
+
+        Returns:
+            list[float]: The durations in seconds, oldest first.
+        """
+        with self.__connect() as connection:
+            rows = connection.execute(
+                "SELECT duration FROM task_runs "
+                "WHERE model = ? AND stage = ? AND task = ? AND exit_code = 0 "
+                "ORDER BY start_time DESC LIMIT ?",
+                (model, stage, task, limit),
+            ).fetchall()
+        return [row[0] for row in reversed(rows)]
+
+    def report(
+        self,
+        model: str,
+        stage: Optional[str] = None,
+        baseline: int = 10,
+        threshold: float = 0.2,
+    ) -> list[dict]:
+        """
+        Summarise the durations of each task of a model and flag regressions.
+
+        The latest run of each task is compared against the median of the
+        previous baseline runs; it is flagged as a regression when it is slower
+        than that median by more than the threshold.
+
+        Args:
+            model (str): The name of the model configuration to report.
+            stage (str, optional): Only report the tasks of this stage.
+            baseline (int): The number of runs before the latest used as the baseline.
+            threshold (float): The fractional slowdown treated as a regression.
+
+        Returns:
+            list[dict]: One summary per task, sorted by stage and task name.
+        """
+        query = (
+            "SELECT stage, task, duration FROM task_runs "
+            "WHERE model = ? AND exit_code = 0"
+        )
+        parameters: tuple = (model,)
+        if stage is not None:
+            query += " AND stage = ?"
+            parameters = (model, stage)
+        query += " ORDER BY start_time"
+
+        with self.__connect() as connection:
+            rows = connection.execute(query, parameters).fetchall()
+
+        durations: dict[tuple[str, str], list[float]] = {}
+        for row_stage, task, duration in rows:
+            durations.setdefault((row_stage, task), []).append(duration)
+
+        summaries = []
+        for (row_stage, task), values in sorted(durations.items()):
+            latest = values[-1]
+            baseline_values = values[-(baseline + 1) : -1]
+            baseline_median = median(baseline_values) if baseline_values else None
+            change = (
+                (latest - baseline_median) / baseline_median
+                if baseline_median
+                else None
+            )
+            summaries.append(
+                {
+                    "stage": row_stage,
+                    "task": task,
+                    "runs": len(values),
+                    "p50": percentile(values, 0.5),
+                    "p90": percentile(values, 0.9),
+                    "p95": percentile(values, 0.95),
+                    "latest": latest,
+                    "baseline": baseline_median,
+                    "change": change,
+                    "regression": change is not None and change > threshold,
+                    "trend": sparkline(values[-(baseline + 1) :]),
+                }
+            )
+        return summaries
@@ -0,0 +1,215 @@
+import os
+import threading
+from typing import Optional
+
+from .task_metrics import read_proc_io
+
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+PAGE_SIZE_KB = os.sysconf("SC_PAGE_SIZE") // 1024
+
+
+def read_proc_stat(pid: int) -> Optional[tuple[str, int, int, int]]:
+    """
+    Read the name, parent, CPU time and resident memory of a process from /proc/<pid>/stat.
+
+    Args:
+        pid (int): The process id.
+
+    Returns:
+        Optional[tuple[str, int, int, int]]: The command name, parent pid, CPU
+            time in clock ticks and resident set size in kilobytes, or None if
+            the process no longer exists.
+    """
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            stat = f.read()
+    except OSError:
+        return None
+
+    # The command name is in parentheses and may itself contain spaces or parentheses
+    name = stat[stat.index("(") + 1 : stat.rindex(")")]
+    fields = stat[stat.rindex(")") + 2 :].split()
+    parent = int(fields[1])
+    cpu_ticks = int(fields[11]) + int(fields[12])
+    rss_kb = int(fields[21]) * PAGE_SIZE_KB
+    return name, parent, cpu_ticks, rss_kb
+
+
+def read_thread_io(pid: int) -> tuple[int, int]:
+    """
+    Read the storage I/O done by the live threads of a process.
+
+    Unlike /proc/<pid>/io, the per-thread counters do not include the I/O of
+    children the process has already reaped, so the I/O of a tool is not
+    counted again against the shell which ran it.
+
+    Args:
+        pid (int): The process id.
+
+    Returns:
+        tuple[int, int]: The bytes read from and written to storage.
+    """
+    read_bytes = 0
+    write_bytes = 0
+    try:
+        threads = os.listdir(f"/proc/{pid}/task")
+    except OSError:
+        return read_bytes, write_bytes
+
+    for thread in threads:
+        io_counters = read_proc_io(f"{pid}/task/{thread}")
+        if io_counters is not None:
+            read_bytes += io_counters.get("read_bytes", 0)
+            write_bytes += io_counters.get("write_bytes", 0)
+    return read_bytes, write_bytes
+
+
+class ProcessTreeSampler:
+    """
+    Class which samples the resource usage of a process tree in the background.
+
+    Every interval the process tree below the root process is found by walking
+    /proc, and the CPU time, resident memory and I/O of each process are read.
+    The usage is aggregated by executable name, so that the cost of the tools
+    run by a long legacy script (i.e. ncap2, wgrib2, python) can be compared.
+    """
+
+    def __init__(self, root_pid: int, interval: float) -> None:
+        """
+        Initialize the ProcessTreeSampler.
+
+        Args:
+            root_pid (int): The process id of the root of the tree.
+            interval (float): The time between samples in seconds.
+        """
+        self.__root_pid = root_pid
+        self.__interval = interval
+        self.__stop = threading.Event()
+        self.__thread = threading.Thread(target=self.__run, daemon=True)
+        self.__previous: dict[int, tuple[str, int, int, int]] = {}
+        self.__usage: dict[str, dict] = {}
+
+    def start(self) -> None:
+        """
+        Start sampling in a background thread.
+        """
+        self.__thread.start()
+
+    def stop(self) -> None:
+        """
+        Stop sampling and wait for the background thread to exit.
+        """
+        self.__stop.set()
+        if self.__thread.is_alive():
+            self.__thread.join()
+
+    def summary(self) -> dict[str, dict]:
+        """
+        Get the sampled usage aggregated by executable name.
+
+        For each executable, cpu_seconds is the CPU time used, active_seconds the
+        time during which at least one such process was running, cpu_percent the
+        average CPU use while active, peak_rss_kb the largest combined resident
+        memory seen, and read/write bytes and rates the storage I/O.
+
+        Returns:
+            dict[str, dict]: The usage of each executable name, most CPU time first.
+        """
+        summary = {}
+        for name, usage in sorted(
+            self.__usage.items(), key=lambda item: -item[1]["cpu_ticks"]
+        ):
+            cpu_seconds = usage["cpu_ticks"] / CLOCK_TICKS
+            active_seconds = usage["samples"] * self.__interval
+            summary[name] = {
+                "cpu_seconds": cpu_seconds,
+                "active_seconds": active_seconds,
+                "cpu_percent": 100.0 * cpu_seconds / active_seconds
+                if active_seconds
+                else 0.0,
+                "peak_rss_kb": usage["peak_rss_kb"],
+                "read_bytes": usage["read_bytes"],
+                "write_bytes": usage["write_bytes"],
+                "read_bytes_per_second": usage["read_bytes"] / active_seconds
+                if active_seconds
+                else 0.0,
+                "write_bytes_per_second": usage["write_bytes"] / active_seconds
+                if active_seconds
+                else 0.0,
+            }
+        return summary
+
+    def __run(self) -> None:
+        """
+        Take samples until the sampler is stopped.
+        """
+        while not self.__stop.is_set():
+            self.__sample()
+            self.__stop.wait(self.__interval)
+
+    def __tree(self) -> dict[int, tuple[str, int, int]]:
+        """
+        Find the processes in the tree below the root process.
+
+        Returns:
+            dict[int, tuple[str, int, int]]: The name, CPU ticks and resident
+                memory of each process in the tree, keyed by process id.
+        """
+        processes = {}
+        children: dict[int, list[int]] = {}
+        for entry in os.listdir("/proc"):
+            if not entry.isdigit():
+                continue
+            stat = read_proc_stat(int(entry))
+            if stat is None:
+                continue
+            processes[int(entry)] = stat
+            children.setdefault(stat[1], []).append(int(entry))
+
+        tree = {}
+        pending = [self.__root_pid]
+        while pending:
+            pid = pending.pop()
+            if pid in processes:
+                name, _, cpu_ticks, rss_kb = processes[pid]
+                tree[pid] = (name, cpu_ticks, rss_kb)
+            pending.extend(children.get(pid, []))
+        return tree
+
+    def __sample(self) -> None:
+        """
+        Take one sample of the process tree and add it to the aggregated usage.
+        """
+        current = {}
+        rss_by_name: dict[str, int] = {}
+        for pid, (name, cpu_ticks, rss_kb) in self.__tree().items():
+            read_bytes, write_bytes = read_thread_io(pid)
+            current[pid] = (name, cpu_ticks, read_bytes, write_bytes)
+
+            # Processes seen for the first time are counted from zero so that
+            # the usage of short processes started between samples is kept
+            previous = self.__previous.get(pid)
+            if previous is None or previous[0] != name:
+                previous = (name, 0, 0, 0)
+
+            usage = self.__usage.setdefault(
+                name,
+                {
+                    "cpu_ticks": 0,
+                    "samples": 0,
+                    "peak_rss_kb": 0,
+                    "read_bytes": 0,
+                    "write_bytes": 0,
+                },
+            )
+            usage["cpu_ticks"] += max(cpu_ticks - previous[1], 0)
+            usage["read_bytes"] += max(read_bytes - previous[2], 0)
+            usage["write_bytes"] += max(write_bytes - previous[3], 0)
+            rss_by_name[name] = rss_by_name.get(name, 0) + rss_kb
+
+        for name, rss_kb in rss_by_name.items():
+            usage = self.__usage[name]
+            usage["samples"] += 1
+            usage["peak_rss_kb"] = max(usage["peak_rss_kb"], rss_kb)
+
+        self.__previous = current
@@ -0,0 +1,431 @@
+import fcntl
+import hashlib
+import json
+import os
+import shlex
+import shutil
+import subprocess
+import time
+from collections.abc import Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, suppress
+from dataclasses import dataclass, field
+from typing import Optional
+
+from .stofs_logger import get_stofs_logger
+
+log = get_stofs_logger()
+
+
+@dataclass
+class CacheSettings:
+    """
+    Settings for the caches of processed products which are reused from one
+    cycle to the next, i.e. the sflux slices of GFS forecast hours which the
+    next cycle reads again. Each named cache is kept in its own directory
+    under directory, and entries unused for max_age_days are pruned.
+    """
+
+    directory: str
+    max_age_days: float = field(default=3.0)
+
+    @staticmethod
+    def from_dict(attributes: dict, state_directory: str) -> "CacheSettings":
+        """
+        Create the cache settings from a validated configuration dictionary.
+
+        Args:
+            attributes (dict): The cache section of the configuration file.
+            state_directory (str): The state directory, under which the caches are kept by default.
+
+        Returns:
+            CacheSettings: The cache settings.
+        """
+        return CacheSettings(
+            directory=os.path.abspath(os.path.expandvars(attributes["directory"]))
+            if "directory" in attributes
+            else os.path.join(state_directory, "cache"),
+            max_age_days=attributes.get("max_age_days", 3.0),
+        )
+
+
+class ProductCache:
+    """
+    Class which keeps the products made from upstream files so that they are
+    made once, however many cycles read the same files.
+
+    A product is identified by its source files, each by its path (after
+    following links, so that tasks which link the same upstream file into
+    their own directories share its products), size and modification time,
+    and by its recipe, the list of strings which describe how it is made
+    (i.e. the variables extracted and the wgrib2 subset). An upstream file is
+    never rewritten in place, so the same path, size and time mean the same
+    contents. Entries are written under a temporary name and renamed into
+    place, so processes which share the cache never see a partial entry, and
+    are read-only so a product copied out of the cache can be changed without
+    changing the entry. A product which is only read, i.e. a large subset
+    which each task cuts its own part from, can be linked into and out of the
+    cache instead of copied.
+    """
+
+    def __init__(self, directory: str) -> None:
+        """
+        Initialize the ProductCache.
+
+        Args:
+            directory (str): The directory the entries are kept in.
+        """
+        self.__directory = directory
+
+    def directory(self) -> str:
+        """
+        Get the directory the entries are kept in.
+
+        Returns:
+            str: The cache directory.
+        """
+        return self.__directory
+
+    def key(self, sources: list[str], recipe: list[str]) -> str:
+        """
+        Get the key of the product made from source files by a recipe.
+
+        Args:
+            sources (list[str]): The files the product is made from.
+            recipe (list[str]): How the product is made.
+
+        Returns:
+            str: The key of the product.
+
+        Raises:
+            FileNotFoundError: If a source file does not exist.
+        """
+        identity = {"sources": [], "recipe": recipe}
+        for source in sources:
+            path = os.path.realpath(source)
+            stat = os.stat(path)
+            identity["sources"].append([path, stat.st_size, stat.st_mtime_ns])
+        return hashlib.sha256(json.dumps(identity).encode()).hexdigest()
+
+    def entry(self, key: str) -> str:
+        """
+        Get the path of the entry for a key, which may not exist.
+
+        Args:
+            key (str): The key of the product.
+
+        Returns:
+            str: The path of the entry.
+        """
+        return os.path.join(self.__directory, key[:2], key)
+
+    def fetch(self, key: str, destination: str, *, link: bool = False) -> bool:
+        """
+        Copy a product out of the cache.
+
+        Args:
+            key (str): The key of the product.
+            destination (str): Where to put the product.
+            link (bool): Hard link the entry instead of copying it, for a product which
+                is only read. Defaults to False.
+
+        Returns:
+            bool: True if the product was in the cache.
+        """
+        entry = self.entry(key)
+        if not os.path.exists(entry):
+            return False
+        os.makedirs(os.path.dirname(os.path.abspath(destination)), exist_ok=True)
+        temporary = f"{destination}.cache.{os.getpid()}"
+        try:
+            if not link or not ProductCache.__link(entry, temporary):
+                shutil.copyfile(entry, temporary)
+        except FileNotFoundError:
+            # The entry was pruned since it was found
+            return False
+        os.replace(temporary, destination)
+        # The time of last use decides when the entry is pruned, though an
+        # entry stored by another user keeps its time
+        with suppress(PermissionError):
+            os.utime(entry)
+        return True
+
+    def store(
+        self,
+        key: str,
+        product: str,
+        metadata: Optional[dict] = None,
+        *,
+        link: bool = False,
+    ) -> None:
+        """
+        Add a product to the cache.
+
+        Args:
+            key (str): The key of the product.
+            product (str): The product to add.
+            metadata (dict, optional): What the product was made from, kept next to the entry.
+            link (bool): Hard link the product into the cache instead of copying it, for
+                a product which is only read, which leaves the product read-only. Defaults
+                to False.
+        """
+        entry = self.entry(key)
+        os.makedirs(os.path.dirname(entry), exist_ok=True)
+        temporary = f"{entry}.tmp.{os.getpid()}"
+        if not link or not ProductCache.__link(product, temporary):
+            shutil.copyfile(product, temporary)
+        os.chmod(temporary, 0o444)
+        os.replace(temporary, entry)
+        if metadata is not None:
+            with open(f"{entry}.json.tmp.{os.getpid()}", "w") as f:
+                json.dump({**metadata, "product": product, "time": time.time()}, f)
+            os.replace(f"{entry}.json.tmp.{os.getpid()}", f"{entry}.json")
+
+    def produce(
+        self,
+        key: str,
+        destination: str,
+        build: Callable[[str], None],
+        *,
+        link: bool = False,
+        metadata: Optional[dict] = None,
+    ) -> bool:
+        """
+        Make a product which several tasks of a cycle need, i.e. the RTOFS
+        subsets read by both open boundary builders. The first task to ask
+        builds the product while holding a lock on the entry, and the tasks
+        which ask while it is being built wait for it and then fetch it, so
+        the product is built once however many tasks run at the same time.
+
+        Args:
+            key (str): The key of the product.
+            destination (str): Where to put the product.
+            build (Callable[[str], None]): Makes the product at the path it is given.
+            link (bool): Hard link the entry instead of copying it, both into and out
+                of the cache, for a product which is only read. Defaults to False.
+            metadata (dict, optional): What the product was made from, kept next to the entry.
+
+        Returns:
+            bool: True if the product was in the cache, False if it was built.
+        """
+        if self.fetch(key, destination, link=link):
+            return True
+        with self.__locked(key):
+            # Another process may have built the product while this one waited
+            if self.fetch(key, destination, link=link):
+                return True
+            os.makedirs(os.path.dirname(os.path.abspath(destination)), exist_ok=True)
+            build(destination)
+            self.store(key, destination, metadata, link=link)
+        return False
+
+    def prune(self, max_age_days: float) -> int:
+        """
+        Remove the entries which have not been used for a number of days.
+
+        Args:
+            max_age_days (float): The age in days of the oldest entries to keep.
+
+        Returns:
+            int: The number of entries removed.
+        """
+        oldest = time.time() - max_age_days * 86400
+        removed = 0
+        if not os.path.isdir(self.__directory):
+            return 0
+        for prefix in os.listdir(self.__directory):
+            directory = os.path.join(self.__directory, prefix)
+            if not os.path.isdir(directory):
+                continue
+            for name in os.listdir(directory):
+                if name.endswith((".json", ".lock")):
+                    continue
+                path = os.path.join(directory, name)
+                try:
+                    if os.stat(path).st_mtime >= oldest:
+                        continue
+                    os.unlink(path)
+                except FileNotFoundError:
+                    continue
+                for extra in (f"{path}.json", f"{path}.lock"):
+                    with suppress(FileNotFoundError):
+                        os.unlink(extra)
+                removed += 1
+        log.info(
+            f"Pruned {removed} entries unused for {max_age_days:g} days from {self.__directory}"
+        )
+        return removed
+
+    @contextmanager
+    def __locked(self, key: str) -> Iterator[None]:
+        """
+        Hold the lock which lets one process at a time build the product for a key.
+
+        On a file system without flock support (i.e. Lustre mounted without
+        -o flock) the product is built without the lock: the entry is still
+        stored atomically, but tasks which ask at the same time each build it.
+
+        Args:
+            key (str): The key of the product.
+
+        Yields:
+            None: While the lock is held.
+        """
+        entry = self.entry(key)
+        os.makedirs(os.path.dirname(entry), exist_ok=True)
+        with open(f"{entry}.lock", "a") as lock:
+            try:
+                try:
+                    fcntl.flock(lock.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    log.info(f"Waiting for another process to build {entry}")
+                    start_time = time.monotonic()
+                    fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+                    log.info(f"Waited {time.monotonic() - start_time:.1f}s for {entry}")
+            except OSError as e:
+                log.warning(
+                    f"Unable to lock {entry}.lock ({e}), building the product "
+                    "without waiting for other processes"
+                )
+                yield
+                return
+            try:
+                yield
+            finally:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+
+    @staticmethod
+    def __link(source: str, destination: str) -> bool:
+        """
+        Hard link an entry out of the cache, or a product into it.
+
+        Args:
+            source (str): The entry or product.
+            destination (str): The link.
+
+        Returns:
+            bool: True if the link was made, False if the cache is on another file system.
+        """
+        try:
+            os.link(source, destination)
+        except FileNotFoundError:
+            raise
+        except OSError:
+            return False
+        return True
+
+
+def build_products(
+    cache: ProductCache,
+    products: dict[str, list[str]],
+    recipe: list[str],
+    build: Callable[[list[str], str], None],
+    *,
+    workers: int = 1,
+) -> dict[str, bool]:
+    """
+    Make products, taking those made before from the cache and building and
+    caching the rest, i.e. the sflux slices of the GFS forecast hours of a
+    cycle. Every product is attempted even when others fail.
+
+    Args:
+        cache (ProductCache): The cache.
+        products (dict[str, list[str]]): The source files of each product, by product path.
+        recipe (list[str]): How the products are made.
+        build (Callable[[list[str], str], None]): Makes a product from its source files.
+        workers (int): The number of products built at once. Defaults to 1.
+
+    Returns:
+        dict[str, bool]: Whether each product was taken from the cache.
+
+    Raises:
+        RuntimeError: If any product could not be made.
+    """
+
+    def make(product: str) -> bool:
+        sources = products[product]
+        return cache.produce(
+            cache.key(sources, recipe),
+            product,
+            lambda destination: build(sources, destination),
+            metadata={"sources": sources, "recipe": recipe},
+        )
+
+    start_time = time.monotonic()
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+        futures = {product: pool.submit(make, product) for product in products}
+
+    hits = {}
+    failures = {}
+    for product, future in futures.items():
+        try:
+            hits[product] = future.result()
+        except (OSError, RuntimeError) as e:
+            log.error(f"Unable to make {product}: {e}")
+            failures[product] = str(e)
+    log.info(
+        f"Made {len(hits)} of {len(products)} products in "
+        f"{time.monotonic() - start_time:.1f}s, {sum(hits.values())} from the "
+        f"cache in {cache.directory()}"
+    )
+    if failures:
+        msg = f"{len(failures)} of {len(products)} products were not made: " + (
+            "; ".join(f"{product}: {error}" for product, error in failures.items())
+        )
+        raise RuntimeError(msg)
+    return hits
+
+
+def read_product_list(list_file: str) -> dict[str, list[str]]:
+    """
+    Read a list of products to make, one per line as the product path
+    followed by the files it is made from, separated by spaces.
+
+    Args:
+        list_file (str): The path of the list.
+
+    Returns:
+        dict[str, list[str]]: The source files of each product, by product path.
+    """
+    products = {}
+    with open(list_file) as f:
+        for number, line in enumerate(f, start=1):
+            words = line.split()
+            if not words:
+                continue
+            if len(words) < 2:
+                msg = f"Line {number} of {list_file} names no source files"
+                raise ValueError(msg)
+            products[os.path.abspath(words[0])] = words[1:]
+    return products
+
+
+def command_builder(
+    command: str, sources: Optional[list[str]] = None
+) -> Callable[[str], None]:
+    """
+    Get a builder which makes a product by running a command, i.e. the ncks
+    subset of an RTOFS file.
+
+    Args:
+        command (str): The command, with {output} replaced by the path of the
+            product and {source} by its source files.
+        sources (list[str], optional): The source files of the product.
+
+    Returns:
+        Callable[[str], None]: The builder, which raises RuntimeError if the command fails.
+    """
+    source = " ".join(sources or [])
+
+    def build(destination: str) -> None:
+        words = [
+            word.replace("{output}", destination).replace("{source}", source)
+            for word in shlex.split(command)
+        ]
+        log.info(f"Building {destination} with {shlex.join(words)}")
+        result = subprocess.run(words, check=False)
+        if result.returncode != 0:
+            msg = f"{words[0]} failed with return code {result.returncode}"
+            raise RuntimeError(msg)
+
+    return build
@@ -0,0 +1,448 @@
+import fcntl
+import glob
+import os
+import shlex
+import shutil
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Optional
+
+from yaml import safe_load
+
+from .fingerprint import HASH_BLOCK_SIZE, hash_file, new_hasher
+from .stack_monitor import has_valid_header
+from .stofs_logger import get_stofs_logger
+from .stofs_schema import MANIFEST_SCHEMA
+
+log = get_stofs_logger()
+
+# The ioctl which makes a file share the blocks of another (a reflink) on
+# file systems with copy-on-write support, i.e. XFS and Btrfs
+FICLONE = 0x40049409
+
+# Extensions of the products whose NetCDF header is checked by default
+NETCDF_EXTENSIONS = (".nc", ".nc4")
+
+PUBLISH_METHODS = ["auto", "copy", "link"]
+
+
+class MissingProductError(ValueError):
+    """
+    Raised when the source of a product is missing, too small or without a
+    valid header, so that a product which is not required can be skipped.
+    """
+
+
+@dataclass
+class Product:
+    """
+    A product to publish: the files matching source are published to
+    directory, under name if it is given (for a single file) or under their
+    own names. A product smaller than min_size bytes, or, when validate is
+    netcdf, without a NetCDF header, is not published. A product which is not
+    required is skipped when its source is missing, smaller than min_size or
+    without its NetCDF header, instead of failing the run. When alert is set the alert command is run
+    for the product once it is in place.
+    """
+
+    source: str
+    directory: str
+    name: Optional[str] = field(default=None)
+    min_size: int = field(default=0)
+    validate: str = field(default="auto")
+    alert: Optional[str] = field(default=None)
+    required: bool = field(default=True)
+
+    @staticmethod
+    def from_dict(attributes: dict, directory: Optional[str]) -> "Product":
+        """
+        Create a product from a validated manifest entry.
+
+        Args:
+            attributes (dict): The manifest entry.
+            directory (str, optional): The directory products are published to by default.
+
+        Returns:
+            Product: The product.
+        """
+        if "directory" in attributes:
+            directory = attributes["directory"]
+        if directory is None:
+            msg = f"No directory to publish {attributes['source']} to"
+            raise ValueError(msg)
+        return Product(
+            source=os.path.abspath(os.path.expandvars(attributes["source"])),
+            directory=os.path.abspath(os.path.expandvars(directory)),
+            name=attributes.get("name"),
+            min_size=attributes.get("min_size", 0),
+            validate=attributes.get("validate", "auto"),
+            alert=attributes.get("alert"),
+            required=attributes.get("required", True),
+        )
+
+    def files(self) -> list[tuple[str, str]]:
+        """
+        Get the files to publish.
+
+        Returns:
+            list[tuple[str, str]]: The source and destination of each file.
+        """
+        if glob.has_magic(self.source):
+            sources = sorted(glob.glob(self.source))
+            if not sources:
+                msg = f"No files match {self.source}"
+                raise FileNotFoundError(msg)
+        else:
+            sources = [self.source]
+        if self.name is not None and len(sources) > 1:
+            msg = f"{self.source} matches {len(sources)} files but names one product"
+            raise ValueError(msg)
+        return [
+            (
+                source,
+                os.path.join(
+                    self.directory,
+                    self.name if self.name is not None else os.path.basename(source),
+                ),
+            )
+            for source in sources
+        ]
+
+
+@dataclass
+class Manifest:
+    """
+    A list of products to publish, and how to publish them.
+
+    Up to workers files are published at once. With method auto a file is
+    reflinked when the file system supports it and copied otherwise, so the
+    product never shares its data with the source. With link it is hard
+    linked, which shares the file with the source, so the source must not be
+    rewritten in place afterwards, and with copy it is always copied. The
+    alert command is run for each product which has an alert type, with
+    {alert}, {destination} and {source} replaced, i.e.
+    "$DBNROOT/bin/dbn_alert MODEL {alert} $job {destination}".
+    """
+
+    products: list[Product] = field(default_factory=list)
+    workers: int = field(default=4)
+    method: str = field(default="auto")
+    alert_command: Optional[str] = field(default=None)
+
+    @staticmethod
+    def from_file(manifest_file: str) -> "Manifest":
+        """
+        Read a manifest from a YAML (or JSON) file.
+
+        Args:
+            manifest_file (str): The path of the manifest.
+
+        Returns:
+            Manifest: The manifest.
+        """
+        with open(manifest_file) as f:
+            attributes = MANIFEST_SCHEMA.validate(safe_load(f))
+        directory = attributes.get("directory")
+        return Manifest(
+            products=[
+                Product.from_dict(product, directory)
+                for product in attributes["products"]
+            ],
+            workers=attributes.get("workers", 4),
+            method=attributes.get("method", "auto"),
+            alert_command=os.path.expandvars(attributes["alert_command"])
+            if "alert_command" in attributes
+            else None,
+        )
+
+
+@dataclass
+class PublishResult:
+    """
+    The outcome of publishing one file: how it was published, its size, how
+    long it took and, if it failed, why.
+    """
+
+    source: str
+    destination: str
+    method: Optional[str] = field(default=None)
+    size: int = field(default=0)
+    wall_time: float = field(default=0.0)
+    error: Optional[str] = field(default=None)
+    skipped: bool = field(default=False)
+
+
+class Publisher:
+    """
+    Class which publishes the products of a manifest to their destinations.
+
+    Each file is validated, copied (or linked) to a temporary name in its
+    destination directory, verified, and renamed into place, so that nothing
+    downstream ever sees a partial or unverified product. A copied file is
+    hashed as it is read, and the copy is hashed again and compared. The files
+    are published concurrently, and every file is attempted even when others
+    fail.
+    """
+
+    def __init__(self, manifest: Manifest, *, alert: bool = True) -> None:
+        """
+        Initialize the Publisher.
+
+        Args:
+            manifest (Manifest): The products to publish.
+            alert (bool): Run the alert command for each product. Defaults to True.
+        """
+        if manifest.method not in PUBLISH_METHODS:
+            msg = f"Unknown publish method {manifest.method}"
+            raise ValueError(msg)
+        self.__manifest = manifest
+        self.__alert = alert
+
+    def publish(self) -> list[PublishResult]:
+        """
+        Publish every product of the manifest.
+
+        Returns:
+            list[PublishResult]: The outcome of each file.
+
+        Raises:
+            RuntimeError: If any file could not be published.
+        """
+        jobs = []
+        results = []
+        for product in self.__manifest.products:
+            try:
+                jobs.extend((product, *paths) for paths in product.files())
+            except FileNotFoundError as e:
+                if product.required:
+                    log.error(f"Unable to publish {product.source}: {e}")
+                    results.append(PublishResult(product.source, "", error=str(e)))
+                else:
+                    log.warning(f"Skipping {product.source}: {e}")
+            except (OSError, ValueError) as e:
+                log.error(f"Unable to publish {product.source}: {e}")
+                results.append(PublishResult(product.source, "", error=str(e)))
+
+        start_time = time.monotonic()
+        with ThreadPoolExecutor(max_workers=self.__manifest.workers) as pool:
+            results.extend(pool.map(lambda job: self.__publish_file(*job), jobs))
+
+        failures = [result for result in results if result.error is not None]
+        published = [
+            result for result in results if result.error is None and not result.skipped
+        ]
+        log.info(
+            f"Published {len(published)} of {len(results)} files "
+            f"({sum(result.size for result in published) / 2**20:.0f} MB) in "
+            f"{time.monotonic() - start_time:.1f}s with {self.__manifest.workers} workers"
+        )
+        if failures:
+            msg = f"{len(failures)} of {len(results)} files were not published: " + (
+                "; ".join(f"{result.source}: {result.error}" for result in failures)
+            )
+            raise RuntimeError(msg)
+        return results
+
+    def __publish_file(
+        self, product: Product, source: str, destination: str
+    ) -> PublishResult:
+        """
+        Validate, copy, verify and rename one file into place, then send its alert.
+
+        Args:
+            product (Product): The product the file belongs to.
+            source (str): The file to publish.
+            destination (str): Where to publish it.
+
+        Returns:
+            PublishResult: The outcome.
+        """
+        result = PublishResult(source, destination)
+        start_time = time.monotonic()
+        temporary = os.path.join(
+            os.path.dirname(destination),
+            f".{os.path.basename(destination)}.publish.{os.getpid()}",
+        )
+        try:
+            try:
+                result.size = Publisher.__validate(product, source)
+            except MissingProductError as e:
+                if product.required:
+                    raise
+                log.warning(f"Skipping {source}: {e}")
+                result.skipped = True
+                return result
+            os.makedirs(os.path.dirname(destination), exist_ok=True)
+            if os.path.lexists(temporary):
+                os.unlink(temporary)
+            result.method = self.__transfer(source, temporary)
+            os.replace(temporary, destination)
+            if self.__alert and product.alert is not None:
+                self.__send_alert(product, source, destination)
+        except (OSError, ValueError, RuntimeError) as e:
+            result.error = str(e)
+            log.error(f"Unable to publish {source} to {destination}: {e}")
+            if os.path.lexists(temporary):
+                os.unlink(temporary)
+        result.wall_time = time.monotonic() - start_time
+        if result.error is None:
+            log.info(
+                f"Published {destination} ({result.method}, "
+                f"{result.size / 2**20:.1f} MB in {result.wall_time:.1f}s)"
+            )
+        return result
+
+    @staticmethod
+    def __validate(product: Product, source: str) -> int:
+        """
+        Check that a file is complete enough to publish.
+
+        Args:
+            product (Product): The product the file belongs to.
+            source (str): The file.
+
+        Returns:
+            int: The size of the file in bytes.
+
+        Raises:
+            MissingProductError: If the file is missing, too small or without its header.
+        """
+        try:
+            size = os.stat(source).st_size
+        except FileNotFoundError:
+            msg = f"{source} does not exist"
+            raise MissingProductError(msg) from None
+        if size < product.min_size:
+            msg = f"{source} is {size} bytes, smaller than the minimum of {product.min_size}"
+            raise MissingProductError(msg)
+        check_header = product.validate == "netcdf" or (
+            product.validate == "auto" and source.endswith(NETCDF_EXTENSIONS)
+        )
+        if check_header and not has_valid_header(source):
+            msg = f"{source} does not have a NetCDF header"
+            raise MissingProductError(msg)
+        return size
+
+    def __transfer(self, source: str, temporary: str) -> str:
+        """
+        Reflink, link or copy a file to a temporary destination. A hard link is
+        only made with the link method.
+
+        Args:
+            source (str): The file to publish.
+            temporary (str): The temporary destination.
+
+        Returns:
+            str: How the file was published: reflink, link or copy.
+        """
+        method = self.__manifest.method
+        same_file_system = (
+            os.stat(source).st_dev == os.stat(os.path.dirname(temporary)).st_dev
+        )
+        if (
+            method != "copy"
+            and same_file_system
+            and Publisher.__reflink(source, temporary)
+        ):
+            return "reflink"
+        if method == "link":
+            os.link(source, temporary)
+            return "link"
+        Publisher.__verified_copy(source, temporary)
+        return "copy"
+
+    @staticmethod
+    def __reflink(source: str, temporary: str) -> bool:
+        """
+        Make a copy-on-write copy of a file, which shares its blocks until either is changed.
+
+        Args:
+            source (str): The file to copy.
+            temporary (str): The copy.
+
+        Returns:
+            bool: True if the file system made the copy.
+        """
+        try:
+            with open(source, "rb") as src, open(temporary, "wb") as dst:
+                fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        except OSError:
+            if os.path.lexists(temporary):
+                os.unlink(temporary)
+            return False
+        os.utime(
+            temporary, ns=(os.stat(source).st_atime_ns, os.stat(source).st_mtime_ns)
+        )
+        return True
+
+    @staticmethod
+    def __verified_copy(source: str, temporary: str) -> None:
+        """
+        Copy a file, hashing it as it is read, and check that the copy has the same hash.
+
+        Args:
+            source (str): The file to copy.
+            temporary (str): The copy.
+        """
+        hasher, algorithm = new_hasher()
+        with open(source, "rb") as src, open(temporary, "wb") as dst:
+            while True:
+                block = src.read(HASH_BLOCK_SIZE)
+                if not block:
+                    break
+                hasher.update(block)
+                dst.write(block)
+            dst.flush()
+            os.fsync(dst.fileno())
+        shutil.copystat(source, temporary)
+        expected = f"{algorithm}:{hasher.hexdigest()}"
+        actual = hash_file(temporary)
+        if actual != expected:
+            msg = f"The copy of {source} is corrupt ({actual} != {expected})"
+            raise RuntimeError(msg)
+
+    def __send_alert(self, product: Product, source: str, destination: str) -> None:
+        """
+        Run the alert command for a published file.
+
+        Args:
+            product (Product): The product the file belongs to.
+            source (str): The file which was published.
+            destination (str): Where it was published.
+        """
+        if self.__manifest.alert_command is None:
+            return
+        command = [
+            word.format(alert=product.alert, destination=destination, source=source)
+            for word in shlex.split(self.__manifest.alert_command)
+        ]
+        result = subprocess.run(command, capture_output=True, text=True, check=False)
+        if result.returncode != 0:
+            msg = (
+                f"Alert {product.alert} failed with return code {result.returncode}: "
+                f"{result.stderr.strip()}"
+            )
+            raise RuntimeError(msg)
+        log.info(f"Sent alert {product.alert} for {destination}")
+
+
+def publish_manifest(
+    manifest_file: str, workers: Optional[int] = None, alert: bool = True
+) -> list[PublishResult]:
+    """
+    Publish the products of a manifest file, i.e. as the entry point of a PYTHON task.
+
+    Args:
+        manifest_file (str): The path of the manifest.
+        workers (int, optional): The number of files to publish at once, defaults to the manifest's.
+        alert (bool): Run the alert command for each product. Defaults to True.
+
+    Returns:
+        list[PublishResult]: The outcome of each file.
+    """
+    manifest = Manifest.from_file(manifest_file)
+    if workers is not None:
+        manifest.workers = workers
+    return Publisher(manifest, alert=alert).publish()
@@ -0,0 +1,257 @@
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures.process import BrokenProcessPool
+from typing import TYPE_CHECKING, Any, Optional
+
+from .execution_policy import ExecutionAttributes
+from .python_worker import PythonWorkerPool
+from .stofs_logger import get_stofs_logger
+from .stofs_server import server_available, submit_request
+from .stofs_task import StofsTask
+
+if TYPE_CHECKING:
+    from .stofs_model import StofsModel
+
+log = get_stofs_logger()
+
+
+class PythonTaskRunner:
+    """
+    Class which calls the entry points of the PYTHON tasks of a model in warm
+    worker processes: those of a server (see `stofs serve`) when one is
+    listening on the configured socket, otherwise those of a pool of its own,
+    which is started on first use and may be shared with other runners.
+    """
+
+    def __init__(self, model: "StofsModel") -> None:
+        """
+        Initialize the PythonTaskRunner.
+
+        Args:
+            model (StofsModel): The model whose tasks are run.
+        """
+        self.__model = model
+        self.__pool = None
+        self.__pool_lock = threading.Lock()
+        self.__pool_owner: Optional[PythonTaskRunner] = None
+        self.__results: dict[str, Any] = {}
+
+    def share_pool(self, owner: "PythonTaskRunner") -> None:
+        """
+        Run the entry points on the worker pool of another runner.
+
+        Args:
+            owner (PythonTaskRunner): The runner whose worker pool is used.
+        """
+        self.__pool_owner = owner
+
+    def pool(self) -> PythonWorkerPool:
+        """
+        Get the pool of warm Python workers, starting it on first use.
+
+        Returns:
+            PythonWorkerPool: The worker pool used for PYTHON tasks.
+        """
+        if self.__pool_owner is not None:
+            return self.__pool_owner.pool()
+        with self.__pool_lock:
+            if self.__pool is None:
+                config = self.__model.config()
+                workers = config.python_workers or self.__model.options().jobs
+                log.info(f"Starting {workers} Python workers")
+                self.__pool = PythonWorkerPool(
+                    workers,
+                    config.python_preload,
+                    config.python_paths,
+                    config.python_loaders,
+                    config.python_threads,
+                )
+            return self.__pool
+
+    def shutdown(self) -> None:
+        """
+        Stop the Python workers, if they were started.
+        """
+        with self.__pool_lock:
+            pool = self.__pool
+            self.__pool = None
+        if pool is not None:
+            pool.shutdown()
+
+    def run(self, task: StofsTask, execution_attributes: ExecutionAttributes) -> int:
+        """
+        Call the entry point of a Python task in a worker process.
+
+        The output of the entry point is written to its own log file and its
+        resource usage is recorded like that of a script. The value returned
+        by the entry point is kept, so that it can be handed to the tasks
+        which depend on this one without writing it to disk.
+
+        Args:
+            task (StofsTask): The task to run.
+            execution_attributes (ExecutionAttributes): The execution attributes for the task
+
+        Returns:
+            int: The exit code of the entry point.
+        """
+        entry_point = task.entry_point()
+        socket_path = self.__model.config().python_socket
+        log_file = self.__model._log_file(
+            f"{task.name()}.{entry_point.replace(':', '.')}"
+        )
+        if server_available(socket_path):
+            log.info(
+                f"Submitting entry point {entry_point} to the server on "
+                f"{socket_path}, output in {log_file}"
+            )
+            with self.__model._trace().span(
+                entry_point, "script", {"task": task.name(), "server": True}
+            ) as span_args:
+                outcome = self.__submit_to_server(task, execution_attributes, log_file)
+                span_args["exit_code"] = outcome["exit_code"]
+            exit_code = outcome["exit_code"]
+        else:
+            exit_code = self.__run_on_pool(task, execution_attributes, log_file)
+
+        if exit_code != 0 and os.path.exists(log_file):
+            with open(log_file, errors="replace") as f:
+                tail = deque((line.rstrip("\n") for line in f), maxlen=50)
+            log.error(
+                f"Entry point {entry_point} failed with return code {exit_code}, last lines of {log_file}:\n"
+                + "\n".join(tail)
+            )
+
+        return exit_code
+
+    def __run_on_pool(
+        self,
+        task: StofsTask,
+        execution_attributes: ExecutionAttributes,
+        log_file: str,
+    ) -> int:
+        """
+        Call the entry point of a Python task on the worker pool and record
+        its resource usage.
+
+        Args:
+            task (StofsTask): The task to run.
+            execution_attributes (ExecutionAttributes): The execution attributes for the task
+            log_file (str): The file the output is written to.
+
+        Returns:
+            int: The exit code of the entry point.
+        """
+        entry_point = task.entry_point()
+        kwargs = dict(task.kwargs())
+        if task.pass_results():
+            kwargs["upstream"] = {
+                name: self.__results[name]
+                for name in task.depends_on()
+                if name in self.__results
+            }
+
+        log.info(f"Running entry point {entry_point}, output in {log_file}")
+        start_time = time.time()
+        with self.__model._trace().span(
+            entry_point, "script", {"task": task.name()}
+        ) as span_args:
+            future = self.pool().submit(
+                entry_point,
+                log_file,
+                args=task.args(),
+                kwargs=kwargs,
+                argv=task.argv(),
+                timeout=execution_attributes.timeout,
+            )
+            try:
+                outcome = future.result()
+            except BrokenProcessPool as e:
+                # A worker died (i.e. it was killed for using too much memory),
+                # so the pool is replaced before the entry point is retried
+                log.error(f"Python worker running {entry_point} exited: {e}")
+                self.shutdown()
+                outcome = {"exit_code": 1}
+            except Exception as e:
+                log.error(f"Unable to run entry point {entry_point}: {e}")
+                outcome = {"exit_code": 1}
+            span_args["exit_code"] = outcome["exit_code"]
+
+        exit_code = outcome["exit_code"]
+        if exit_code == 0 and outcome.get("result") is not None:
+            self.__results[task.name()] = outcome["result"]
+
+        log.info(
+            f"Entry point {entry_point} finished in {outcome.get('wall_time', 0.0):.1f}s "
+            f"(user {outcome.get('user_time', 0.0):.1f}s, sys {outcome.get('system_time', 0.0):.1f}s)"
+        )
+        self.__model._record_script(
+            {
+                "task": task.name(),
+                "script": entry_point,
+                "exit_code": exit_code,
+                "timed_out": outcome.get("timed_out", False),
+                "start_time": start_time,
+                **{
+                    key: outcome[key]
+                    for key in (
+                        "wall_time",
+                        "user_time",
+                        "system_time",
+                        "max_rss_kb",
+                        "worker_max_rss_kb",
+                    )
+                    if key in outcome
+                },
+            }
+        )
+        return exit_code
+
+    def __submit_to_server(
+        self,
+        task: StofsTask,
+        execution_attributes: ExecutionAttributes,
+        log_file: str,
+    ) -> dict:
+        """
+        Run the entry point of a Python task on a running server. The server
+        keeps the values returned by entry points and records the metrics.
+
+        Args:
+            task (StofsTask): The task to run.
+            execution_attributes (ExecutionAttributes): The execution attributes for the task
+            log_file (str): The file the output is written to.
+
+        Returns:
+            dict: The server's response.
+        """
+        request = {
+            "task": task.name(),
+            "entry_point": task.entry_point(),
+            "args": task.args(),
+            "kwargs": task.kwargs(),
+            "argv": task.argv(),
+            "timeout": execution_attributes.timeout,
+            "upstream": task.depends_on() if task.pass_results() else None,
+            "stage": self.__model._stage_name(),
+            "cycle": self.__model.options().cycle,
+            "log_file": log_file,
+        }
+        try:
+            response = submit_request(self.__model.config().python_socket, request)
+        except (OSError, ValueError) as e:
+            log.error(
+                f"Unable to run entry point {task.entry_point()} on the server: {e}"
+            )
+            return {"exit_code": 1}
+        if "error" in response:
+            log.error(
+                f"Server could not run entry point {task.entry_point()}: {response['error']}"
+            )
+        else:
+            log.info(
+                f"Entry point {task.entry_point()} finished on the server in "
+                f"{response['wall_time']:.1f}s"
+            )
+        return response
@@ -0,0 +1,406 @@
+import importlib
+import multiprocessing
+import os
+import resource
+import signal
+import sys
+import threading
+import time
+import traceback
+from collections.abc import Callable
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from types import FrameType
+from typing import Any, Optional
+
+from .resources import thread_environment
+from .stofs_logger import get_stofs_logger
+
+log = get_stofs_logger()
+
+# Objects kept by the worker process between calls, so that a tool can leave
+# data in memory for a later step run on the same worker
+_WORKER_CACHE: dict[str, Any] = {}
+
+
+def worker_cache() -> dict[str, Any]:
+    """
+    Get the cache shared by all of the entry points run in a worker process.
+
+    Returns:
+        dict[str, Any]: The worker's cache.
+    """
+    return _WORKER_CACHE
+
+
+def initialize_worker(
+    preload: list[str],
+    paths: list[str],
+    loaders: Optional[dict[str, str]] = None,
+    threads: Optional[int] = None,
+) -> None:
+    """
+    Prepare a worker process by limiting its thread pools, extending the
+    module search path, importing the modules which the entry points use and
+    loading shared objects (i.e. the grid and its KD-tree) into the worker cache.
+
+    Modules and loaders which fail are reported and skipped, since the entry
+    point which needs them will fail with a clearer error.
+
+    Args:
+        preload (list[str]): The modules to import.
+        paths (list[str]): Directories added to the module search path.
+        loaders (dict[str, str], optional): Entry points whose return values
+            are stored in the worker cache under the given names.
+        threads (int, optional): The number of threads OpenMP and the BLAS
+            libraries may use, set before the preload modules are imported.
+    """
+    if threads is not None:
+        os.environ.update(thread_environment(threads))
+    for path in reversed(paths):
+        if path not in sys.path:
+            sys.path.insert(0, path)
+    for module in preload:
+        try:
+            importlib.import_module(module)
+        except Exception as e:
+            print(f"Unable to preload module {module}: {e}", file=sys.stderr)
+    for name, entry_point in (loaders or {}).items():
+        try:
+            _WORKER_CACHE[name] = load_entry_point(entry_point)()
+        except Exception as e:
+            print(f"Unable to load {name} from {entry_point}: {e}", file=sys.stderr)
+
+
+def load_entry_point(entry_point: str) -> Callable[..., Any]:
+    """
+    Find the callable named by an entry point.
+
+    Args:
+        entry_point (str): The entry point as "module:function".
+
+    Returns:
+        Callable[..., Any]: The callable.
+    """
+    module_name, _, function_name = entry_point.partition(":")
+    if not module_name or not function_name:
+        msg = f"Entry point {entry_point} must be of the form module:function"
+        raise ValueError(msg)
+    function = importlib.import_module(module_name)
+    for attribute in function_name.split("."):
+        function = getattr(function, attribute)
+    return function
+
+
+def run_entry_point(
+    entry_point: str,
+    log_file: str,
+    *,
+    args: Optional[list] = None,
+    kwargs: Optional[dict] = None,
+    argv: Optional[list[str]] = None,
+    timeout: Optional[float] = None,
+) -> dict:
+    """
+    Run an entry point inside a worker process.
+
+    The output of the entry point, including the output of any compiled
+    libraries it uses, is appended to the log file. An entry point which exits
+    through sys.exit (i.e. an argparse main function) reports that exit code.
+
+    Args:
+        entry_point (str): The entry point as "module:function".
+        log_file (str): The file the output is written to.
+        args (list, optional): Positional arguments passed to the function.
+        kwargs (dict, optional): Keyword arguments passed to the function.
+        argv (list[str], optional): When set, sys.argv is replaced for the duration of the call.
+        timeout (float, optional): The time in seconds after which the call is interrupted.
+
+    Returns:
+        dict: The exit code, the value returned by the function and the resources used.
+    """
+    os.makedirs(os.path.dirname(log_file), exist_ok=True)
+    peak_reset = _reset_peak_rss()
+    start_time = time.monotonic()
+    start_usage = resource.getrusage(resource.RUSAGE_SELF)
+    sys.stdout.flush()
+    sys.stderr.flush()
+    saved_fds = (os.dup(1), os.dup(2))
+    saved_argv = sys.argv
+    log_fd = os.open(log_file, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+    try:
+        os.dup2(log_fd, 1)
+        os.dup2(log_fd, 2)
+        print(
+            f"==== {entry_point} (pid {os.getpid()}) started {time.ctime()} ====",
+            flush=True,
+        )
+        if argv is not None:
+            sys.argv = [entry_point.partition(":")[0], *argv]
+        if timeout is not None:
+            signal.signal(signal.SIGALRM, _raise_timeout)
+            signal.setitimer(signal.ITIMER_REAL, timeout)
+        try:
+            exit_code, result, timed_out = _call_entry_point(
+                entry_point, args or [], kwargs or {}
+            )
+        finally:
+            if timeout is not None:
+                signal.setitimer(signal.ITIMER_REAL, 0)
+    finally:
+        sys.argv = saved_argv
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os.dup2(saved_fds[0], 1)
+        os.dup2(saved_fds[1], 2)
+        for fd in (*saved_fds, log_fd):
+            os.close(fd)
+
+    end_usage = resource.getrusage(resource.RUSAGE_SELF)
+    outcome = {
+        "exit_code": exit_code,
+        "timed_out": timed_out,
+        "result": result,
+        "wall_time": time.monotonic() - start_time,
+        "user_time": end_usage.ru_utime - start_usage.ru_utime,
+        "system_time": end_usage.ru_stime - start_usage.ru_stime,
+        # ru_maxrss is the peak of the long-lived worker over every call it ran
+        "worker_max_rss_kb": end_usage.ru_maxrss,
+    }
+    peak = _peak_rss_kb() if peak_reset else None
+    if peak is not None:
+        outcome["max_rss_kb"] = peak
+    return outcome
+
+
+def _reset_peak_rss() -> bool:
+    """
+    Reset the peak resident set size of the worker, so that the peak of the
+    next call can be measured on its own.
+
+    Returns:
+        bool: True if the kernel reset the peak (Linux 4.0 and later).
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        return False
+    return True
+
+
+def _peak_rss_kb() -> Optional[int]:
+    """
+    Get the peak resident set size of the worker since it was last reset.
+
+    Returns:
+        Optional[int]: The peak in kilobytes, or None if it is not available.
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def _call_entry_point(
+    entry_point: str, args: list, kwargs: dict
+) -> tuple[int, Any, bool]:
+    """
+    Call an entry point, turning exceptions and sys.exit into an exit code.
+
+    Args:
+        entry_point (str): The entry point as "module:function".
+        args (list): Positional arguments passed to the function.
+        kwargs (dict): Keyword arguments passed to the function.
+
+    Returns:
+        tuple[int, Any, bool]: The exit code, the value returned by the
+            function and whether the call timed out.
+    """
+    try:
+        return 0, load_entry_point(entry_point)(*args, **kwargs), False
+    except SystemExit as e:
+        if e.code is None:
+            return 0, None, False
+        if isinstance(e.code, int):
+            return e.code, None, False
+        print(e.code, file=sys.stderr)
+        return 1, None, False
+    except EntryPointTimeoutError:
+        traceback.print_exc()
+        return 1, None, True
+    except Exception:
+        traceback.print_exc()
+        return 1, None, False
+
+
+class EntryPointTimeoutError(Exception):
+    """
+    Raised inside a worker when an entry point runs past its timeout.
+    """
+
+
+def _raise_timeout(signum: int, frame: Optional[FrameType]) -> None:
+    """
+    Signal handler which interrupts an entry point that ran past its timeout.
+    """
+    msg = "Entry point timed out"
+    raise EntryPointTimeoutError(msg)
+
+
+class PythonWorkerPool:
+    """
+    Class representing a pool of warm Python worker processes.
+
+    Each worker imports the configured modules once when it starts, so the
+    entry points of PYTHON tasks run without paying for the interpreter start
+    and the imports of numpy, netCDF4 and similar packages on every call.
+    Workers are started with the forkserver method, since the workflow itself
+    runs tasks from several threads. When a worker dies (i.e. a compiled
+    library crashes or the worker is killed for its memory), the calls running
+    on the pool fail and a new pool is started for the next calls.
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        preload: list[str],
+        paths: list[str],
+        loaders: Optional[dict[str, str]] = None,
+        threads: Optional[int] = None,
+    ) -> None:
+        """
+        Initialize the PythonWorkerPool.
+
+        Args:
+            workers (int): The number of worker processes.
+            preload (list[str]): The modules imported by each worker when it starts.
+            paths (list[str]): Directories added to the module search path of each worker.
+            loaders (dict[str, str], optional): Entry points run by each worker when it
+                starts, whose return values are kept in the worker cache.
+            threads (int, optional): The number of threads OpenMP and the BLAS
+                libraries may use in each worker, unless already exported.
+        """
+        self.__workers = workers
+        self.__initargs = (preload, paths, loaders, threads)
+        self.__lock = threading.Lock()
+        self.__executor = self.__new_executor()
+
+    def __new_executor(self) -> ProcessPoolExecutor:
+        """
+        Start a new pool of worker processes.
+
+        Returns:
+            ProcessPoolExecutor: The pool of worker processes.
+        """
+        return ProcessPoolExecutor(
+            max_workers=self.__workers,
+            mp_context=multiprocessing.get_context("forkserver"),
+            initializer=initialize_worker,
+            initargs=self.__initargs,
+        )
+
+    def __restart(self, broken: ProcessPoolExecutor) -> None:
+        """
+        Replace a broken pool of worker processes with a new one.
+
+        Args:
+            broken (ProcessPoolExecutor): The pool found to be broken. Nothing is
+                done if it has already been replaced.
+        """
+        with self.__lock:
+            if self.__executor is not broken:
+                return
+            log.warning("A Python worker died, starting a new pool of workers")
+            broken.shutdown(wait=False)
+            self.__executor = self.__new_executor()
+
+    def __watch(self, executor: ProcessPoolExecutor, future: Future) -> None:
+        """
+        Restart the pool when a call fails because its worker died.
+
+        Args:
+            executor (ProcessPoolExecutor): The pool the call was submitted to.
+            future (Future): The future of the call.
+        """
+        if not future.cancelled() and isinstance(future.exception(), BrokenProcessPool):
+            self.__restart(executor)
+
+    def workers(self) -> int:
+        """
+        Get the number of worker processes.
+
+        Returns:
+            int: The number of worker processes.
+        """
+        return self.__workers
+
+    def warm(self) -> None:
+        """
+        Start every worker now, so that none of them imports the preload
+        modules while a task is waiting for it.
+        """
+        with self.__lock:
+            executor = self.__executor
+        futures = [executor.submit(os.getpid) for _ in range(self.__workers)]
+        for future in futures:
+            future.result()
+
+    def submit(
+        self,
+        entry_point: str,
+        log_file: str,
+        *,
+        args: Optional[list] = None,
+        kwargs: Optional[dict] = None,
+        argv: Optional[list[str]] = None,
+        timeout: Optional[float] = None,
+    ) -> Future:
+        """
+        Submit an entry point to be run by a worker.
+
+        Args:
+            entry_point (str): The entry point as "module:function".
+            log_file (str): The file the output is written to.
+            args (list, optional): Positional arguments passed to the function.
+            kwargs (dict, optional): Keyword arguments passed to the function.
+            argv (list[str], optional): When set, sys.argv is replaced for the duration of the call.
+            timeout (float, optional): The time in seconds after which the call is interrupted.
+
+        Returns:
+            Future: The future holding the dictionary returned by run_entry_point.
+        """
+        call = partial(
+            run_entry_point,
+            entry_point,
+            log_file,
+            args=args,
+            kwargs=kwargs,
+            argv=argv,
+            timeout=timeout,
+        )
+        with self.__lock:
+            executor = self.__executor
+        try:
+            future = executor.submit(call)
+        except BrokenProcessPool:
+            # Broken by an earlier call which has not finished being reported
+            self.__restart(executor)
+            with self.__lock:
+                executor = self.__executor
+            future = executor.submit(call)
+        future.add_done_callback(lambda f: self.__watch(executor, f))
+        return future
+
+    def shutdown(self) -> None:
+        """
+        Wait for the running entry points and stop the worker processes.
+        """
+        with self.__lock:
+            executor = self.__executor
+        executor.shutdown(wait=True)
@@ -0,0 +1,271 @@
+import os
+import threading
+from dataclasses import dataclass, field
+from typing import Optional, Union
+
+from .stofs_logger import get_stofs_logger
+
+log = get_stofs_logger()
+
+# Variables which set the size of the thread pools of OpenMP, the BLAS
+# libraries used by NumPy and SciPy, and numexpr
+THREAD_VARIABLES = [
+    "OMP_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "BLIS_NUM_THREADS",
+    "VECLIB_MAXIMUM_THREADS",
+    "NUMEXPR_NUM_THREADS",
+]
+
+MEMORY_UNITS = {"K": 1 / 1024, "M": 1, "G": 1024, "T": 1024**2}
+
+# File sizes are decimal, as in ls -l --si and in the size checks of the scripts
+SIZE_UNITS = {"K": 10**3, "M": 10**6, "G": 10**9, "T": 10**12}
+
+
+def parse_memory(value: Union[str, float]) -> float:
+    """
+    Convert a memory size (i.e. 512M or 16G, or a number of megabytes) to megabytes.
+
+    Args:
+        value (Union[str, float]): The memory size.
+
+    Returns:
+        float: The size in megabytes.
+    """
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = value.strip().upper().removesuffix("B")
+    try:
+        if text and text[-1] in MEMORY_UNITS:
+            return float(text[:-1]) * MEMORY_UNITS[text[-1]]
+        return float(text)
+    except ValueError:
+        msg = f"Invalid memory size {value}"
+        raise ValueError(msg) from None
+
+
+def parse_size(value: Union[str, float]) -> int:
+    """
+    Convert a file size (i.e. 500M, or a number of bytes) to bytes.
+
+    Args:
+        value (Union[str, float]): The file size.
+
+    Returns:
+        int: The size in bytes.
+    """
+    if isinstance(value, (int, float)):
+        return int(value)
+    text = value.strip().upper().removesuffix("B")
+    try:
+        if text and text[-1] in SIZE_UNITS:
+            return int(float(text[:-1]) * SIZE_UNITS[text[-1]])
+        return int(float(text))
+    except ValueError:
+        msg = f"Invalid file size {value}"
+        raise ValueError(msg) from None
+
+
+def thread_environment(threads: int) -> dict[str, str]:
+    """
+    Get the environment of a process with the thread pools limited to a number
+    of threads. Thread variables already set in the environment of the workflow
+    (i.e. exported by the job card) are kept.
+
+    Args:
+        threads (int): The number of threads each library may use.
+
+    Returns:
+        dict[str, str]: The environment of the workflow with the thread variables set.
+    """
+    environment = dict(os.environ)
+    for name in THREAD_VARIABLES:
+        environment.setdefault(name, str(max(threads, 1)))
+    return environment
+
+
+@dataclass
+class ResourceRequest:
+    """
+    The resources a task holds while it runs: cores, memory in megabytes and,
+    optionally, one slot of an I/O class.
+    """
+
+    cores: int = field(default=1)
+    memory_mb: float = field(default=0.0)
+    io_class: Optional[str] = field(default=None)
+
+
+@dataclass
+class NodeCapacity:
+    """
+    The resources of the node the workflow runs on which are shared by the
+    tasks of a stage.
+
+    The cores default to the CPUs the workflow may run on and the memory to
+    the memory available when the workflow starts. Each I/O class has
+    io_slots slots (one if the class is not listed), so that, i.e., only two
+    NCO steps read and write the shared file system at once.
+    """
+
+    cores: int = field(default=1)
+    memory_mb: float = field(default=0.0)
+    io_slots: dict[str, int] = field(default_factory=dict)
+
+    @staticmethod
+    def from_dict(attributes: dict) -> "NodeCapacity":
+        """
+        Create the node capacity from a validated configuration dictionary,
+        detecting the resources which are not given.
+
+        Args:
+            attributes (dict): The node section of the configuration file.
+
+        Returns:
+            NodeCapacity: The node capacity.
+        """
+        return NodeCapacity(
+            cores=attributes.get("cores", NodeCapacity.__detect_cores()),
+            memory_mb=parse_memory(attributes["memory"])
+            if "memory" in attributes
+            else NodeCapacity.__detect_memory(),
+            io_slots=attributes.get("io_slots", {}),
+        )
+
+    @staticmethod
+    def __detect_cores() -> int:
+        """
+        Count the CPUs the workflow may run on.
+
+        Returns:
+            int: The number of CPUs.
+        """
+        if hasattr(os, "sched_getaffinity"):
+            return len(os.sched_getaffinity(0))
+        return os.cpu_count() or 1
+
+    @staticmethod
+    def __detect_memory() -> float:
+        """
+        Read the available memory from /proc/meminfo.
+
+        Returns:
+            float: The available memory in megabytes, or 0 (unlimited) if it is not known.
+        """
+        try:
+            with open("/proc/meminfo") as f:
+                for line in f:
+                    name, _, value = line.partition(":")
+                    if name == "MemAvailable":
+                        return float(value.split()[0]) / 1024
+        except OSError:
+            pass
+        return 0.0
+
+
+class ResourcePool:
+    """
+    Class which keeps track of the node resources held by running tasks.
+
+    A task is started only when its cores, memory and I/O slot fit in what is
+    left. A task which asks for more than the whole node is allowed to start
+    once nothing else is running, so that it runs alone rather than never.
+    The pool may be shared by graphs executed from several threads, i.e. the
+    graphs of the output stacks.
+    """
+
+    def __init__(self, capacity: NodeCapacity) -> None:
+        """
+        Initialize the ResourcePool.
+
+        Args:
+            capacity (NodeCapacity): The resources of the node.
+        """
+        self.__capacity = capacity
+        self.__cores = 0
+        self.__memory_mb = 0.0
+        self.__io: dict[str, int] = {}
+        self.__holders = 0
+        self.__condition = threading.Condition()
+
+    def capacity(self) -> NodeCapacity:
+        """
+        Get the resources of the node.
+
+        Returns:
+            NodeCapacity: The node capacity.
+        """
+        return self.__capacity
+
+    def try_acquire(self, request: ResourceRequest) -> bool:
+        """
+        Hold the resources of a task if it can start without oversubscribing the node.
+
+        Args:
+            request (ResourceRequest): The resources of the task.
+
+        Returns:
+            bool: True if the resources are now held by the task.
+        """
+        with self.__condition:
+            if not self.__fits(request):
+                return False
+            self.__cores += request.cores
+            self.__memory_mb += request.memory_mb
+            if request.io_class is not None:
+                self.__io[request.io_class] = self.__io.get(request.io_class, 0) + 1
+            self.__holders += 1
+            return True
+
+    def release(self, request: ResourceRequest) -> None:
+        """
+        Return the resources of a task which has finished.
+
+        Args:
+            request (ResourceRequest): The resources of the task.
+        """
+        with self.__condition:
+            self.__cores -= request.cores
+            self.__memory_mb -= request.memory_mb
+            if request.io_class is not None:
+                self.__io[request.io_class] -= 1
+            self.__holders -= 1
+            self.__condition.notify_all()
+
+    def wait(self, timeout: float) -> None:
+        """
+        Wait for any task to return its resources.
+
+        Args:
+            timeout (float): The longest time to wait in seconds.
+        """
+        with self.__condition:
+            self.__condition.wait(timeout)
+
+    def __fits(self, request: ResourceRequest) -> bool:
+        """
+        Check whether a task can start without oversubscribing the node.
+
+        Args:
+            request (ResourceRequest): The resources of the task.
+
+        Returns:
+            bool: True if the task fits in the resources left.
+        """
+        if self.__holders == 0:
+            return True
+        capacity = self.__capacity
+        if self.__cores + request.cores > capacity.cores:
+            return False
+        if (
+            capacity.memory_mb
+            and self.__memory_mb + request.memory_mb > capacity.memory_mb
+        ):
+            return False
+        if request.io_class is not None:
+            slots = capacity.io_slots.get(request.io_class, 1)
+            if self.__io.get(request.io_class, 0) >= slots:
+                return False
+        return True
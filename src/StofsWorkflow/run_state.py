@@ -0,0 +1,154 @@
+import json
+import os
+import threading
+import time
+from typing import Optional
+
+from .stofs_logger import get_stofs_logger
+
+log = get_stofs_logger()
+
+
+class RunState:
+    """
+    Class representing the persistent record of a stage execution for one cycle.
+
+    The state is kept as a JSON file in the state directory and is rewritten
+    after every change, so that a stage which is interrupted or fails can be
+    rerun with --resume and skip the tasks and scripts which already succeeded.
+    """
+
+    STATUS_RUNNING = "running"
+    STATUS_COMPLETED = "completed"
+    STATUS_FAILED = "failed"
+
+    def __init__(
+        self, state_directory: str, cycle: str, stage: str, resume: bool = False
+    ) -> None:
+        """
+        Initialize the RunState for a cycle and stage.
+
+        Args:
+            state_directory (str): The directory where workflow state is kept.
+            cycle (str): The cycle being run (i.e. YYYYMMDDHH).
+            stage (str): The name of the stage being run.
+            resume (bool): Load the existing state rather than starting a new one.
+        """
+        self.__filename = os.path.join(state_directory, "runs", cycle, f"{stage}.json")
+        self.__lock = threading.Lock()
+        self.__state = {"cycle": cycle, "stage": stage, "tasks": {}}
+
+        if resume and os.path.exists(self.__filename):
+            with open(self.__filename) as f:
+                self.__state = json.load(f)
+            log.info(f"Resuming {stage} for cycle {cycle} from {self.__filename}")
+
+        with self.__lock:
+            self.__save()
+
+    def filename(self) -> str:
+        """
+        Get the path of the state file.
+
+        Returns:
+            str: The path of the state file.
+        """
+        return self.__filename
+
+    def is_task_complete(self, task_name: str) -> bool:
+        """
+        Check if a task completed successfully in this or a previous run.
+
+        Args:
+            task_name (str): The name of the task.
+
+        Returns:
+            bool: True if the task completed successfully.
+        """
+        with self.__lock:
+            task_state = self.__state["tasks"].get(task_name, {})
+            return task_state.get("status") == RunState.STATUS_COMPLETED
+
+    def is_script_complete(self, task_name: str, index: int, script: str) -> bool:
+        """
+        Check if a script within a task completed successfully in this or a previous run.
+
+        Args:
+            task_name (str): The name of the task.
+            index (int): The position of the script in the task's script list.
+            script (str): The script.
+
+        Returns:
+            bool: True if the script completed successfully.
+        """
+        with self.__lock:
+            task_state = self.__state["tasks"].get(task_name, {})
+            script_state = task_state.get("scripts", {}).get(f"{index}:{script}", {})
+            return script_state.get("exit_code") == 0
+
+    def start_task(self, task_name: str) -> None:
+        """
+        Record that a task has started.
+
+        Args:
+            task_name (str): The name of the task.
+        """
+        with self.__lock:
+            task_state = self.__state["tasks"].setdefault(task_name, {})
+            task_state["status"] = RunState.STATUS_RUNNING
+            task_state["start_time"] = time.time()
+            task_state.pop("end_time", None)
+            task_state.pop("exit_code", None)
+            task_state.setdefault("scripts", {})
+            self.__save()
+
+    def finish_task(
+        self, task_name: str, exit_code: int, outputs: Optional[list[str]] = None
+    ) -> None:
+        """
+        Record that a task has finished.
+
+        Args:
+            task_name (str): The name of the task.
+            exit_code (int): The exit code of the task, zero when successful.
+            outputs (list[str], optional): The output files produced by the task.
+        """
+        with self.__lock:
+            task_state = self.__state["tasks"].setdefault(task_name, {})
+            task_state["status"] = (
+                RunState.STATUS_COMPLETED if exit_code == 0 else RunState.STATUS_FAILED
+            )
+            task_state["exit_code"] = exit_code
+            task_state["end_time"] = time.time()
+            task_state["outputs"] = outputs if outputs is not None else []
+            self.__save()
+
+    def finish_script(
+        self, task_name: str, index: int, script: str, exit_code: int
+    ) -> None:
+        """
+        Record that a script within a task has finished.
+
+        Args:
+            task_name (str): The name of the task.
+            index (int): The position of the script in the task's script list.
+            script (str): The script.
+            exit_code (int): The exit code of the script.
+        """
+        with self.__lock:
+            task_state = self.__state["tasks"].setdefault(task_name, {})
+            task_state.setdefault("scripts", {})[f"{index}:{script}"] = {
+                "exit_code": exit_code,
+                "end_time": time.time(),
+            }
+            self.__save()
+
+    def __save(self) -> None:
+        """
+        Write the state to disk, replacing the previous file atomically.
+        """
+        os.makedirs(os.path.dirname(self.__filename), exist_ok=True)
+        temporary_filename = f"{self.__filename}.tmp.{os.getpid()}"
+        with open(temporary_filename, "w") as f:
+            json.dump(self.__state, f, indent=2)
+        os.replace(temporary_filename, self.__filename)
@@ -1,8 +1,9 @@
-from typing import ClassVar
+from typing import ClassVar, Optional
 
 from .execution_policy import ExecutionMode
 from .stofs_config import StofsConfig
 from .stofs_model import StofsModel
+from .stofs_run_options import StofsRunOptions
 from .stofs_task import StofsTask
 
 
@@ -28,58 +29,40 @@ class SchismModel(StofsModel):
         ),
     }
 
-    def __init__(self, config: StofsConfig) -> None:
+    def __init__(
+        self, config: StofsConfig, options: Optional[StofsRunOptions] = None
+    ) -> None:
         """
-        Initialize the parent class (StofsModel) with the configuration.
+        Initialize the parent class (StofsModel) with the configuration and run options.
         """
-        super().__init__(config)
+        super().__init__(config, options)
 
     def prep_nowcast(self) -> None:
         """
         Run the preparation step of the nowcast model.
         """
-        if SchismModel.TASK_LIST["prep_nowcast"].mode() == ExecutionMode.LEGACY:
-            self._run_legacy(SchismModel.TASK_LIST["prep_nowcast"])
-        else:
-            msg = f"prep_nowcast() is not implemented for execution mode {SchismModel.TASK_LIST['prep_nowcast'].mode()}"
-            raise NotImplementedError(msg)
+        self._run_stage(SchismModel.TASK_LIST["prep_nowcast"])
 
     def run_nowcast(self) -> None:
         """
         Run the nowcast step of the model.
         """
-        if SchismModel.TASK_LIST["nowcast"].mode() == ExecutionMode.LEGACY:
-            self._run_legacy(SchismModel.TASK_LIST["nowcast"])
-        else:
-            msg = f"run_nowcast() is not implemented for execution mode {SchismModel.TASK_LIST['run_nowcast'].mode()}"
-            raise NotImplementedError(msg)
+        self._run_stage(SchismModel.TASK_LIST["nowcast"])
 
     def prep_forecast(self) -> None:
         """
         Run the preparation step of the forecast model.
         """
-        if SchismModel.TASK_LIST["prep_forecast"].mode() == ExecutionMode.LEGACY:
-            self._run_legacy(SchismModel.TASK_LIST["prep_forecast"])
-        else:
-            msg = f"prep_nowcast() is not implemented for execution mode {SchismModel.TASK_LIST['prep_forecast'].mode()}"
-            raise NotImplementedError(msg)
+        self._run_stage(SchismModel.TASK_LIST["prep_forecast"])
 
     def run_forecast(self) -> None:
         """
         Run the forecast step of the model.
         """
-        if SchismModel.TASK_LIST["forecast"].mode() == ExecutionMode.LEGACY:
-            self._run_legacy(SchismModel.TASK_LIST["forecast"])
-        else:
-            msg = f"run_nowcast() is not implemented for execution mode {SchismModel.TASK_LIST['forecast'].mode()}"
-            raise NotImplementedError(msg)
+        self._run_stage(SchismModel.TASK_LIST["forecast"])
 
     def post(self) -> None:
         """
         Run the post-processing step of the model.
         """
-        if SchismModel.TASK_LIST["post"].mode() == ExecutionMode.LEGACY:
-            self._run_legacy(SchismModel.TASK_LIST["post"])
-        else:
-            msg = f"post() is not implemented for execution mode {SchismModel.TASK_LIST['post'].mode()}"
-            raise NotImplementedError(msg)
+        self._run_stage(SchismModel.TASK_LIST["post"])
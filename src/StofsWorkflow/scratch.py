@@ -0,0 +1,384 @@
+import hashlib
+import os
+import shutil
+import threading
+from collections.abc import Callable
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Optional
+
+from .stofs_logger import get_stofs_logger
+
+log = get_stofs_logger()
+
+# The variable which tells the scripts of a task where its scratch directory is
+SCRATCH_VARIABLE = "STOFS_SCRATCH"
+
+
+@dataclass
+class ScratchSettings:
+    """
+    Settings for running tasks in node-local scratch space.
+
+    Tasks marked scratch run in their own directory under directory, i.e. a
+    node-local SSD or tmpfs. Their declared inputs are copied there once per
+    cycle, and their declared outputs are copied back to the shared file
+    system by up to publish_workers threads while the following tasks run.
+    The scratch directories are removed at the end of each stage unless keep
+    is set.
+    """
+
+    directory: str
+    publish_workers: int = field(default=2)
+    keep: bool = field(default=False)
+
+    @staticmethod
+    def from_dict(attributes: dict) -> "ScratchSettings":
+        """
+        Create the scratch settings from a validated configuration dictionary.
+
+        Args:
+            attributes (dict): The scratch section of the configuration file.
+
+        Returns:
+            ScratchSettings: The scratch settings.
+        """
+        return ScratchSettings(
+            directory=os.path.expandvars(attributes["directory"]),
+            publish_workers=attributes.get("publish_workers", 2),
+            keep=attributes.get("keep", False),
+        )
+
+
+def copy_path(source: str, destination: str) -> None:
+    """
+    Copy a file or directory.
+
+    The copy is never a hard link, so that a task which edits a file in place
+    (i.e. ncks -A or ncatted -O) cannot change the original.
+
+    Args:
+        source (str): The file or directory to copy.
+        destination (str): The path of the copy, which must not exist.
+    """
+    if os.path.isdir(source):
+        shutil.copytree(source, destination)
+    else:
+        shutil.copy2(source, destination)
+
+
+def remove_path(path: str) -> None:
+    """
+    Remove a file or directory if it exists.
+
+    Args:
+        path (str): The file or directory.
+    """
+    if os.path.isdir(path) and not os.path.islink(path):
+        shutil.rmtree(path, ignore_errors=True)
+    elif os.path.lexists(path):
+        os.unlink(path)
+
+
+class ScratchArea:
+    """
+    Class which stages the inputs and publishes the outputs of tasks run in
+    node-local scratch space.
+
+    Each task runs in <directory>/stofs.<cycle>/<stage>/<task>. Its declared
+    inputs are copied into that directory under their file names from a copy
+    kept in <directory>/stofs.<cycle>/inputs, so that a grid or forcing file
+    read by several tasks (or stages) of a cycle crosses the parallel file
+    system once. Every task gets its own copy, so a task which edits an input
+    in place changes neither the cached copy nor the inputs of other tasks.
+
+    The task writes its declared outputs into its directory under their file
+    names, and once it has succeeded each output is copied to a temporary name
+    next to its destination and renamed into place, so that readers never see
+    a partial file. An output which a later scratch task reads is copied from
+    the local copy rather than waiting for it to be published. Outputs which
+    the task wrote directly to their destination are left where they are.
+    """
+
+    def __init__(self, settings: ScratchSettings, cycle: str, stage: str) -> None:
+        """
+        Initialize the ScratchArea.
+
+        Args:
+            settings (ScratchSettings): The scratch settings.
+            cycle (str): The cycle being run.
+            stage (str): The stage being run.
+        """
+        self.__settings = settings
+        self.__root = os.path.join(settings.directory, f"stofs.{cycle}")
+        self.__stage_directory = os.path.join(self.__root, stage)
+        self.__publisher = ThreadPoolExecutor(
+            max_workers=settings.publish_workers, thread_name_prefix="publish"
+        )
+        self.__lock = threading.Lock()
+        # The local copy and publication of each output, by destination
+        self.__local: dict[str, str] = {}
+        self.__publishing: dict[str, Future] = {}
+        self.__tasks: dict[str, Future] = {}
+        # The scratch directory of each task while it runs
+        self.__running: dict[str, str] = {}
+
+    def work_directory(self, task_name: str) -> str:
+        """
+        Get the directory a task runs in.
+
+        Args:
+            task_name (str): The name of the task.
+
+        Returns:
+            str: The scratch directory of the task.
+        """
+        return os.path.join(self.__stage_directory, task_name)
+
+    def running_directory(self, task_name: Optional[str]) -> Optional[str]:
+        """
+        Get the directory a task is running in.
+
+        Args:
+            task_name (str, optional): The name of the task.
+
+        Returns:
+            Optional[str]: The scratch directory of the task, or None if it is
+                not running in scratch.
+        """
+        with self.__lock:
+            return self.__running.get(task_name)
+
+    def run(
+        self,
+        task_name: str,
+        inputs: list[str],
+        outputs: list[str],
+        run: Callable[[], None],
+        *,
+        on_published: Optional[Callable[[], None]] = None,
+        on_failed: Optional[Callable[[Exception], None]] = None,
+    ) -> None:
+        """
+        Run a task in its scratch directory, with its declared inputs staged
+        there, and start publishing its declared outputs.
+
+        Args:
+            task_name (str): The name of the task.
+            inputs (list[str]): The declared inputs of the task.
+            outputs (list[str]): The declared outputs of the task.
+            run (Callable[[], None]): Runs the task.
+            on_published (Callable[[], None], optional): Called once every output is in place.
+            on_failed (Callable[[Exception], None], optional): Called if an output cannot be published.
+        """
+        work_directory = self.stage_inputs(task_name, inputs, outputs)
+        with self.__lock:
+            self.__running[task_name] = work_directory
+        log.info(f"Running task {task_name} in {work_directory}")
+        try:
+            run()
+        finally:
+            with self.__lock:
+                del self.__running[task_name]
+        self.publish(task_name, outputs, on_published=on_published, on_failed=on_failed)
+
+    def stage_inputs(
+        self, task_name: str, inputs: list[str], outputs: list[str]
+    ) -> str:
+        """
+        Create the scratch directory of a task and copy its inputs into it.
+
+        Args:
+            task_name (str): The name of the task.
+            inputs (list[str]): The declared inputs of the task.
+            outputs (list[str]): The declared outputs of the task, which must
+                have distinct file names since they are written side by side.
+
+        Returns:
+            str: The scratch directory of the task.
+        """
+        names = [os.path.basename(path) for path in outputs]
+        for name in names:
+            if names.count(name) > 1:
+                msg = f"Task {task_name} has two outputs named {name}"
+                raise ValueError(msg)
+
+        work_directory = self.work_directory(task_name)
+        remove_path(work_directory)
+        os.makedirs(work_directory)
+        for path in inputs:
+            target = os.path.join(work_directory, os.path.basename(path))
+            if os.path.lexists(target):
+                msg = f"Task {task_name} has two inputs named {os.path.basename(path)}"
+                raise ValueError(msg)
+            with self.__lock:
+                local = self.__local.get(path)
+            if local is not None and os.path.exists(local):
+                copy_path(local, target)
+            else:
+                copy_path(self.__cached_input(path), target)
+        log.debug(
+            f"Staged {len(inputs)} inputs of task {task_name} in {work_directory}"
+        )
+        return work_directory
+
+    def publish(
+        self,
+        task_name: str,
+        outputs: list[str],
+        on_published: Optional[Callable[[], None]] = None,
+        on_failed: Optional[Callable[[Exception], None]] = None,
+    ) -> None:
+        """
+        Copy the outputs of a task from its scratch directory to their
+        destinations in the background.
+
+        Args:
+            task_name (str): The name of the task.
+            outputs (list[str]): The declared outputs of the task.
+            on_published (Callable[[], None], optional): Called once every output is in place.
+            on_failed (Callable[[Exception], None], optional): Called if an output cannot be published.
+        """
+        work_directory = self.work_directory(task_name)
+        local = {
+            path: os.path.join(work_directory, os.path.basename(path))
+            for path in outputs
+        }
+        for path, local_path in local.items():
+            if not os.path.lexists(local_path) and not os.path.exists(path):
+                msg = f"Task {task_name} did not write its output {os.path.basename(path)}"
+                raise FileNotFoundError(msg)
+
+        future = self.__publisher.submit(
+            self.__publish, task_name, local, on_published, on_failed
+        )
+        with self.__lock:
+            self.__tasks[task_name] = future
+            for path, local_path in local.items():
+                if os.path.lexists(local_path):
+                    self.__local[path] = local_path
+                    self.__publishing[path] = future
+
+    def is_pending(self, path: str) -> bool:
+        """
+        Check whether a file is still being published.
+
+        Args:
+            path (str): The destination of the file.
+
+        Returns:
+            bool: True if the file is not yet in place.
+        """
+        with self.__lock:
+            future = self.__publishing.get(path)
+        return future is not None and not future.done()
+
+    def wait_for_tasks(self, task_names: list[str]) -> None:
+        """
+        Wait for the outputs of tasks to be published.
+
+        Args:
+            task_names (list[str]): The names of the tasks.
+        """
+        with self.__lock:
+            futures = [
+                self.__tasks[name] for name in task_names if name in self.__tasks
+            ]
+        wait(futures)
+
+    def close(self) -> list[str]:
+        """
+        Wait for every output to be published and remove the scratch
+        directories of the stage.
+
+        Returns:
+            list[str]: The names of the tasks whose outputs could not be published.
+        """
+        self.__publisher.shutdown(wait=True)
+        failed = [
+            name
+            for name, future in self.__tasks.items()
+            if future.exception() is not None
+        ]
+        if not self.__settings.keep:
+            remove_path(self.__stage_directory)
+        return failed
+
+    def finish(self) -> None:
+        """
+        Wait for every output to be published and remove the scratch
+        directories of the stage, failing if any output could not be published.
+        """
+        failed = self.close()
+        if failed:
+            msg = f"The outputs of tasks {', '.join(failed)} could not be published"
+            raise RuntimeError(msg)
+
+    def __cached_input(self, path: str) -> str:
+        """
+        Get the copy of an input kept in scratch for the cycle, copying it
+        if it is missing or the input has changed since it was copied.
+
+        Args:
+            path (str): The input on the shared file system.
+
+        Returns:
+            str: The path of the copy.
+        """
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            msg = f"Input {path} does not exist"
+            raise FileNotFoundError(msg) from None
+        key = hashlib.sha1(
+            f"{path}:{stat.st_size}:{stat.st_mtime_ns}".encode()
+        ).hexdigest()[:16]
+        cached = os.path.join(self.__root, "inputs", f"{key}.{os.path.basename(path)}")
+        if os.path.exists(cached):
+            return cached
+
+        os.makedirs(os.path.dirname(cached), exist_ok=True)
+        temporary = f"{cached}.tmp.{os.getpid()}.{threading.get_ident()}"
+        copy_path(path, temporary)
+        try:
+            os.rename(temporary, cached)
+        except OSError:
+            # Another task or stage cached it at the same time
+            remove_path(temporary)
+        return cached
+
+    def __publish(
+        self,
+        task_name: str,
+        local: dict[str, str],
+        on_published: Optional[Callable[[], None]],
+        on_failed: Optional[Callable[[Exception], None]],
+    ) -> None:
+        """
+        Copy the outputs of a task to their destinations.
+
+        Args:
+            task_name (str): The name of the task.
+            local (dict[str, str]): The scratch copy of each output, by destination.
+            on_published (Callable[[], None], optional): Called once every output is in place.
+            on_failed (Callable[[Exception], None], optional): Called if an output cannot be published.
+        """
+        try:
+            for path, local_path in local.items():
+                if not os.path.lexists(local_path):
+                    continue
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                temporary = f"{path}.stofs-tmp.{os.getpid()}"
+                remove_path(temporary)
+                copy_path(local_path, temporary)
+                if os.path.isdir(temporary):
+                    remove_path(path)
+                os.replace(temporary, path)
+            log.info(f"Published {len(local)} outputs of task {task_name}")
+        except Exception as e:
+            log.error(f"Unable to publish the outputs of task {task_name}: {e}")
+            if on_failed is not None:
+                on_failed(e)
+            raise
+        if on_published is not None:
+            on_published()
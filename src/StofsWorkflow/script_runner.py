@@ -0,0 +1,332 @@
+import asyncio
+import collections
+import os
+import signal
+import subprocess
+import time
+from typing import IO, Optional
+
+from .proc_sampler import ProcessTreeSampler
+from .stofs_logger import get_stofs_logger
+from .task_metrics import ResourceUsage, read_proc_io
+
+log = get_stofs_logger()
+
+# Time given to a process group to exit after SIGTERM before it is sent SIGKILL
+KILL_GRACE_PERIOD = 10.0
+
+# Time allowed for the output pipes to drain after the process has exited. The
+# pipes stay open while any background process started by a script is alive.
+PIPE_DRAIN_TIMEOUT = 5.0
+
+
+class ScriptError(RuntimeError):
+    """
+    Error raised when a script, command line or entry point of a task fails,
+    which carries the exit code it failed with so that the run state records
+    what happened.
+    """
+
+    def __init__(self, message: str, exit_code: int) -> None:
+        """
+        Initialize the ScriptError.
+
+        Args:
+            message (str): The description of the failure.
+            exit_code (int): The exit code of the failed script.
+        """
+        super().__init__(message)
+        self.__exit_code = exit_code
+
+    def exit_code(self) -> int:
+        """
+        Get the exit code of the failed script.
+
+        Returns:
+            int: The exit code.
+        """
+        return self.__exit_code
+
+
+def kill_process_group(process: subprocess.Popen) -> None:
+    """
+    Terminate a process and every process it started.
+
+    The process group is sent SIGTERM, and then SIGKILL if it has not exited
+    within the grace period.
+
+    Args:
+        process (subprocess.Popen): The leader of the process group.
+    """
+    for sig in (signal.SIGTERM, signal.SIGKILL):
+        try:
+            os.killpg(process.pid, sig)
+        except ProcessLookupError:
+            break
+        try:
+            process.wait(timeout=KILL_GRACE_PERIOD)
+            return
+        except subprocess.TimeoutExpired:
+            continue
+    process.wait()
+
+
+class ProcessSupervisor:
+    """
+    Class which runs a command and streams its output to a log file.
+
+    The command is run as the leader of a new process group so that, if it
+    times out or the workflow is interrupted, the command and all of the
+    processes it started can be killed together. Its stdout and stderr are read
+    through non-blocking pipes by an asyncio event loop and written to the log
+    file as they arrive, while the last lines are kept in memory so they can
+    be reported if the command fails.
+
+    The process is reaped with wait4() so that the CPU time and peak memory of
+    this command alone (including its descendants) are known even when other
+    commands run concurrently, and its I/O counters are read from /proc before
+    it is reaped.
+    """
+
+    def __init__(
+        self,
+        command: list[str],
+        log_file: str,
+        timeout: Optional[float] = None,
+        tail_lines: int = 50,
+        sample_interval: Optional[float] = None,
+        *,
+        environment: Optional[dict[str, str]] = None,
+        cwd: Optional[str] = None,
+    ) -> None:
+        """
+        Initialize the ProcessSupervisor.
+
+        Args:
+            command (list[str]): The command and its arguments.
+            log_file (str): The file the command's output is appended to.
+            timeout (float, optional): The maximum run time in seconds. Defaults to None.
+            tail_lines (int): The number of output lines kept in memory. Defaults to 50.
+            sample_interval (float, optional): When set, the process tree of the
+                command is sampled through /proc at this interval in seconds.
+            environment (dict[str, str], optional): The environment of the command,
+                defaults to the environment of the workflow.
+            cwd (str, optional): The directory the command runs in, defaults to
+                the working directory of the workflow.
+        """
+        self.__command = command
+        self.__log_file = log_file
+        self.__timeout = timeout
+        self.__tail: collections.deque[str] = collections.deque(maxlen=tail_lines)
+        self.__timed_out = False
+        self.__resource_usage = ResourceUsage()
+        self.__sample_interval = sample_interval
+        self.__process_profile: dict[str, dict] = {}
+        self.__environment = environment
+        self.__cwd = cwd
+
+    def log_file(self) -> str:
+        """
+        Get the path of the log file.
+
+        Returns:
+            str: The path of the log file.
+        """
+        return self.__log_file
+
+    def tail(self) -> list[str]:
+        """
+        Get the last lines written by the command to stdout or stderr.
+
+        Returns:
+            list[str]: The last lines of output.
+        """
+        return list(self.__tail)
+
+    def timed_out(self) -> bool:
+        """
+        Check if the command was killed because it exceeded its timeout.
+
+        Returns:
+            bool: True if the command timed out.
+        """
+        return self.__timed_out
+
+    def resource_usage(self) -> ResourceUsage:
+        """
+        Get the resources used by the command once it has exited.
+
+        Returns:
+            ResourceUsage: The resources used by the command and its descendants.
+        """
+        return self.__resource_usage
+
+    def process_profile(self) -> dict[str, dict]:
+        """
+        Get the usage of the command's process tree by executable name, as
+        sampled while it ran. This is empty unless a sample interval was set.
+
+        Returns:
+            dict[str, dict]: The sampled usage of each executable name.
+        """
+        return self.__process_profile
+
+    def run(self) -> int:
+        """
+        Run the command to completion.
+
+        Returns:
+            int: The exit code of the command, negative if it was killed by a signal.
+        """
+        log_directory = os.path.dirname(self.__log_file)
+        if log_directory:
+            os.makedirs(log_directory, exist_ok=True)
+
+        with open(self.__log_file, "a") as log_stream:
+            log_stream.write(
+                f"==== {time.strftime('%Y-%m-%d %H:%M:%S')} :: {' '.join(self.__command)}\n"
+            )
+            log_stream.flush()
+            return asyncio.run(self.__supervise(log_stream))
+
+    async def __supervise(self, log_stream: IO[str]) -> int:
+        """
+        Start the command, stream its output and wait for it to exit.
+
+        Args:
+            log_stream (IO[str]): The open log file.
+
+        Returns:
+            int: The exit code of the command.
+        """
+        loop = asyncio.get_running_loop()
+        start_time = time.monotonic()
+        process = subprocess.Popen(
+            self.__command,
+            shell=False,
+            start_new_session=True,
+            env=self.__environment,
+            cwd=self.__cwd,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+
+        readers = [
+            asyncio.ensure_future(self.__stream(process.stdout, log_stream, "")),
+            asyncio.ensure_future(
+                self.__stream(process.stderr, log_stream, "[stderr] ")
+            ),
+        ]
+
+        sampler = None
+        if self.__sample_interval:
+            sampler = ProcessTreeSampler(process.pid, self.__sample_interval)
+            sampler.start()
+
+        waiter = loop.run_in_executor(None, self.__reap, process, sampler)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout=self.__timeout)
+        except asyncio.TimeoutError:
+            self.__timed_out = True
+            log.error(
+                f"Command {self.__command[0]} timed out after {self.__timeout}s, killing it"
+            )
+            await ProcessSupervisor.__kill(process, waiter)
+        except BaseException:
+            kill_process_group(process)
+            raise
+
+        self.__resource_usage.wall_time = time.monotonic() - start_time
+
+        _, pending = await asyncio.wait(readers, timeout=PIPE_DRAIN_TIMEOUT)
+        for reader in pending:
+            reader.cancel()
+
+        return process.returncode
+
+    @staticmethod
+    async def __kill(process: subprocess.Popen, waiter: asyncio.Future) -> None:
+        """
+        Kill the process group of a command, escalating from SIGTERM to SIGKILL.
+
+        Args:
+            process (subprocess.Popen): The leader of the process group.
+            waiter (asyncio.Future): The future which completes when the process is reaped.
+        """
+        for sig in (signal.SIGTERM, signal.SIGKILL):
+            try:
+                os.killpg(process.pid, sig)
+            except ProcessLookupError:
+                break
+            try:
+                await asyncio.wait_for(asyncio.shield(waiter), KILL_GRACE_PERIOD)
+                return
+            except asyncio.TimeoutError:
+                continue
+        await waiter
+
+    def __reap(
+        self, process: subprocess.Popen, sampler: Optional[ProcessTreeSampler]
+    ) -> None:
+        """
+        Wait for a process to exit and collect its resource usage.
+
+        Args:
+            process (subprocess.Popen): The process to wait for.
+            sampler (ProcessTreeSampler, optional): The sampler of the process tree, stopped once the process exits.
+        """
+        try:
+            os.waitid(os.P_PID, process.pid, os.WEXITED | os.WNOWAIT)
+            if sampler is not None:
+                sampler.stop()
+                self.__process_profile = sampler.summary()
+            io_counters = read_proc_io(process.pid)
+            _, status, rusage = os.wait4(process.pid, 0)
+        except ChildProcessError:
+            # The process was already reaped elsewhere, i.e. after an interrupt
+            if sampler is not None:
+                sampler.stop()
+            process.wait()
+            return
+
+        process.returncode = os.waitstatus_to_exitcode(status)
+        self.__resource_usage.user_time = rusage.ru_utime
+        self.__resource_usage.system_time = rusage.ru_stime
+        self.__resource_usage.max_rss_kb = rusage.ru_maxrss
+        if io_counters is not None:
+            self.__resource_usage.read_bytes = io_counters.get("read_bytes", 0)
+            self.__resource_usage.write_bytes = io_counters.get("write_bytes", 0)
+            self.__resource_usage.read_chars = io_counters.get("rchar", 0)
+            self.__resource_usage.write_chars = io_counters.get("wchar", 0)
+
+    async def __stream(self, pipe: IO[bytes], log_stream: IO[str], prefix: str) -> None:
+        """
+        Copy the lines read from a pipe to the log file and the tail buffer.
+
+        Args:
+            pipe (IO[bytes]): The pipe to read from.
+            log_stream (IO[str]): The open log file.
+            prefix (str): A prefix added to each line, used to mark stderr.
+        """
+        loop = asyncio.get_running_loop()
+        reader = asyncio.StreamReader(limit=2**20)
+        transport, _ = await loop.connect_read_pipe(
+            lambda: asyncio.StreamReaderProtocol(reader), pipe
+        )
+
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    # The line is longer than the reader limit, take what is buffered
+                    line = await reader.read(2**20)
+                if not line:
+                    break
+                text = prefix + line.decode(errors="replace").rstrip("\n")
+                log_stream.write(text + "\n")
+                log_stream.flush()
+                self.__tail.append(text)
+        finally:
+            transport.close()
@@ -0,0 +1,550 @@
+import math
+import os
+import shlex
+import subprocess
+import time
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Optional
+
+from .execution_policy import ExecutionMode, ExecutionPolicy
+from .mpmd import read_status
+from .stofs_logger import get_stofs_logger
+from .stofs_task import StofsTask
+from .task_graph import TaskGraph
+
+if TYPE_CHECKING:
+    from .stofs_model import StofsModel
+
+log = get_stofs_logger()
+
+# Fields requested from sacct, in order
+SACCT_FIELDS = ["JobID", "State", "ExitCode", "ElapsedRaw", "MaxRSS"]
+
+# States of jobs which have not finished. squeue also lists jobs which have
+# finished recently (i.e. COMPLETED or FAILED) until MinJobAge has passed.
+ACTIVE_STATES = [
+    "PENDING",
+    "RUNNING",
+    "CONFIGURING",
+    "COMPLETING",
+    "SUSPENDED",
+    "REQUEUED",
+]
+
+
+@dataclass
+class SlurmSettings:
+    """
+    Settings for running tasks as SLURM jobs.
+
+    The sbatch, squeue, sacct and scancel commands can be replaced, i.e. by
+    stand-ins which run the jobs locally for testing. Jobs are submitted to
+    the given partition, account and qos with the extra sbatch arguments, and
+    the queue is checked every poll_interval seconds.
+    """
+
+    sbatch: str = field(default="sbatch")
+    squeue: str = field(default="squeue")
+    sacct: str = field(default="sacct")
+    scancel: str = field(default="scancel")
+    srun: str = field(default="srun")
+    partition: Optional[str] = field(default=None)
+    account: Optional[str] = field(default=None)
+    qos: Optional[str] = field(default=None)
+    extra_args: list[str] = field(default_factory=list)
+    poll_interval: float = field(default=30.0)
+
+    @staticmethod
+    def from_dict(attributes: dict) -> "SlurmSettings":
+        """
+        Create the SLURM settings from a validated configuration dictionary.
+
+        Args:
+            attributes (dict): The slurm section of the configuration file.
+
+        Returns:
+            SlurmSettings: The SLURM settings.
+        """
+        return SlurmSettings(
+            sbatch=attributes.get("sbatch", "sbatch"),
+            squeue=attributes.get("squeue", "squeue"),
+            sacct=attributes.get("sacct", "sacct"),
+            scancel=attributes.get("scancel", "scancel"),
+            srun=attributes.get("srun", "srun"),
+            partition=attributes.get("partition"),
+            account=attributes.get("account"),
+            qos=attributes.get("qos"),
+            extra_args=attributes.get("extra_args", []),
+            poll_interval=attributes.get("poll_interval", 30.0),
+        )
+
+
+@dataclass
+class SlurmJob:
+    """
+    A task submitted as a SLURM job. The steps of the task run one after the
+    other in a single job, or as the elements of a job array when array is set.
+    """
+
+    task: str
+    job_id: str
+    steps: list[int]
+    array: bool
+    status_prefix: str
+    submit_time: float = field(default_factory=time.time)
+
+
+class SlurmBackend:
+    """
+    Class which runs tasks as SLURM batch jobs.
+
+    Each task is written to a batch script which runs its steps and leaves an
+    exit status file for each step, so that the exit codes are known even when
+    SLURM accounting is not available. Tasks whose steps may run concurrently
+    become job arrays, and the dependencies between tasks become afterok job
+    dependencies, so that the whole graph of a stage is handed to the scheduler
+    at once and spread across nodes.
+    """
+
+    def __init__(self, settings: SlurmSettings, work_directory: str) -> None:
+        """
+        Initialize the SlurmBackend.
+
+        Args:
+            settings (SlurmSettings): The SLURM settings.
+            work_directory (str): The directory for batch scripts and exit status files.
+        """
+        self.__settings = settings
+        self.__work_directory = work_directory
+
+    def settings(self) -> SlurmSettings:
+        """
+        Get the SLURM settings.
+
+        Returns:
+            SlurmSettings: The SLURM settings.
+        """
+        return self.__settings
+
+    def submit(
+        self,
+        name: str,
+        steps: dict[int, list[str]],
+        *,
+        array: bool = False,
+        max_concurrent: Optional[int] = None,
+        num_processes: int = 1,
+        timeout: Optional[float] = None,
+        dependencies: Optional[list[str]] = None,
+        log_file: str,
+    ) -> SlurmJob:
+        """
+        Submit a task as a batch job.
+
+        Args:
+            name (str): The name of the task.
+            steps (dict[int, list[str]]): The command of each step, by step index.
+            array (bool): Run the steps as the elements of a job array. Defaults to False.
+            max_concurrent (int, optional): The number of array elements which may run at once, all of them if not set.
+            num_processes (int): The number of MPI ranks of each step. Defaults to 1.
+            timeout (float, optional): The time limit of the job in seconds.
+            dependencies (list[str], optional): Job ids which must complete successfully first.
+            log_file (str): The file the output of the job is written to, %a is replaced by the array index.
+
+        Returns:
+            SlurmJob: The submitted job.
+        """
+        os.makedirs(self.__work_directory, exist_ok=True)
+        os.makedirs(os.path.dirname(log_file), exist_ok=True)
+        status_prefix = os.path.join(self.__work_directory, f"{name}.status")
+        for index in steps:
+            if os.path.exists(f"{status_prefix}.{index}"):
+                os.unlink(f"{status_prefix}.{index}")
+
+        if num_processes > 1:
+            steps = {
+                index: [self.__settings.srun, "-n", str(num_processes), *command]
+                for index, command in steps.items()
+            }
+        batch_script = os.path.join(self.__work_directory, f"{name}.sh")
+        with open(batch_script, "w") as f:
+            f.write(SlurmBackend.__batch_script(name, steps, array, status_prefix))
+        os.chmod(batch_script, 0o755)
+
+        command = [
+            self.__settings.sbatch,
+            "--parsable",
+            f"--job-name={name}",
+            f"--output={log_file}",
+            f"--chdir={os.getcwd()}",
+            f"--ntasks={num_processes}",
+        ]
+        if array:
+            indices = ",".join(str(index) for index in steps)
+            command.append(
+                f"--array={indices}"
+                + (f"%{max_concurrent}" if max_concurrent is not None else "")
+            )
+        if dependencies:
+            command.append(f"--dependency=afterok:{':'.join(dependencies)}")
+            command.append("--kill-on-invalid-dep=yes")
+        if timeout is not None:
+            command.append(f"--time={math.ceil(timeout / 60)}")
+        for option in ("partition", "account", "qos"):
+            value = getattr(self.__settings, option)
+            if value is not None:
+                command.append(f"--{option}={value}")
+        command.extend(self.__settings.extra_args)
+        command.append(batch_script)
+
+        result = subprocess.run(command, capture_output=True, text=True, check=False)
+        if result.returncode != 0:
+            msg = f"sbatch failed for task {name}: {result.stderr.strip()}"
+            raise RuntimeError(msg)
+        job_id = result.stdout.strip().split(";")[0]
+        log.info(f"Submitted task {name} as SLURM job {job_id}")
+        return SlurmJob(name, job_id, list(steps), array, status_prefix)
+
+    def active_jobs(self, jobs: list[SlurmJob]) -> set[str]:
+        """
+        Find which jobs are still pending or running.
+
+        Args:
+            jobs (list[SlurmJob]): The jobs to check.
+
+        Returns:
+            set[str]: The ids of the jobs which are still in the queue.
+        """
+        if not jobs:
+            return set()
+        result = subprocess.run(
+            [
+                self.__settings.squeue,
+                "--noheader",
+                "--format=%i %T",
+                f"--states={','.join(ACTIVE_STATES)}",
+                f"--jobs={','.join(job.job_id for job in jobs)}",
+            ],
+            capture_output=True,
+            text=True,
+            check=False,
+        )
+        if result.returncode != 0:
+            if "Invalid job id" in result.stderr:
+                # squeue fails once none of the jobs is known any more
+                return set()
+            log.warning(f"Unable to query the SLURM queue: {result.stderr.strip()}")
+            return {job.job_id for job in jobs}
+        # Array elements are listed as <job id>_<index>
+        active = set()
+        for line in result.stdout.splitlines():
+            job_id, _, state = line.strip().partition(" ")
+            if state.strip() in ACTIVE_STATES:
+                active.add(job_id.split("_")[0])
+        return active
+
+    def step_results(
+        self, job: SlurmJob
+    ) -> dict[int, Optional[tuple[int, float, float]]]:
+        """
+        Read the exit status files of a finished job.
+
+        Args:
+            job (SlurmJob): The job.
+
+        Returns:
+            dict[int, Optional[tuple[int, float, float]]]: The exit code, start
+                time and end time of each step, or None for steps which did not
+                run (i.e. because the job was cancelled).
+        """
+        return {index: read_status(job.status_prefix, index) for index in job.steps}
+
+    def accounting(self, job: SlurmJob) -> dict[int, dict]:
+        """
+        Get the accounting information of a finished job from sacct.
+
+        Args:
+            job (SlurmJob): The job.
+
+        Returns:
+            dict[int, dict]: The state, wall time and peak memory of each
+                array element (or of index 0 for a job which is not an array),
+                empty if accounting is not available.
+        """
+        try:
+            result = subprocess.run(
+                [
+                    self.__settings.sacct,
+                    "--noheader",
+                    "--parsable2",
+                    f"--format={','.join(SACCT_FIELDS)}",
+                    f"--jobs={job.job_id}",
+                ],
+                capture_output=True,
+                text=True,
+                check=False,
+            )
+        except OSError:
+            return {}
+        if result.returncode != 0:
+            return {}
+
+        accounting: dict[int, dict] = {}
+        for line in result.stdout.splitlines():
+            values = dict(zip(SACCT_FIELDS, line.split("|")))
+            if "JobID" not in values:
+                continue
+            job_id, _, step = values["JobID"].partition(".")
+            index = int(job_id.partition("_")[2] or 0) if job.array else 0
+            entry = accounting.setdefault(index, {})
+            if not step:
+                entry["state"] = values.get("State", "")
+                if values.get("ElapsedRaw", "").isdigit():
+                    entry["wall_time"] = float(values["ElapsedRaw"])
+            rss = SlurmBackend.__memory_kb(values.get("MaxRSS", ""))
+            if rss is not None:
+                entry["max_rss_kb"] = max(entry.get("max_rss_kb", 0), rss)
+        return accounting
+
+    def cancel(self, jobs: list[SlurmJob]) -> None:
+        """
+        Cancel jobs.
+
+        Args:
+            jobs (list[SlurmJob]): The jobs to cancel.
+        """
+        if jobs:
+            subprocess.run(
+                [self.__settings.scancel, *(job.job_id for job in jobs)],
+                capture_output=True,
+                check=False,
+            )
+
+    @staticmethod
+    def __batch_script(
+        name: str, steps: dict[int, list[str]], array: bool, status_prefix: str
+    ) -> str:
+        """
+        Write the batch script of a task.
+
+        Args:
+            name (str): The name of the task.
+            steps (dict[int, list[str]]): The command of each step, by step index.
+            array (bool): Select the step to run from the array index.
+            status_prefix (str): The prefix of the exit status file of each step.
+
+        Returns:
+            str: The batch script.
+        """
+        lines = [
+            "#!/bin/bash",
+            f"# Batch script generated by StofsWorkflow for task {name}",
+            "",
+            "run_step() {",
+            "  local index=$1",
+            "  shift",
+            "  local start",
+            "  start=$(date +%s.%N)",
+            '  "$@"',
+            "  local code=$?",
+            f'  echo "$code $start $(date +%s.%N)" > {shlex.quote(status_prefix)}.$index',
+            "  return $code",
+            "}",
+            "",
+        ]
+        if array:
+            lines.append('case "$SLURM_ARRAY_TASK_ID" in')
+            for index, command in steps.items():
+                lines.append(f"  {index}) run_step {index} {shlex.join(command)} ;;")
+            lines.append(
+                '  *) echo "Unknown array index $SLURM_ARRAY_TASK_ID" >&2; exit 1 ;;'
+            )
+            lines.append("esac")
+        else:
+            for index, command in steps.items():
+                lines.append(f"run_step {index} {shlex.join(command)} || exit $?")
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def __memory_kb(value: str) -> Optional[int]:
+        """
+        Convert a memory size reported by sacct (i.e. 1024K or 2.5G) to kilobytes.
+
+        Args:
+            value (str): The memory size.
+
+        Returns:
+            Optional[int]: The size in kilobytes, or None if it is not given.
+        """
+        if not value:
+            return None
+        units = {"K": 1, "M": 1024, "G": 1024**2, "T": 1024**3}
+        try:
+            if value[-1] in units:
+                return int(float(value[:-1]) * units[value[-1]])
+            return int(float(value)) // 1024
+        except ValueError:
+            return None
+
+
+class SlurmGraphRunner:
+    """
+    Class which runs the tasks of a stage graph of a model as SLURM jobs, and
+    records their outcome in the model's run state, metrics and performance
+    history like that of tasks run locally.
+    """
+
+    def __init__(self, model: "StofsModel") -> None:
+        """
+        Initialize the SlurmGraphRunner.
+
+        Args:
+            model (StofsModel): The model whose tasks are run.
+        """
+        config = model.config()
+        self.__model = model
+        self.__backend = SlurmBackend(
+            config.slurm if config.slurm is not None else SlurmSettings(),
+            os.path.join(config.state_directory, "slurm", model.options().cycle),
+        )
+
+    def run(self, graph: TaskGraph) -> None:
+        """
+        Submit the tasks of a graph as SLURM jobs, with the dependencies of
+        the graph as job dependencies, and wait for them to finish.
+
+        Args:
+            graph (TaskGraph): The tasks to run.
+        """
+        jobs = {}
+        try:
+            for task in graph.tasks():
+                if self.__model._skip_reason(task) is not None:
+                    continue
+                dependencies = [
+                    jobs[name].job_id for name in task.depends_on() if name in jobs
+                ]
+                jobs[task.name()] = self.__submit(task, dependencies)
+        except Exception:
+            self.__backend.cancel(list(jobs.values()))
+            raise
+
+        failures = []
+        pending = dict(jobs)
+        while pending:
+            active = self.__backend.active_jobs(list(pending.values()))
+            for name, job in list(pending.items()):
+                if job.job_id in active:
+                    continue
+                del pending[name]
+                if self.__record(graph.task(name), job) != 0:
+                    failures.append(name)
+            if pending:
+                time.sleep(self.__backend.settings().poll_interval)
+
+        if failures:
+            msg = f"Tasks failed: {', '.join(failures)}"
+            raise RuntimeError(msg)
+
+    def __submit(self, task: StofsTask, dependencies: list[str]) -> SlurmJob:
+        """
+        Submit a task as a SLURM job. The scripts of a PARALLEL task become a
+        job array, while those of a SERIAL task run one after the other in one job.
+
+        Args:
+            task (StofsTask): The task.
+            dependencies (list[str]): The job ids of the tasks it depends on.
+
+        Returns:
+            SlurmJob: The submitted job.
+        """
+        model = self.__model
+        if task.mode() != ExecutionMode.LEGACY:
+            msg = f"Task {task.name()} must be a LEGACY task to run on SLURM"
+            raise ValueError(msg)
+        if task.legacy_task_list() is None:
+            msg = f"No legacy tasks exist for {model.type()}:{task.name()}"
+            raise ValueError(msg)
+
+        run_state = model._run_state()
+        steps = {
+            index: model._script_command(task, script)
+            for index, script in enumerate(task.legacy_task_list())
+            if not run_state.is_script_complete(task.name(), index, script)
+        }
+        execution_attributes = model._execution_attributes(task)
+        array = (
+            execution_attributes.policy
+            in (ExecutionPolicy.PARALLEL, ExecutionPolicy.MPMD)
+            and len(steps) > 1
+        )
+
+        run_state.start_task(task.name())
+        return self.__backend.submit(
+            task.name(),
+            steps,
+            array=array,
+            max_concurrent=execution_attributes.max_concurrent,
+            num_processes=execution_attributes.num_processes,
+            timeout=execution_attributes.timeout,
+            dependencies=dependencies,
+            log_file=model._log_file(f"{task.name()}.%a" if array else task.name()),
+        )
+
+    def __record(self, task: StofsTask, job: SlurmJob) -> int:
+        """
+        Record the exit codes and accounting of a finished SLURM job.
+
+        Args:
+            task (StofsTask): The task the job ran.
+            job (SlurmJob): The finished job.
+
+        Returns:
+            int: The exit code of the task, which is that of its first failed script.
+        """
+        model = self.__model
+        run_state = model._run_state()
+        results = self.__backend.step_results(job)
+        accounting = self.__backend.accounting(job)
+        scripts = task.legacy_task_list()
+
+        exit_code = 0
+        for index, result in results.items():
+            step_code = result[0] if result is not None else 1
+            if result is None:
+                log.error(f"Script {scripts[index]} of task {task.name()} did not run")
+            run_state.finish_script(task.name(), index, scripts[index], step_code)
+            usage = accounting.get(index if job.array else 0, {})
+            record = {
+                "task": task.name(),
+                "script": scripts[index],
+                "exit_code": step_code,
+                "timed_out": usage.get("state", "").startswith("TIMEOUT"),
+                "start_time": result[1] if result is not None else job.submit_time,
+                "wall_time": result[2] - result[1] if result is not None else 0.0,
+                "slurm_job_id": job.job_id,
+            }
+            if "max_rss_kb" in usage:
+                record["max_rss_kb"] = usage["max_rss_kb"]
+            model._record_script(record)
+            if step_code != 0 and exit_code == 0:
+                exit_code = step_code
+
+        ran = [result for result in results.values() if result is not None]
+        if ran:
+            start_time = min(result[1] for result in ran)
+            duration = max(result[2] for result in ran) - start_time
+        else:
+            start_time, duration = job.submit_time, 0.0
+        model._record_task(
+            task.name(), duration, exit_code=exit_code, start_time=start_time
+        )
+        if exit_code == 0:
+            log.info(f"Task {task.name()} (SLURM job {job.job_id}) completed")
+            model._record_outputs(task, model._task_inputs(task))
+        else:
+            run_state.finish_task(task.name(), exit_code)
+            log.error(
+                f"Task {task.name()} (SLURM job {job.job_id}) failed with exit code {exit_code}"
+            )
+        return exit_code
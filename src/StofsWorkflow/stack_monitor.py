@@ -0,0 +1,218 @@
+import os
+import time
+from collections.abc import Iterator
+from dataclasses import dataclass, field
+from typing import Optional
+
+from .completion_watcher import (
+    IN_CLOSE_WRITE,
+    CompletionCriteria,
+    CompletionWatcher,
+    watch_directories,
+)
+from .stofs_logger import get_stofs_logger
+
+log = get_stofs_logger()
+
+# Signatures at the start of NetCDF classic, 64-bit offset, 64-bit data and
+# NetCDF-4 (HDF5) files
+NETCDF_SIGNATURES = (b"CDF\x01", b"CDF\x02", b"CDF\x05", b"\x89HDF\r\n\x1a\n")
+
+
+def has_valid_header(path: str) -> bool:
+    """
+    Check that a file starts with a NetCDF or HDF5 signature.
+
+    Args:
+        path (str): The path of the file.
+
+    Returns:
+        bool: True if the file has a NetCDF or HDF5 header.
+    """
+    try:
+        with open(path, "rb") as f:
+            header = f.read(8)
+    except OSError:
+        return False
+    return any(header.startswith(signature) for signature in NETCDF_SIGNATURES)
+
+
+@dataclass
+class StackSettings:
+    """
+    Settings describing the output stacks written by the model.
+
+    Each stack is made of the files named by the files patterns, with {stack}
+    replaced by the stack number, in directory. Stacks are numbered from first,
+    and count is the number of stacks the run writes, if known. The tasks of
+    stage which are marked per_stack run once for each stack as soon as the
+    stack is complete. A stack file is complete once inotify sees it closed,
+    the same file of the next stack appears or the model run completes. Only
+    when settle_time is set is a file which has not changed size for that many
+    seconds also treated as complete, since a model which pauses between
+    writes (i.e. while writing a hotstart) would otherwise have its stack
+    processed early. The files are checked at least every poll_interval
+    seconds, and the monitor gives up after timeout seconds.
+    """
+
+    directory: str = field(default=".")
+    files: list[str] = field(default_factory=list)
+    first: int = field(default=1)
+    count: Optional[int] = field(default=None)
+    stage: str = field(default="post")
+    settle_time: Optional[float] = field(default=None)
+    poll_interval: float = field(default=5.0)
+    timeout: float = field(default=18000.0)
+
+    @staticmethod
+    def from_dict(attributes: dict) -> "StackSettings":
+        """
+        Create the stack settings from a validated configuration dictionary.
+
+        Args:
+            attributes (dict): The stacks section of the configuration file.
+
+        Returns:
+            StackSettings: The stack settings.
+        """
+        return StackSettings(
+            directory=os.path.abspath(os.path.expandvars(attributes["directory"])),
+            files=attributes["files"],
+            first=attributes.get("first", 1),
+            count=attributes.get("count"),
+            stage=attributes.get("stage", "post"),
+            settle_time=attributes.get("settle_time"),
+            poll_interval=attributes.get("poll_interval", 5.0),
+            timeout=attributes.get("timeout", 18000.0),
+        )
+
+    def stack_files(self, stack: int) -> list[str]:
+        """
+        Get the paths of the files which make up a stack.
+
+        Args:
+            stack (int): The stack number.
+
+        Returns:
+            list[str]: The paths of the stack's files.
+        """
+        return [
+            os.path.join(self.directory, pattern.format(stack=stack))
+            for pattern in self.files
+        ]
+
+
+class StackMonitor:
+    """
+    Class which follows the stacks written by a running model.
+
+    A stack is complete once every one of its files has a valid NetCDF header
+    and has been closed, or has been followed by the same file of the next
+    stack (the model only starts a stack once it has finished the previous
+    one), or, when a settle time is set, has stopped growing. Once the model
+    run is complete, every stack which has been written is complete.
+    """
+
+    def __init__(
+        self, settings: StackSettings, completion: Optional[CompletionCriteria] = None
+    ) -> None:
+        """
+        Initialize the StackMonitor.
+
+        Args:
+            settings (StackSettings): The settings describing the stacks.
+            completion (CompletionCriteria, optional): The criteria which show that the model run is complete.
+        """
+        self.__settings = settings
+        self.__completion = (
+            CompletionWatcher(completion) if completion is not None else None
+        )
+        self.__sizes: dict[str, tuple[int, float]] = {}
+        self.__closed: set[str] = set()
+
+    def stacks(self) -> Iterator[int]:
+        """
+        Wait for each stack to complete, in order.
+
+        Yields:
+            int: The number of each stack once it is complete.
+
+        Raises:
+            TimeoutError: If the stacks are not all complete within the timeout.
+            RuntimeError: If the model run completed without writing all of the expected stacks.
+        """
+        settings = self.__settings
+        deadline = time.monotonic() + settings.timeout
+        inotify = watch_directories({settings.directory})
+        stack = settings.first
+        try:
+            while settings.count is None or stack < settings.first + settings.count:
+                model_complete = (
+                    self.__completion is not None
+                    and self.__completion.check() is not None
+                )
+                if self.__is_complete(stack, model_complete):
+                    yield stack
+                    stack += 1
+                    continue
+
+                if model_complete:
+                    if settings.count is not None:
+                        msg = f"Model run completed without writing stack {stack}"
+                        raise RuntimeError(msg)
+                    return
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    msg = f"Stack {stack} did not complete within {settings.timeout:g}s"
+                    raise TimeoutError(msg)
+
+                wait_time = min(settings.poll_interval, remaining)
+                if inotify is None:
+                    time.sleep(wait_time)
+                else:
+                    for mask, name in inotify.wait(wait_time):
+                        if mask & IN_CLOSE_WRITE:
+                            self.__closed.add(os.path.join(settings.directory, name))
+        finally:
+            if inotify is not None:
+                inotify.close()
+
+    def __is_complete(self, stack: int, model_complete: bool) -> bool:
+        """
+        Check whether every file of a stack is complete.
+
+        Args:
+            stack (int): The stack number.
+            model_complete (bool): Whether the model run has completed.
+
+        Returns:
+            bool: True if the stack is complete.
+        """
+        next_files = self.__settings.stack_files(stack + 1)
+        for path, next_path in zip(self.__settings.stack_files(stack), next_files):
+            if not os.path.exists(path) or not has_valid_header(path):
+                return False
+            if model_complete or path in self.__closed or os.path.exists(next_path):
+                continue
+            if self.__settings.settle_time is None or not self.__is_stable(path):
+                return False
+        return True
+
+    def __is_stable(self, path: str) -> bool:
+        """
+        Check whether a file has stopped growing for the settle time.
+
+        Args:
+            path (str): The path of the file.
+
+        Returns:
+            bool: True if the size of the file has not changed for the settle time.
+        """
+        size = os.stat(path).st_size
+        now = time.monotonic()
+        previous = self.__sizes.get(path)
+        if previous is None or previous[0] != size:
+            self.__sizes[path] = (size, now)
+            return False
+        return now - previous[1] >= self.__settings.settle_time
@@ -1,7 +1,21 @@
+import os
 from dataclasses import dataclass, field
 from typing import Optional
 
+from .completion_watcher import CompletionCriteria
+from .execution_policy import ExecutionAttributes, ExecutionMode
+from .input_readiness import UpstreamSource
 from .model_type import ModelType
+from .product_cache import CacheSettings
+from .resources import NodeCapacity
+from .scratch import ScratchSettings
+from .slurm_backend import SlurmSettings
+from .stack_monitor import StackSettings
+from .stofs_task import StofsTask
+
+# The variable which tells the scripts which configuration file they run
+# under, i.e. for 'stofs cache run --config $STOFS_CONFIG'
+CONFIG_VARIABLE = "STOFS_CONFIG"
 
 
 @dataclass(frozen=True)
@@ -20,6 +34,25 @@ class StofsConfig:
     model_name: str = field(default="Unknown", init=False)
     model_version: str = field(default="Unknown", init=False)
     script_directory: Optional[str] = field(default=None, init=False)
+    state_directory: Optional[str] = field(default=None, init=False)
+    execution_attributes: dict[str, ExecutionAttributes] = field(
+        default_factory=dict, init=False
+    )
+    stage_tasks: dict[str, list[StofsTask]] = field(default_factory=dict, init=False)
+    python_workers: Optional[int] = field(default=None, init=False)
+    python_preload: list[str] = field(default_factory=list, init=False)
+    python_paths: list[str] = field(default_factory=list, init=False)
+    python_loaders: dict[str, str] = field(default_factory=dict, init=False)
+    python_socket: Optional[str] = field(default=None, init=False)
+    python_threads: Optional[int] = field(default=None, init=False)
+    completion: Optional[CompletionCriteria] = field(default=None, init=False)
+    stacks: Optional[StackSettings] = field(default=None, init=False)
+    backend: str = field(default="local", init=False)
+    slurm: Optional[SlurmSettings] = field(default=None, init=False)
+    node: NodeCapacity = field(default_factory=NodeCapacity, init=False)
+    scratch: Optional[ScratchSettings] = field(default=None, init=False)
+    upstream: dict[str, UpstreamSource] = field(default_factory=dict, init=False)
+    cache: Optional[CacheSettings] = field(default=None, init=False)
 
     def __post_init__(self) -> None:
         """
@@ -43,3 +76,172 @@ class StofsConfig:
         object.__setattr__(
             self, "script_directory", validated_input["script_directory"]
         )
+        object.__setattr__(
+            self,
+            "state_directory",
+            validated_input.get("state_directory", os.path.join(os.getcwd(), ".stofs")),
+        )
+        object.__setattr__(
+            self,
+            "execution_attributes",
+            {
+                task_name: ExecutionAttributes.from_dict(task_data)
+                for task_name, task_data in validated_input.get("tasks", {}).items()
+            },
+        )
+        object.__setattr__(
+            self, "stage_tasks", StofsConfig.__stage_tasks(validated_input)
+        )
+
+        python_config = validated_input.get("python", {})
+        object.__setattr__(self, "python_workers", python_config.get("workers"))
+        object.__setattr__(self, "python_preload", python_config.get("preload", []))
+        object.__setattr__(
+            self,
+            "python_paths",
+            StofsConfig.__expand_paths(python_config.get("paths", [])),
+        )
+        object.__setattr__(self, "python_loaders", python_config.get("loaders", {}))
+        object.__setattr__(
+            self,
+            "python_socket",
+            StofsConfig.__expand_paths([python_config["socket"]])[0]
+            if "socket" in python_config
+            else os.path.join(self.state_directory, "stofs.sock"),
+        )
+        # Without an explicit limit, the declared cores of the node are shared
+        # between the declared workers
+        node_config = validated_input.get("node", {})
+        object.__setattr__(
+            self,
+            "python_threads",
+            python_config.get(
+                "threads",
+                max(node_config["cores"] // self.python_workers, 1)
+                if "cores" in node_config and self.python_workers
+                else None,
+            ),
+        )
+        if "completion" in validated_input:
+            object.__setattr__(
+                self,
+                "completion",
+                CompletionCriteria.from_dict(validated_input["completion"]),
+            )
+        if "stacks" in validated_input:
+            object.__setattr__(
+                self, "stacks", StackSettings.from_dict(validated_input["stacks"])
+            )
+        self.__check_stacks()
+        object.__setattr__(
+            self, "backend", validated_input.get("backend", "local").lower()
+        )
+        if "slurm" in validated_input:
+            object.__setattr__(
+                self, "slurm", SlurmSettings.from_dict(validated_input["slurm"])
+            )
+        object.__setattr__(
+            self, "node", NodeCapacity.from_dict(validated_input.get("node", {}))
+        )
+        if "scratch" in validated_input:
+            object.__setattr__(
+                self, "scratch", ScratchSettings.from_dict(validated_input["scratch"])
+            )
+        object.__setattr__(
+            self,
+            "upstream",
+            {
+                name: UpstreamSource.from_dict(name, attributes)
+                for name, attributes in validated_input.get("upstream", {}).items()
+            },
+        )
+        object.__setattr__(
+            self,
+            "cache",
+            CacheSettings.from_dict(
+                validated_input.get("cache", {}), self.state_directory
+            ),
+        )
+
+    def __check_stacks(self) -> None:
+        """
+        Check that the stacks of the per-stack tasks are configured, and that
+        the last stack can be known to be complete.
+
+        Raises:
+            ValueError: If a per-stack task cannot be run.
+        """
+        for stage, tasks in self.stage_tasks.items():
+            for task in tasks:
+                if not task.per_stack():
+                    continue
+                if self.stacks is None or self.stacks.stage != stage:
+                    msg = f"Task {task.name()} is per_stack but no stacks are configured for stage {stage}"
+                    raise ValueError(msg)
+                if self.stacks.count is None and self.completion is None:
+                    msg = (
+                        f"Task {task.name()} is per_stack but the stacks have no count "
+                        "and there are no completion criteria, so the last stack "
+                        "would never be complete"
+                    )
+                    raise ValueError(msg)
+
+    @staticmethod
+    def __stage_tasks(validated_input: dict) -> dict[str, list[StofsTask]]:
+        """
+        Build the task lists for the stages which are broken into
+        individual tasks in the configuration file.
+
+        Args:
+            validated_input (dict): The validated configuration data.
+
+        Returns:
+            dict[str, list[StofsTask]]: The tasks for each configured stage.
+        """
+        stage_tasks = {}
+        for task_name, task_data in validated_input.get("tasks", {}).items():
+            if "stage" not in task_data:
+                continue
+            if "scripts" in task_data:
+                task_mode = ExecutionMode.LEGACY
+            elif "entry_point" in task_data:
+                task_mode = ExecutionMode.PYTHON
+            else:
+                msg = f"Task {task_name} is assigned to stage {task_data['stage']} but has no scripts or entry_point"
+                raise ValueError(msg)
+            if task_data.get("scratch") and task_mode != ExecutionMode.LEGACY:
+                msg = f"Task {task_name} sets scratch, which only tasks with scripts support"
+                raise ValueError(msg)
+            stage_tasks.setdefault(task_data["stage"], []).append(
+                StofsTask(
+                    task_name,
+                    task_mode,
+                    task_data.get("scripts"),
+                    depends_on=task_data.get("depends_on"),
+                    inputs=StofsConfig.__expand_paths(task_data.get("inputs", [])),
+                    outputs=StofsConfig.__expand_paths(task_data.get("outputs", [])),
+                    entry_point=task_data.get("entry_point"),
+                    args=task_data.get("args"),
+                    kwargs=task_data.get("kwargs"),
+                    argv=[os.path.expandvars(arg) for arg in task_data["argv"]]
+                    if "argv" in task_data
+                    else None,
+                    pass_results=task_data.get("pass_results", False),
+                    per_stack=task_data.get("per_stack", False),
+                )
+            )
+        return stage_tasks
+
+    @staticmethod
+    def __expand_paths(paths: list[str]) -> list[str]:
+        """
+        Expand environment variables and make paths absolute, relative to the
+        directory the workflow is run from.
+
+        Args:
+            paths (list[str]): The paths as given in the configuration file.
+
+        Returns:
+            list[str]: The expanded paths.
+        """
+        return [os.path.abspath(os.path.expandvars(path)) for path in paths]
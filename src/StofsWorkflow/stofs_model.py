@@ -1,11 +1,32 @@
 import os
-import subprocess
+import shlex
+import time
+from collections.abc import Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Optional
 
+from .completion_watcher import CompletionWatcher
 from .execution_policy import ExecutionAttributes, ExecutionMode, ExecutionPolicy
+from .fingerprint import FingerprintCache
 from .model_type import ModelType
-from .stofs_config import StofsConfig
+from .mpmd import run_mpmd
+from .perf_database import PerfDatabase
+from .python_runner import PythonTaskRunner
+from .resources import ResourcePool, ResourceRequest, thread_environment
+from .run_state import RunState
+from .scratch import SCRATCH_VARIABLE, ScratchArea
+from .script_runner import ProcessSupervisor, ScriptError
+from .slurm_backend import SlurmGraphRunner
+from .stack_monitor import StackMonitor
+from .stofs_config import CONFIG_VARIABLE, StofsConfig
 from .stofs_logger import get_stofs_logger
+from .stofs_run_options import StofsRunOptions
 from .stofs_task import StofsTask
+from .task_graph import TaskGraph
+from .task_history import TaskHistory
+from .task_metrics import MetricsLog
+from .trace_recorder import TraceRecorder
 
 log = get_stofs_logger()
 
@@ -15,11 +36,24 @@ class StofsModel:
     Class representing a model type in a STOFS workflow.
     """
 
-    def __init__(self, config: StofsConfig) -> None:
+    def __init__(
+        self, config: StofsConfig, options: Optional[StofsRunOptions] = None
+    ) -> None:
         """
-        Initialize the StofsModel with the specified configuration.
+        Initialize the StofsModel with the specified configuration and run options.
         """
         self.__config = config
+        self.__options = options if options is not None else StofsRunOptions()
+        self.__run_state = None
+        self.__metrics = None
+        self.__perf_database = None
+        self.__stage_name = None
+        self.__trace = TraceRecorder("StofsWorkflow")
+        self.__python = PythonTaskRunner(self)
+        self.__fingerprints = None
+        self.__resource_pool = None
+        self.__stack_tasks: list[StofsTask] = []
+        self.__scratch: Optional[ScratchArea] = None
 
     def __repr__(self) -> str:
         """
@@ -36,6 +70,15 @@ class StofsModel:
         """
         return self.__config
 
+    def options(self) -> StofsRunOptions:
+        """
+        Gets the run-time options used for this model instance
+
+        Returns:
+            StofsRunOptions: The run-time options used for this model instance
+        """
+        return self.__options
+
     def type(self) -> ModelType:
         """
         Get the type of the model.
@@ -80,6 +123,629 @@ class StofsModel:
         msg = "Subclasses must implement post()"
         raise NotImplementedError(msg)
 
+    def _run_stage(self, stage_task: StofsTask) -> None:
+        """
+        Run a stage of the workflow.
+
+        If the configuration breaks the stage into individual tasks, those tasks
+        are run as a dependency graph using up to the requested number of jobs.
+        Otherwise, the model's built-in task for the stage is run. Tasks marked
+        per_stack are run for each output stack of the model as soon as the
+        stack is complete, while the model is still running, and the remaining
+        tasks of the stage run once every stack has been processed. The progress
+        of the stage is recorded so that a failed stage can be resumed.
+
+        Args:
+            stage_task (StofsTask): The model's built-in task for the stage.
+        """
+        with self._stage(stage_task) as (graph, estimates, makespan):
+            self._prepare_stage()
+            with self.__trace.span(
+                stage_task.name(),
+                "stage",
+                {"jobs": self.__options.jobs, "predicted_makespan": makespan},
+            ):
+                self.__execute_graph(graph, self._run_and_record, estimates)
+
+    @contextmanager
+    def _stage(
+        self, stage_task: StofsTask
+    ) -> Iterator[tuple[TaskGraph, dict[str, float], float]]:
+        """
+        Set up the run state, metrics, fingerprints, trace and scratch space
+        of a stage, and wait for the outputs of scratch tasks to be published,
+        write the trace and stop the Python workers when the stage ends.
+
+        Args:
+            stage_task (StofsTask): The model's built-in task for the stage.
+
+        Yields:
+            tuple[TaskGraph, dict[str, float], float]: The graph of the tasks
+                which run once the per-stack tasks are done, the expected
+                duration of each task and the predicted makespan of the stage.
+        """
+        tasks = self.__config.stage_tasks.get(stage_task.name(), [stage_task])
+        tasks, self.__stack_tasks = self.__split_stack_tasks(stage_task.name(), tasks)
+        graph = TaskGraph(tasks)
+
+        self.__perf_database = PerfDatabase(self.__config.state_directory)
+        estimates, makespan = self.__predict(stage_task.name(), graph)
+
+        self.__stage_name = stage_task.name()
+        self.__metrics = MetricsLog(self.__config.state_directory, self.__options.cycle)
+        self.__run_state = RunState(
+            self.__config.state_directory,
+            self.__options.cycle,
+            stage_task.name(),
+            resume=self.__options.resume,
+        )
+        self.__fingerprints = FingerprintCache(self.__config.state_directory)
+
+        self.__trace = TraceRecorder(f"{stage_task.name()} {self.__options.cycle}")
+        if self.__config.scratch is not None and self._backend() == "local":
+            self.__scratch = ScratchArea(
+                self.__config.scratch, self.__options.cycle, stage_task.name()
+            )
+        try:
+            yield graph, estimates, makespan
+            scratch, self.__scratch = self.__scratch, None
+            if scratch is not None:
+                scratch.finish()
+        finally:
+            if self.__scratch is not None:
+                self.__scratch.close()
+                self.__scratch = None
+            self.__trace.write(self._trace_file())
+            self.__python.shutdown()
+
+    def _prepare_stage(self) -> None:
+        """
+        Run the per-stack tasks of the stage as the model writes each stack,
+        and wait for the model run to complete if the stage must not start before it has.
+        """
+        if self.__stack_tasks:
+            self.__run_stacks(self.__stack_tasks, self._run_and_record)
+        self._wait_for_completion(self.__stage_name)
+
+    def _run_and_record(self, task: StofsTask) -> None:
+        """
+        Run a task of the stage, unless it can be skipped, and record its
+        outcome in the run state, the performance history and the fingerprints.
+        A scratch task is recorded as complete once its outputs are published,
+        and any other task waits for the outputs of the tasks it depends on to
+        be published before it starts.
+
+        Args:
+            task (StofsTask): The task to run.
+        """
+        with self.__trace.span(task.name(), "task") as span_args:
+            in_scratch = self.__in_scratch(task)
+            if self.__scratch is not None and not in_scratch:
+                self.__scratch.wait_for_tasks(task.depends_on())
+            skip_reason = self._skip_reason(task)
+            if skip_reason is not None:
+                span_args["skipped"] = skip_reason
+                return
+
+            inputs = self._task_inputs(task)
+            self.__run_state.start_task(task.name())
+            start_time = time.monotonic()
+            try:
+                if in_scratch:
+                    self.__scratch.run(
+                        task.name(),
+                        task.inputs(),
+                        task.outputs(),
+                        lambda: self._run_task(task),
+                        on_published=lambda: self._record_outputs(task, inputs),
+                        on_failed=lambda _: self.__run_state.finish_task(
+                            task.name(), 1
+                        ),
+                    )
+                else:
+                    self._run_task(task)
+            except Exception as error:
+                exit_code = error.exit_code() if isinstance(error, ScriptError) else 1
+                span_args["failed"] = True
+                span_args["exit_code"] = exit_code
+                self.__run_state.finish_task(task.name(), exit_code)
+                self._record_task(
+                    task.name(), time.monotonic() - start_time, exit_code=exit_code
+                )
+                raise
+            self._record_task(task.name(), time.monotonic() - start_time)
+            if not in_scratch:
+                self._record_outputs(task, inputs)
+
+    def _record_outputs(self, task: StofsTask, inputs: list[str]) -> None:
+        """
+        Record a task as complete in the run state, along with the
+        fingerprints of its inputs and outputs.
+
+        Args:
+            task (StofsTask): The task.
+            inputs (list[str]): The files the task depends on.
+        """
+        self.__run_state.finish_task(task.name(), 0, task.outputs())
+        if task.outputs():
+            self.__fingerprints.record(task.name(), inputs, task.outputs())
+
+    def _record_task(
+        self,
+        task_name: str,
+        duration: float,
+        *,
+        exit_code: int = 0,
+        start_time: Optional[float] = None,
+    ) -> None:
+        """
+        Record the duration and exit code of a task of the current stage in
+        the performance history.
+
+        Args:
+            task_name (str): The name of the task.
+            duration (float): How long the task ran, in seconds.
+            exit_code (int, optional): The exit code of the task.
+            start_time (float, optional): When the task started.
+        """
+        self.__perf_database.record_task(
+            self.__config.model_name,
+            self.__options.cycle,
+            self.__stage_name,
+            task_name,
+            duration,
+            exit_code=exit_code,
+            start_time=start_time,
+        )
+
+    def _record_script(self, record: dict) -> None:
+        """
+        Record the outcome and resource usage of a script of the current
+        stage in the cycle's metrics file and the performance history.
+
+        Args:
+            record (dict): The task, script, exit code and resource usage of the run.
+        """
+        record = {"cycle": self.__options.cycle, "stage": self.__stage_name, **record}
+        if self.__metrics is not None:
+            self.__metrics.record(record)
+        if self.__perf_database is not None:
+            self.__perf_database.record_script(record)
+
+    def __in_scratch(self, task: StofsTask) -> bool:
+        """
+        Check whether a task runs in node-local scratch space.
+
+        Args:
+            task (StofsTask): The task.
+
+        Returns:
+            bool: True if scratch space is configured and the task is marked scratch.
+        """
+        return (
+            self.__scratch is not None
+            and task.mode() == ExecutionMode.LEGACY
+            and self._execution_attributes(task).scratch
+        )
+
+    def _work_directory(self, task_name: Optional[str]) -> Optional[str]:
+        """
+        Get the scratch directory a task is running in.
+
+        Args:
+            task_name (str, optional): The name of the task.
+
+        Returns:
+            Optional[str]: The scratch directory, or None if the task runs in
+                the current directory.
+        """
+        if self.__scratch is None:
+            return None
+        return self.__scratch.running_directory(task_name)
+
+    def _record_shared(self, task: StofsTask, source: str) -> None:
+        """
+        Record a task as completed because an identical task, which writes the
+        same outputs from the same inputs, has already been run for another
+        member of a batch.
+
+        Args:
+            task (StofsTask): The task.
+            source (str): The name of the task which was run in its place.
+        """
+        with self.__trace.span(task.name(), "task") as span_args:
+            span_args["shared_with"] = source
+            log.info(f"Task {task.name()} is shared with {source}")
+            self.__run_state.finish_task(task.name(), 0, task.outputs())
+            self.__fingerprints.record(
+                task.name(), self._task_inputs(task), task.outputs()
+            )
+
+    def _task_command(self, task: StofsTask) -> list[str]:
+        """
+        Get what a task runs, which identifies the work it does together with
+        its inputs and outputs.
+
+        Args:
+            task (StofsTask): The task.
+
+        Returns:
+            list[str]: The commands of a LEGACY task, or the entry point and
+                arguments of a PYTHON task.
+        """
+        if task.mode() == ExecutionMode.PYTHON:
+            return [
+                task.entry_point(),
+                repr(task.args()),
+                repr(sorted(task.kwargs().items())),
+                repr(task.argv()),
+            ]
+        if task.legacy_task_list() is None:
+            return [task.name()]
+        return [
+            shlex.join(self._script_command(task, script))
+            for script in task.legacy_task_list()
+        ]
+
+    def _share_resource_pool(self, resource_pool: ResourcePool) -> None:
+        """
+        Run the local tasks of this model, including its per-stack tasks, on a
+        pool of node resources shared with other models.
+
+        Args:
+            resource_pool (ResourcePool): The shared resource pool.
+        """
+        self.__resource_pool = resource_pool
+
+    def _share_python_pool(self, owner: "StofsModel") -> None:
+        """
+        Run the PYTHON tasks of this model on the worker pool of another model.
+
+        Args:
+            owner (StofsModel): The model whose worker pool is used.
+        """
+        self.__python.share_pool(owner.__python)
+
+    def _skip_reason(self, task: StofsTask) -> Optional[str]:
+        """
+        Check whether a task can be skipped, because it completed in the run
+        being resumed or because its outputs are up to date.
+
+        Args:
+            task (StofsTask): The task.
+
+        Returns:
+            Optional[str]: Why the task is skipped, or None if it must run.
+        """
+        if self.__run_state.is_task_complete(task.name()):
+            log.info(f"Skipping task {task.name()}, already completed")
+            return "already completed"
+
+        # An input still being published comes from a task which has just run
+        if (
+            not self.__options.force
+            and not self.__has_unpublished_inputs(task)
+            and self.__fingerprints.is_up_to_date(
+                task.name(), self._task_inputs(task), task.outputs()
+            )
+        ):
+            log.info(f"Skipping task {task.name()}, outputs are up to date")
+            self.__run_state.finish_task(task.name(), 0, task.outputs())
+            return "outputs up to date"
+        return None
+
+    def __has_unpublished_inputs(self, task: StofsTask) -> bool:
+        """
+        Check whether any declared input of a task is still being published.
+
+        Args:
+            task (StofsTask): The task.
+
+        Returns:
+            bool: True if an input is not yet in place on the shared file system.
+        """
+        return self.__scratch is not None and any(
+            self.__scratch.is_pending(path) for path in task.inputs()
+        )
+
+    def _backend(self) -> str:
+        """
+        Get the backend the tasks are run with.
+
+        Returns:
+            str: "local" to run tasks as local processes or "slurm" to submit them as SLURM jobs.
+        """
+        if self.__options.backend is not None:
+            return self.__options.backend
+        return self.__config.backend
+
+    def __execute_graph(
+        self,
+        graph: TaskGraph,
+        run_task: Callable[[StofsTask], None],
+        estimates: Optional[dict[str, float]] = None,
+    ) -> None:
+        """
+        Run the tasks of a graph with the configured backend.
+
+        Args:
+            graph (TaskGraph): The tasks to run.
+            run_task (Callable[[StofsTask], None]): Runs a single task locally.
+            estimates (dict[str, float], optional): The expected duration of each task.
+        """
+        if self._backend() == "slurm":
+            SlurmGraphRunner(self).run(graph)
+        else:
+            graph.execute(
+                run_task,
+                jobs=self.__options.jobs,
+                estimates=estimates,
+                resource_pool=self._resource_pool(),
+                resources=self._resource_request,
+            )
+
+    def _resource_pool(self) -> ResourcePool:
+        """
+        Get the pool of node resources shared by the tasks run locally.
+
+        Returns:
+            ResourcePool: The resource pool, created on first use.
+        """
+        if self.__resource_pool is None:
+            capacity = self.__config.node
+            log.info(
+                f"Packing tasks onto {capacity.cores} cores"
+                + (
+                    f" and {capacity.memory_mb / 1024:.1f} GB of memory"
+                    if capacity.memory_mb
+                    else ""
+                )
+            )
+            self.__resource_pool = ResourcePool(capacity)
+        return self.__resource_pool
+
+    def _resource_request(self, task: StofsTask) -> ResourceRequest:
+        """
+        Get the resources a task holds while it runs.
+
+        Args:
+            task (StofsTask): The task.
+
+        Returns:
+            ResourceRequest: The cores, memory and I/O class of the task.
+        """
+        execution_attributes = self._execution_attributes(task)
+        cores = execution_attributes.cores
+        if cores is None:
+            cores = execution_attributes.num_processes * self.__concurrency(
+                task, execution_attributes
+            )
+        return ResourceRequest(
+            cores=cores,
+            memory_mb=execution_attributes.memory_mb,
+            io_class=execution_attributes.io_class,
+        )
+
+    def _threads(self, task: StofsTask) -> Optional[int]:
+        """
+        Get the number of threads each process of a task may use, which is
+        its declared cores shared between the processes it runs at once.
+
+        Args:
+            task (StofsTask): The task.
+
+        Returns:
+            Optional[int]: The number of threads per process, or None if the
+                task does not declare its cores.
+        """
+        execution_attributes = self._execution_attributes(task)
+        if execution_attributes.cores is None:
+            return None
+        processes = execution_attributes.num_processes * self.__concurrency(
+            task, execution_attributes
+        )
+        return max(self._resource_request(task).cores // processes, 1)
+
+    @staticmethod
+    def __concurrency(
+        task: StofsTask, execution_attributes: ExecutionAttributes
+    ) -> int:
+        """
+        Get the number of scripts of a task which may run at once.
+
+        Args:
+            task (StofsTask): The task.
+            execution_attributes (ExecutionAttributes): The execution attributes for the task
+
+        Returns:
+            int: The number of scripts which may run at once.
+        """
+        if task.mode() != ExecutionMode.LEGACY:
+            return 1
+        scripts = len(task.legacy_task_list() or []) or 1
+        if execution_attributes.policy in (
+            ExecutionPolicy.PARALLEL,
+            ExecutionPolicy.MPMD,
+        ):
+            return min(execution_attributes.max_concurrent or scripts, scripts)
+        return 1
+
+    def __split_stack_tasks(
+        self, stage_name: str, tasks: list[StofsTask]
+    ) -> tuple[list[StofsTask], list[StofsTask]]:
+        """
+        Separate the per-stack tasks of a stage from the tasks which run once
+        every stack has been processed, and check that they can be run.
+
+        Args:
+            stage_name (str): The name of the stage.
+            tasks (list[StofsTask]): The tasks of the stage.
+
+        Returns:
+            tuple[list[StofsTask], list[StofsTask]]: The tasks run at the end of
+                the stage, without their dependencies on per-stack tasks, and the
+                per-stack tasks.
+        """
+        stack_tasks = [task for task in tasks if task.per_stack()]
+        if not stack_tasks:
+            return tasks, []
+
+        settings = self.__config.stacks
+        if settings is None or settings.stage != stage_name:
+            msg = f"Stage {stage_name} has per-stack tasks but no stacks are configured for it"
+            raise ValueError(msg)
+
+        # Per-stack tasks may only depend on each other, which the graph of a
+        # single stack checks
+        names = {task.name() for task in stack_tasks}
+        TaskGraph([task.for_stack(settings.first, names) for task in stack_tasks])
+
+        return [
+            task.without_dependencies(names) for task in tasks if not task.per_stack()
+        ], stack_tasks
+
+    def __run_stacks(
+        self, stack_tasks: list[StofsTask], run_task: Callable[[StofsTask], None]
+    ) -> None:
+        """
+        Run the per-stack tasks for each stack as the model completes it.
+
+        The tasks of up to the requested number of jobs stacks run at once.
+        The tasks of every stack are run even if those of an earlier stack fail.
+
+        Args:
+            stack_tasks (list[StofsTask]): The per-stack tasks of the stage.
+            run_task (Callable[[StofsTask], None]): Runs a single task.
+        """
+        names = {task.name() for task in stack_tasks}
+        monitor = StackMonitor(self.__config.stacks, self.__config.completion)
+        failures = []
+        with self.__trace.span("stacks", "stage") as span_args:
+            with ThreadPoolExecutor(max_workers=self.__options.jobs) as pool:
+                futures = {}
+                for stack in monitor.stacks():
+                    log.info(f"Stack {stack} is complete, starting its tasks")
+                    graph = TaskGraph(
+                        [task.for_stack(stack, names) for task in stack_tasks]
+                    )
+                    futures[stack] = pool.submit(self.__execute_graph, graph, run_task)
+                span_args["stacks"] = len(futures)
+
+            for stack, future in futures.items():
+                try:
+                    future.result()
+                except Exception as e:
+                    failures.append(f"stack {stack}: {e}")
+
+        if failures:
+            msg = "Per-stack tasks failed for " + "; ".join(failures)
+            raise RuntimeError(msg)
+
+    def __predict(self, stage_name: str, graph: TaskGraph) -> tuple[dict, float]:
+        """
+        Estimate the duration of each task of a stage from its history, and
+        log the predicted makespan and critical path of the stage.
+
+        Args:
+            stage_name (str): The name of the stage.
+            graph (TaskGraph): The task graph of the stage.
+
+        Returns:
+            tuple[dict, float]: The estimated duration of each task and the predicted makespan in seconds.
+        """
+        history = TaskHistory(
+            self.__perf_database, self.__config.model_name, stage_name
+        )
+        estimates = history.estimates([task.name() for task in graph.tasks()])
+        makespan = graph.predict_makespan(estimates, jobs=self.__options.jobs)
+        critical_path = graph.critical_path(estimates)
+        log.info(
+            f"Predicted makespan for stage {stage_name}: {makespan:.0f}s "
+            f"(critical path: {' -> '.join(critical_path)})"
+        )
+        return estimates, makespan
+
+    def _wait_for_completion(self, stage_name: str) -> None:
+        """
+        Wait for the model run to complete if the configuration says that the
+        stage must not start before it has.
+
+        Args:
+            stage_name (str): The name of the stage about to run.
+        """
+        criteria = self.__config.completion
+        if criteria is None or criteria.stage != stage_name:
+            return
+
+        log.info(f"Waiting for the model run to complete before stage {stage_name}")
+        start_time = time.monotonic()
+        with self.__trace.span("wait for completion", "stage"):
+            reason = CompletionWatcher(criteria).wait()
+        log.info(
+            f"Model run completed ({reason}) after waiting {time.monotonic() - start_time:.0f}s"
+        )
+
+    def _trace_file(self) -> str:
+        """
+        Get the path of the trace-event file for the current cycle.
+
+        Returns:
+            str: The path of the trace file, which can be loaded in chrome://tracing or Perfetto.
+        """
+        return os.path.join(
+            self.__config.state_directory, "traces", f"{self.__options.cycle}.json"
+        )
+
+    def _task_inputs(self, task: StofsTask) -> list[str]:
+        """
+        Get the files a task depends on, which are its declared inputs and,
+        for legacy tasks, the scripts themselves.
+
+        Args:
+            task (StofsTask): The task.
+
+        Returns:
+            list[str]: The paths of the files the task depends on.
+        """
+        inputs = list(task.inputs())
+        if task.mode() == ExecutionMode.LEGACY and task.legacy_task_list():
+            inputs.extend(
+                self._script_command(task, script)[0]
+                for script in task.legacy_task_list()
+            )
+        return inputs
+
+    def _run_task(self, task: StofsTask) -> None:
+        """
+        Run a single task using its execution mode.
+
+        Args:
+            task (StofsTask): The task to run.
+        """
+        if task.mode() == ExecutionMode.LEGACY:
+            self._run_legacy(task)
+        elif task.mode() == ExecutionMode.PYTHON:
+            self._run_python(task)
+        else:
+            msg = f"{task.name()} is not implemented for execution mode {task.mode()}"
+            raise NotImplementedError(msg)
+
+    def _execution_attributes(self, task: StofsTask) -> ExecutionAttributes:
+        """
+        Get the execution attributes for a task from the configuration.
+
+        Args:
+            task (StofsTask): The task to get the execution attributes for.
+
+        Returns:
+            ExecutionAttributes: The configured attributes, or the serial defaults
+        """
+        name = task.name()
+        if task.stack() is not None:
+            # Instances of per-stack tasks share the attributes of the task
+            name = name.removesuffix(f"_{task.stack()}")
+        return self.__config.execution_attributes.get(name, ExecutionAttributes())
+
     def _run_legacy(self, task: StofsTask) -> None:
         """
         Run a legacy scripted task
@@ -92,79 +758,400 @@ class StofsModel:
                 msg = f"No legacy tasks exist for {self.type()}:{task.name()}"
                 raise ValueError(msg)
             else:
-                for script in task.legacy_task_list():
-                    self._run_script(
-                        script, ExecutionAttributes(policy=ExecutionPolicy.SERIAL)
+                execution_attributes = self._execution_attributes(task)
+                if execution_attributes.policy == ExecutionPolicy.PARALLEL:
+                    self.__run_scripts_concurrent(task, execution_attributes)
+                elif execution_attributes.policy == ExecutionPolicy.MPMD:
+                    run_mpmd(
+                        self,
+                        task,
+                        execution_attributes,
+                        lambda attributes: self.__run_scripts_concurrent(
+                            task, attributes
+                        ),
                     )
+                elif execution_attributes.policy == ExecutionPolicy.SERIAL:
+                    for index, script in enumerate(task.legacy_task_list()):
+                        self.__run_task_script(
+                            task, index, script, execution_attributes
+                        )
+                else:
+                    msg = f"Unknown execution policy {execution_attributes.policy} for task {task.name()}"
+                    raise ValueError(msg)
         else:
             msg = f"Task {task.name()} is not in LEGACY mode"
             raise ValueError(msg)
 
-    def _run_script(
+    def __run_scripts_concurrent(
+        self, task: StofsTask, execution_attributes: ExecutionAttributes
+    ) -> None:
+        """
+        Run the scripts of a task concurrently, with at most max_concurrent
+        scripts (all of them unless max_concurrent is set) running at once.
+        All scripts are run to completion before any failures are reported,
+        whatever the error which stopped a script.
+
+        Args:
+            task (StofsTask): The task whose scripts are run.
+            execution_attributes (ExecutionAttributes): The execution attributes for the scripts
+        """
+        scripts = task.legacy_task_list()
+        max_workers = self.__concurrency(task, execution_attributes)
+        log.info(
+            f"Running {len(scripts)} scripts with up to {max_workers} concurrently."
+        )
+
+        failures = []
+        exit_code = None
+        with ThreadPoolExecutor(max_workers=max(max_workers, 1)) as pool:
+            futures = {
+                script: pool.submit(
+                    self.__run_task_script, task, index, script, execution_attributes
+                )
+                for index, script in enumerate(scripts)
+            }
+            for script, future in futures.items():
+                try:
+                    future.result()
+                except Exception as e:
+                    log.error(f"Script {script} failed: {e}")
+                    failures.append(str(e))
+                    if exit_code is None and isinstance(e, ScriptError):
+                        exit_code = e.exit_code()
+
+        if failures:
+            msg = f"{len(failures)} of {len(scripts)} scripts failed: " + "; ".join(
+                failures
+            )
+            # The task fails with the exit code of its first failed script
+            raise ScriptError(msg, exit_code if exit_code is not None else 1)
+
+    def __run_task_script(
         self,
+        task: StofsTask,
+        index: int,
         script: str,
-        execution_attributes: ExecutionAttributes = ExecutionAttributes,
+        execution_attributes: ExecutionAttributes,
     ) -> None:
         """
-        Run a script with the specified execution policy.
+        Run one script of a task and record its exit code in the run state.
+        Scripts which already completed in the run being resumed are skipped,
+        and failed scripts are retried as set in the execution attributes.
 
         Args:
+            task (StofsTask): The task the script belongs to.
+            index (int): The position of the script in the task's script list.
             script (str): The script to run.
             execution_attributes (ExecutionAttributes): The execution attributes for the script
         """
-        import os
+        run_state = self.__run_state
+        if run_state is not None and run_state.is_script_complete(
+            task.name(), index, script
+        ):
+            log.info(f"Skipping script {script}, already completed")
+            return
 
-        script_path = os.path.join(self.__config.script_directory, script)
-        StofsModel.__run_script_serial(script_path, execution_attributes)
+        script_name, arguments = self.__split_script(task, script)
+        self.__run_with_retries(
+            task,
+            index,
+            script,
+            execution_attributes,
+            lambda: self._run_script(
+                script_name,
+                execution_attributes,
+                log_file=self._log_file(
+                    f"{task.name()}.{index}.{os.path.basename(script_name)}"
+                ),
+                task_name=task.name(),
+                arguments=arguments,
+                threads=self._threads(task),
+            ),
+        )
 
-    @staticmethod
-    def __run_script_serial(
-        script_path: str, execution_attributes: ExecutionAttributes
+    def __split_script(self, task: StofsTask, script: str) -> tuple[str, list[str]]:
+        """
+        Split an entry of a task's script list into the script and its
+        arguments. Each entry of an MPMD task is a command line, i.e.
+        "stofs_3d_atl_add_attr_2d_3d_nc.sh 2", and the stack number is passed
+        as the last argument to the scripts of a per-stack task.
+
+        Args:
+            task (StofsTask): The task the script belongs to.
+            script (str): The entry of the task's script list.
+
+        Returns:
+            tuple[str, list[str]]: The script and its arguments.
+        """
+        if self._execution_attributes(task).policy == ExecutionPolicy.MPMD:
+            words = shlex.split(script)
+            if not words:
+                msg = f"Task {task.name()} has an empty command line"
+                raise ValueError(msg)
+        else:
+            words = [script]
+        if task.stack() is not None:
+            words.append(str(task.stack()))
+        return words[0], words[1:]
+
+    def _script_command(self, task: StofsTask, script: str) -> list[str]:
+        """
+        Get the command which runs an entry of a task's script list directly.
+
+        Args:
+            task (StofsTask): The task the script belongs to.
+            script (str): The entry of the task's script list.
+
+        Returns:
+            list[str]: The path of the script followed by its arguments.
+        """
+        script_name, arguments = self.__split_script(task, script)
+        return [os.path.join(self.__config.script_directory, script_name), *arguments]
+
+    def __run_with_retries(
+        self,
+        task: StofsTask,
+        index: int,
+        step: str,
+        execution_attributes: ExecutionAttributes,
+        run_once: Callable[[], int],
     ) -> None:
         """
-        Run a script in serial.
+        Run one step of a task, retrying it as set in the execution attributes,
+        and record its exit code in the run state.
 
         Args:
-            script_path (str): The path to the script to run.
-            execution_attributes (ExecutionAttributes): The execution attributes for serial
+            task (StofsTask): The task the step belongs to.
+            index (int): The position of the step in the task.
+            step (str): The script or entry point run by the step.
+            execution_attributes (ExecutionAttributes): The execution attributes for the step
+            run_once (Callable[[], int]): Runs the step once and returns its exit code.
+        """
+        run_state = self.__run_state
+        for attempt in range(execution_attributes.retries + 1):
+            if attempt > 0:
+                delay = execution_attributes.retry_backoff * 2 ** (attempt - 1)
+                log.warning(
+                    f"Retrying {step} in {delay:g}s "
+                    f"(attempt {attempt + 1} of {execution_attributes.retries + 1})"
+                )
+                time.sleep(delay)
+
+            exit_code = run_once()
+            if run_state is not None:
+                run_state.finish_script(task.name(), index, step, exit_code)
+            if exit_code == 0:
+                return
+
+        msg = f"{step} failed with return code {exit_code}"
+        raise ScriptError(msg, exit_code)
+
+    def _run_python(self, task: StofsTask) -> None:
         """
+        Run a Python task by calling its entry point on the warm worker pool.
+
+        Args:
+            task (StofsTask): The task to run.
+        """
+        if task.mode() != ExecutionMode.PYTHON:
+            msg = f"Task {task.name()} is not in PYTHON mode"
+            raise ValueError(msg)
+        if task.entry_point() is None:
+            msg = f"No entry point exists for {self.type()}:{task.name()}"
+            raise ValueError(msg)
+
+        run_state = self.__run_state
+        if run_state is not None and run_state.is_script_complete(
+            task.name(), 0, task.entry_point()
+        ):
+            log.info(f"Skipping entry point {task.entry_point()}, already completed")
+            return
+
+        execution_attributes = self._execution_attributes(task)
+        self.__run_with_retries(
+            task,
+            0,
+            task.entry_point(),
+            execution_attributes,
+            lambda: self.__python.run(task, execution_attributes),
+        )
+
+    def _run_state(self) -> Optional[RunState]:
+        """
+        Get the run state of the current stage.
+
+        Returns:
+            Optional[RunState]: The run state, or None outside of a stage.
+        """
+        return self.__run_state
+
+    def _stage_name(self) -> Optional[str]:
+        """
+        Get the name of the current stage.
+
+        Returns:
+            Optional[str]: The name of the stage, or None outside of a stage.
+        """
+        return self.__stage_name
+
+    def _trace(self) -> TraceRecorder:
+        """
+        Get the trace recorder of the current stage.
+
+        Returns:
+            TraceRecorder: The trace the spans of tasks and scripts are added to.
+        """
+        return self.__trace
+
+    def _log_file(self, name: str) -> str:
+        """
+        Get the path of the log file used for a script's output.
+
+        Args:
+            name (str): The name identifying the script run.
+
+        Returns:
+            str: The path of the log file for the current cycle.
+        """
+        return os.path.join(
+            self.__config.state_directory, "logs", self.__options.cycle, f"{name}.log"
+        )
+
+    def _run_script(
+        self,
+        script: str,
+        execution_attributes: Optional[ExecutionAttributes] = None,
+        log_file: Optional[str] = None,
+        task_name: Optional[str] = None,
+        arguments: Optional[list[str]] = None,
+        *,
+        threads: Optional[int] = None,
+    ) -> int:
+        """
+        Run a script with the specified execution policy.
+
+        Scripts are launched through MPI when more than one process is
+        requested, otherwise they are run directly. The output of the script
+        is written to its own log file, and the last lines are logged if the
+        script fails. When run as part of a stage, the resources used by the
+        script are appended to the cycle's metrics file.
+
+        Args:
+            script (str): The script to run.
+            execution_attributes (ExecutionAttributes): The execution attributes for the script
+            log_file (str, optional): The file the script's output is written to.
+            task_name (str, optional): The name of the task the script belongs to.
+            arguments (list[str], optional): Arguments passed to the script, i.e. the stack number.
+            threads (int, optional): The number of threads OpenMP and the BLAS libraries may use.
+
+        Returns:
+            int: The exit code of the script.
+        """
+        if execution_attributes is None:
+            execution_attributes = ExecutionAttributes()
+
+        script_path = os.path.join(self.__config.script_directory, script)
         if not os.path.exists(script_path):
             msg = f"Script {script_path} does not exist."
             raise FileNotFoundError(msg)
 
-        log.debug(f"Running script {script_path} in serial mode.")
+        if execution_attributes.num_processes > 1:
+            log.info(f"Running script {script_path} in parallel mode.")
+            command = StofsModel.__parallel_command(script_path, execution_attributes)
+        else:
+            log.debug(f"Running script {script_path} in serial mode.")
+            command = [script_path]
+        if arguments:
+            command.extend(arguments)
+
+        if log_file is None:
+            log_file = self._log_file(os.path.basename(script))
 
-        log.info("----BEGIN SCRIPT OUTPUT----")
-        return_data = subprocess.run(
-            script_path, shell=False, capture_output=False, check=False
+        log.info(f"Running script {script}, output in {log_file}")
+        supervisor = ProcessSupervisor(
+            command,
+            log_file,
+            timeout=execution_attributes.timeout,
+            sample_interval=execution_attributes.sample_interval,
+            environment=self._environment(task_name, threads),
+            cwd=self._work_directory(task_name),
         )
-        log.info("----END SCRIPT OUTPUT----")
+        start_time = time.time()
+        with self.__trace.span(script, "script", {"task": task_name}) as span_args:
+            exit_code = supervisor.run()
+            span_args["exit_code"] = exit_code
 
-        if return_data.returncode != 0:
-            msg = (
-                f"Script {script_path} failed with return code {return_data.returncode}"
+        usage = supervisor.resource_usage()
+        log.info(
+            f"Script {script} finished in {usage.wall_time:.1f}s "
+            f"(user {usage.user_time:.1f}s, sys {usage.system_time:.1f}s, "
+            f"max rss {usage.max_rss_kb / 1024:.0f} MB, "
+            f"read {usage.read_bytes / 2**20:.0f} MB, write {usage.write_bytes / 2**20:.0f} MB)"
+        )
+        record = {
+            "task": task_name,
+            "script": script,
+            "exit_code": exit_code,
+            "timed_out": supervisor.timed_out(),
+            "start_time": start_time,
+            **usage.to_dict(),
+        }
+        if supervisor.process_profile():
+            record["processes"] = supervisor.process_profile()
+            log.info(
+                f"Script {script} CPU time by executable: "
+                + ", ".join(
+                    f"{name} {profile['cpu_seconds']:.1f}s"
+                    for name, profile in list(supervisor.process_profile().items())[:5]
+                )
             )
-            raise RuntimeError(msg)
+        self._record_script(record)
+
+        if exit_code != 0:
+            log.error(
+                f"Script {script} failed with return code {exit_code}, last lines of {log_file}:\n"
+                + "\n".join(supervisor.tail())
+            )
+
+        return exit_code
+
+    def _environment(
+        self, task_name: Optional[str], threads: Optional[int]
+    ) -> dict[str, str]:
+        """
+        Get the environment of a script, with the configuration file named,
+        the thread pools limited and, for a scratch task, the scratch
+        directory set.
+
+        Args:
+            task_name (str, optional): The name of the task the script belongs to.
+            threads (int, optional): The number of threads OpenMP and the BLAS libraries may use.
+
+        Returns:
+            dict[str, str]: The environment.
+        """
+        environment = (
+            thread_environment(threads) if threads is not None else dict(os.environ)
+        )
+        if self.__config.config_file is not None:
+            environment[CONFIG_VARIABLE] = os.path.abspath(self.__config.config_file)
+        work_directory = self._work_directory(task_name)
+        if work_directory is not None:
+            environment[SCRATCH_VARIABLE] = work_directory
+        return environment
 
     @staticmethod
-    def __run_script_parallel(
+    def __parallel_command(
         script_path: str, execution_attributes: ExecutionAttributes
-    ) -> None:
+    ) -> list[str]:
         """
-        Run a script in parallel.
+        Get the command used to run a script in parallel.
 
         Args:
             script_path (str): The path to the script to run.
             execution_attributes (ExecutionAttributes): The execution attributes for parallel
-        """
-        log.info(f"Running script {script_path} in parallel mode.")
-        command = ["mpirun", "-n", str(execution_attributes.num_processes), script_path]
-        return_data = subprocess.run(
-            command, shell=False, capture_output=False, check=False
-        )
 
-        if return_data.returncode != 0:
-            msg = (
-                f"Script {script_path} failed with return code {return_data.returncode}"
-            )
-            raise RuntimeError(msg)
+        Returns:
+            list[str]: The MPI launch command for the script.
+        """
+        return ["mpirun", "-n", str(execution_attributes.num_processes), script_path]
@@ -0,0 +1,34 @@
+import os
+from dataclasses import dataclass, field
+from typing import Optional
+
+
+def default_cycle() -> str:
+    """
+    Get the cycle from the NCO environment (PDY and cyc), if it is set.
+
+    Returns:
+        str: The cycle as YYYYMMDDHH, or "default" when the environment is not set.
+    """
+    pdy = os.environ.get("PDY")
+    cyc = os.environ.get("cyc")  # noqa: SIM112
+    if pdy and cyc:
+        return f"{pdy}{cyc}"
+    return "default"
+
+
+@dataclass(frozen=True)
+class StofsRunOptions:
+    """
+    Class representing the run-time options for a STOFS workflow stage.
+
+    These are the options given on the command line which control how
+    a stage is executed, as opposed to what is executed (see StofsConfig).
+    When backend is None, the backend set in the configuration is used.
+    """
+
+    jobs: int = field(default=1)
+    cycle: str = field(default_factory=default_cycle)
+    resume: bool = field(default=False)
+    force: bool = field(default=False)
+    backend: Optional[str] = field(default=None)
@@ -1,4 +1,143 @@
-from schema import And, Schema, Use
+import re
+
+from schema import And, Optional, Or, Regex, Schema, Use
+
+STAGE_NAMES = ["prep_nowcast", "nowcast", "prep_forecast", "forecast", "post"]
+
+# A memory size such as 512M or 16G
+MEMORY_SIZE = Regex(r"^\d+(\.\d+)?[KMGT]B?$", flags=re.IGNORECASE)
+
+TASK_SCHEMA = Schema(
+    {
+        Optional("stage"): And(str, lambda s: s in STAGE_NAMES),
+        Optional("scripts"): [str],
+        Optional("entry_point"): And(str, lambda s: ":" in s),
+        Optional("args"): list,
+        Optional("kwargs"): {str: object},
+        Optional("argv"): [Use(str)],
+        Optional("pass_results"): bool,
+        Optional("per_stack"): bool,
+        Optional("depends_on"): [str],
+        Optional("inputs"): [str],
+        Optional("outputs"): [str],
+        Optional("policy"): And(
+            str, lambda s: s.upper() in ["SERIAL", "PARALLEL", "MPMD"]
+        ),
+        Optional("num_processes"): And(int, lambda n: n > 0),
+        Optional("max_concurrent"): And(int, lambda n: n > 0),
+        Optional("timeout"): And(Use(float), lambda t: t > 0),
+        Optional("retries"): And(int, lambda n: n >= 0),
+        Optional("retry_backoff"): And(Use(float), lambda t: t >= 0),
+        Optional("sample_interval"): And(Use(float), lambda t: t > 0),
+        Optional("cores"): And(int, lambda n: n > 0),
+        Optional("memory"): Or(And(Use(float), lambda m: m >= 0), MEMORY_SIZE),
+        Optional("io_class"): And(str, len),
+        Optional("scratch"): bool,
+    }
+)
+
+PYTHON_SCHEMA = Schema(
+    {
+        Optional("workers"): And(int, lambda n: n > 0),
+        Optional("preload"): [str],
+        Optional("paths"): [str],
+        Optional("loaders"): {str: And(str, lambda s: ":" in s)},
+        Optional("socket"): Use(str),
+        Optional("threads"): And(int, lambda n: n > 0),
+    }
+)
+
+COMPLETION_SCHEMA = Schema(
+    {
+        Optional("marker_file"): Use(str),
+        Optional("marker_text"): And(str, len),
+        Optional("final_file"): Use(str),
+        Optional("stage"): And(str, lambda s: s in STAGE_NAMES),
+        Optional("timeout"): And(Use(float), lambda t: t > 0),
+        Optional("poll_interval"): And(Use(float), lambda t: t > 0),
+        Optional("settle_time"): And(Use(float), lambda t: t >= 0),
+    }
+)
+
+STACKS_SCHEMA = Schema(
+    {
+        "directory": Use(str),
+        "files": And([str], len),
+        Optional("first"): int,
+        Optional("count"): And(int, lambda n: n > 0),
+        Optional("stage"): And(str, lambda s: s in STAGE_NAMES),
+        Optional("settle_time"): And(Use(float), lambda t: t >= 0),
+        Optional("poll_interval"): And(Use(float), lambda t: t > 0),
+        Optional("timeout"): And(Use(float), lambda t: t > 0),
+    }
+)
+
+SLURM_SCHEMA = Schema(
+    {
+        Optional("sbatch"): Use(str),
+        Optional("squeue"): Use(str),
+        Optional("sacct"): Use(str),
+        Optional("scancel"): Use(str),
+        Optional("srun"): Use(str),
+        Optional("partition"): Use(str),
+        Optional("account"): Use(str),
+        Optional("qos"): Use(str),
+        Optional("extra_args"): [Use(str)],
+        Optional("poll_interval"): And(Use(float), lambda t: t > 0),
+    }
+)
+
+NODE_SCHEMA = Schema(
+    {
+        Optional("cores"): And(int, lambda n: n > 0),
+        Optional("memory"): Or(And(Use(float), lambda m: m > 0), MEMORY_SIZE),
+        Optional("io_slots"): {str: And(int, lambda n: n > 0)},
+    }
+)
+
+SCRATCH_SCHEMA = Schema(
+    {
+        "directory": Use(str),
+        Optional("publish_workers"): And(int, lambda n: n > 0),
+        Optional("keep"): bool,
+    }
+)
+
+UPSTREAM_SCHEMA = Schema(
+    {
+        "primary": Use(str),
+        Optional("backup"): Use(str),
+        Optional("backup_cycles"): [int],
+        Optional("hours"): {
+            "first": And(int, lambda n: n >= 0),
+            "last": And(int, lambda n: n >= 0),
+            Optional("step"): And(int, lambda n: n > 0),
+        },
+        Optional("windows"): [
+            {
+                Optional("cycle"): int,
+                "first": And(int, lambda n: n >= 0),
+                "last": And(int, lambda n: n >= 0),
+                Optional("step"): And(int, lambda n: n > 0),
+            }
+        ],
+        Optional("min_size"): Or(And(Use(float), lambda m: m >= 0), MEMORY_SIZE),
+        Optional("settle_time"): And(Use(float), lambda t: t >= 0),
+        Optional("deadline"): And(Use(float), lambda t: t >= 0),
+        Optional("poll_interval"): And(Use(float), lambda t: t > 0),
+        Optional("list_file"): Use(str),
+        Optional("allow_missing"): And(int, lambda n: n >= 0),
+    }
+)
+
+CACHE_SCHEMA = Schema(
+    {
+        Optional("directory"): Use(str),
+        Optional("max_age_days"): And(Use(float), lambda t: t > 0),
+    }
+)
+
+BACKENDS = ["local", "slurm"]
 
 STOFS_SCHEMA = Schema(
     {
@@ -6,5 +145,38 @@ STOFS_SCHEMA = Schema(
         "name": Use(str),
         "version": Use(str),
         "script_directory": Use(str),
+        Optional("state_directory"): Use(str),
+        Optional("python"): PYTHON_SCHEMA,
+        Optional("completion"): COMPLETION_SCHEMA,
+        Optional("stacks"): STACKS_SCHEMA,
+        Optional("backend"): And(str, lambda s: s.lower() in BACKENDS),
+        Optional("slurm"): SLURM_SCHEMA,
+        Optional("node"): NODE_SCHEMA,
+        Optional("scratch"): SCRATCH_SCHEMA,
+        Optional("upstream"): {str: UPSTREAM_SCHEMA},
+        Optional("cache"): CACHE_SCHEMA,
+        Optional("tasks"): {str: TASK_SCHEMA},
+    }
+)
+
+PRODUCT_SCHEMA = Schema(
+    {
+        "source": Use(str),
+        Optional("directory"): Use(str),
+        Optional("name"): Use(str),
+        Optional("min_size"): And(int, lambda n: n >= 0),
+        Optional("validate"): And(str, lambda s: s in ["auto", "netcdf", "none"]),
+        Optional("alert"): Use(str),
+        Optional("required"): bool,
+    }
+)
+
+MANIFEST_SCHEMA = Schema(
+    {
+        "products": [PRODUCT_SCHEMA],
+        Optional("directory"): Use(str),
+        Optional("workers"): And(int, lambda n: n > 0),
+        Optional("method"): And(str, lambda s: s in ["auto", "copy", "link"]),
+        Optional("alert_command"): Use(str),
     }
 )
@@ -0,0 +1,350 @@
+import asyncio
+import json
+import os
+import signal
+import socket
+import time
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Optional
+
+from .execution_policy import ExecutionAttributes, ExecutionMode
+from .perf_database import PerfDatabase
+from .python_worker import PythonWorkerPool
+from .stofs_config import StofsConfig
+from .stofs_logger import get_stofs_logger
+from .task_metrics import MetricsLog
+
+log = get_stofs_logger()
+
+# Keys of the entry point outcome which are returned to the client
+RESPONSE_KEYS = [
+    "exit_code",
+    "timed_out",
+    "wall_time",
+    "user_time",
+    "system_time",
+    "max_rss_kb",
+    "worker_max_rss_kb",
+]
+
+# Number of cycles whose entry point results are kept by the server
+RESULT_CYCLES = 2
+
+
+def submit_request(
+    socket_path: str, request: dict, timeout: Optional[float] = None
+) -> dict:
+    """
+    Send a request to a running server and wait for its response.
+
+    Args:
+        socket_path (str): The path of the server's Unix domain socket.
+        request (dict): The request, i.e. {"task": "slab_fcst"} or {"command": "ping"}.
+        timeout (float, optional): The time in seconds to wait for the response.
+
+    Returns:
+        dict: The server's response.
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.settimeout(timeout)
+        client.connect(socket_path)
+        client.sendall(json.dumps(request).encode() + b"\n")
+        response = b""
+        while not response.endswith(b"\n"):
+            chunk = client.recv(65536)
+            if not chunk:
+                break
+            response += chunk
+    if not response:
+        msg = f"No response from the server on {socket_path}"
+        raise ConnectionError(msg)
+    return json.loads(response)
+
+
+def server_available(socket_path: str) -> bool:
+    """
+    Check whether a server is listening on a socket.
+
+    Args:
+        socket_path (str): The path of the server's Unix domain socket.
+
+    Returns:
+        bool: True if the server answered a ping.
+    """
+    if not os.path.exists(socket_path):
+        return False
+    try:
+        return (
+            submit_request(socket_path, {"command": "ping"}, timeout=5).get("status")
+            == "ok"
+        )
+    except (OSError, ValueError):
+        return False
+
+
+class StofsServer:
+    """
+    Class representing a long-lived server which runs Python entry points on a
+    pool of warm workers.
+
+    The workers import the configured modules and run the configured loaders
+    (i.e. reading hgrid.gr3 and building its KD-tree) once, and then serve
+    every task of the cycle. Requests are JSON objects sent one per line over
+    a Unix domain socket, so they can come from the workflow itself, from the
+    `stofs submit` command or from a legacy bash script. Each response holds
+    the exit code and resource usage of the entry point. The values returned
+    by entry points stay in the server, so tasks which set pass_results receive
+    the results of their upstream tasks without them being written to disk.
+    Only the results of the latest RESULT_CYCLES cycles are kept.
+    """
+
+    def __init__(
+        self,
+        config: StofsConfig,
+        cycle: str,
+        socket_path: Optional[str] = None,
+        workers: Optional[int] = None,
+    ) -> None:
+        """
+        Initialize the StofsServer.
+
+        Args:
+            config (StofsConfig): The workflow configuration.
+            cycle (str): The cycle served when a request does not name one.
+            socket_path (str, optional): The socket to listen on, defaults to the configured socket.
+            workers (int, optional): The number of workers, defaults to the configured number or 1.
+        """
+        self.__config = config
+        self.__cycle = cycle
+        self.__socket_path = (
+            socket_path if socket_path is not None else config.python_socket
+        )
+        self.__workers = workers or config.python_workers or 1
+        self.__tasks = {
+            task.name(): task for tasks in config.stage_tasks.values() for task in tasks
+        }
+        self.__stages = {
+            task.name(): stage
+            for stage, tasks in config.stage_tasks.items()
+            for task in tasks
+        }
+        self.__results: dict[tuple[str, str], Any] = {}
+        self.__pool = None
+        self.__stop = None
+
+    def socket_path(self) -> str:
+        """
+        Get the path of the socket the server listens on.
+
+        Returns:
+            str: The path of the Unix domain socket.
+        """
+        return self.__socket_path
+
+    def serve(self) -> None:
+        """
+        Run the server until it is asked to shut down or receives SIGTERM or SIGINT.
+        """
+        if server_available(self.__socket_path):
+            msg = f"A server is already listening on {self.__socket_path}"
+            raise RuntimeError(msg)
+        if os.path.exists(self.__socket_path):
+            os.unlink(self.__socket_path)
+        os.makedirs(os.path.dirname(self.__socket_path), exist_ok=True)
+
+        log.info(f"Starting {self.__workers} Python workers")
+        self.__pool = PythonWorkerPool(
+            self.__workers,
+            self.__config.python_preload,
+            self.__config.python_paths,
+            self.__config.python_loaders,
+            self.__config.python_threads,
+        )
+        try:
+            self.__pool.warm()
+            asyncio.run(self.__serve())
+        finally:
+            self.__pool.shutdown()
+            if os.path.exists(self.__socket_path):
+                os.unlink(self.__socket_path)
+
+    async def __serve(self) -> None:
+        """
+        Accept connections until the server is stopped.
+        """
+        loop = asyncio.get_running_loop()
+        self.__stop = asyncio.Event()
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(signum, self.__stop.set)
+
+        server = await asyncio.start_unix_server(
+            self.__handle, path=self.__socket_path, limit=2**24
+        )
+        log.info(f"Listening on {self.__socket_path} for cycle {self.__cycle}")
+        async with server:
+            await self.__stop.wait()
+        log.info("Server stopped")
+
+    async def __handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """
+        Answer the requests sent on one connection.
+
+        Args:
+            reader (asyncio.StreamReader): The stream the requests are read from.
+            writer (asyncio.StreamWriter): The stream the responses are written to.
+        """
+        try:
+            while line := await reader.readline():
+                try:
+                    response = await self.__dispatch(json.loads(line))
+                except Exception as e:
+                    response = {"exit_code": 1, "error": str(e)}
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def __dispatch(self, request: dict) -> dict:
+        """
+        Answer one request.
+
+        Args:
+            request (dict): The request.
+
+        Returns:
+            dict: The response.
+        """
+        command = request.get("command", "run")
+        if command == "ping":
+            return {
+                "status": "ok",
+                "pid": os.getpid(),
+                "cycle": self.__cycle,
+                "workers": self.__workers,
+            }
+        if command == "shutdown":
+            self.__stop.set()
+            return {"status": "stopping"}
+        if command == "run":
+            return await self.__run(request)
+        msg = f"Unknown command {command}"
+        raise ValueError(msg)
+
+    async def __run(self, request: dict) -> dict:
+        """
+        Run an entry point on the worker pool.
+
+        The entry point is taken from the configured task named in the request,
+        and any of its settings can be overridden by the request itself.
+
+        Args:
+            request (dict): The request, with any of task, entry_point, args,
+                kwargs, argv, timeout, upstream, stage, cycle and log_file.
+
+        Returns:
+            dict: The exit code, log file and resource usage of the entry point.
+        """
+        task_name = request.get("task")
+        task = self.__tasks.get(task_name)
+        if task is not None and task.mode() != ExecutionMode.PYTHON:
+            task = None
+        if task_name is not None and task is None and "entry_point" not in request:
+            msg = f"Task {task_name} is not a configured Python task"
+            raise ValueError(msg)
+
+        entry_point = request.get("entry_point", task.entry_point() if task else None)
+        if entry_point is None:
+            msg = "The request names neither a Python task nor an entry point"
+            raise ValueError(msg)
+        if task_name is None:
+            task_name = entry_point
+        cycle = request.get("cycle", self.__cycle)
+        stage = request.get("stage", self.__stages.get(task_name))
+
+        kwargs = dict(request.get("kwargs", task.kwargs() if task else {}))
+        upstream = request.get(
+            "upstream", task.depends_on() if task and task.pass_results() else None
+        )
+        if upstream is not None:
+            kwargs["upstream"] = {
+                name: self.__results[(cycle, name)]
+                for name in upstream
+                if (cycle, name) in self.__results
+            }
+
+        log_file = request.get(
+            "log_file",
+            os.path.join(
+                self.__config.state_directory,
+                "logs",
+                cycle,
+                f"{task_name}.{entry_point.replace(':', '.')}.log",
+            ),
+        )
+        log.info(f"Running entry point {entry_point} for task {task_name}")
+        start_time = time.time()
+        try:
+            outcome = await asyncio.wrap_future(
+                self.__pool.submit(
+                    entry_point,
+                    log_file,
+                    args=request.get("args", task.args() if task else []),
+                    kwargs=kwargs,
+                    argv=request.get("argv", task.argv() if task else None),
+                    timeout=request.get(
+                        "timeout",
+                        self.__config.execution_attributes.get(
+                            task_name, ExecutionAttributes()
+                        ).timeout,
+                    ),
+                )
+            )
+        except BrokenProcessPool:
+            # The pool restarts itself, the next requests run on new workers
+            log.exception(f"The worker running {entry_point} died")
+            return {
+                "exit_code": 1,
+                "error": f"The worker running {entry_point} died",
+                "log_file": log_file,
+            }
+        if outcome["exit_code"] == 0 and outcome["result"] is not None:
+            self.__store_result(cycle, task_name, outcome["result"])
+
+        response = {key: outcome[key] for key in RESPONSE_KEYS if key in outcome}
+        response["log_file"] = log_file
+        record = {
+            "cycle": cycle,
+            "stage": stage,
+            "task": task_name,
+            "script": entry_point,
+            "start_time": start_time,
+            **response,
+        }
+        MetricsLog(self.__config.state_directory, cycle).record(record)
+        PerfDatabase(self.__config.state_directory).record_script(record)
+        log.info(
+            f"Entry point {entry_point} finished with exit code {outcome['exit_code']} "
+            f"in {outcome['wall_time']:.1f}s"
+        )
+        return response
+
+    def __store_result(self, cycle: str, task_name: str, result: object) -> None:
+        """
+        Keep the value returned by an entry point for the downstream tasks, and
+        forget the results of all but the latest RESULT_CYCLES cycles.
+
+        Args:
+            cycle (str): The cycle the entry point ran for.
+            task_name (str): The name of the task.
+            result (object): The value returned by the entry point.
+        """
+        self.__results[(cycle, task_name)] = result
+        cycles = sorted({key[0] for key in self.__results})
+        for old_cycle in cycles[:-RESULT_CYCLES]:
+            log.info(f"Releasing the results of cycle {old_cycle}")
+            for key in [key for key in self.__results if key[0] == old_cycle]:
+                del self.__results[key]
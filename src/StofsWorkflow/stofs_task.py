@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import Any, Optional
 
 from .execution_policy import ExecutionMode
 
@@ -13,6 +13,17 @@ class StofsTask:
         task_name: str,
         task_mode: ExecutionMode,
         legacy_task_list: Optional[list[str]] = None,
+        *,
+        depends_on: Optional[list[str]] = None,
+        inputs: Optional[list[str]] = None,
+        outputs: Optional[list[str]] = None,
+        entry_point: Optional[str] = None,
+        args: Optional[list[Any]] = None,
+        kwargs: Optional[dict[str, Any]] = None,
+        argv: Optional[list[str]] = None,
+        pass_results: bool = False,
+        per_stack: bool = False,
+        stack: Optional[int] = None,
     ) -> None:
         """
         Initialize the StofsTask with the specified task mode and legacy task list.
@@ -21,10 +32,37 @@ class StofsTask:
             task_name (str): The name of the task.
             task_mode (ExecutionMode): The execution mode for the task.
             legacy_task_list (list[str], optional): A list of legacy tasks. Defaults to None.
+            depends_on (list[str], optional): Names of the tasks which must complete before this task. Defaults to None.
+            inputs (list[str], optional): Files read by the task. Defaults to None.
+            outputs (list[str], optional): Files written by the task. Defaults to None.
+            entry_point (str, optional): The "module:function" run by a PYTHON task. Defaults to None.
+            args (list, optional): Positional arguments passed to the entry point. Defaults to None.
+            kwargs (dict, optional): Keyword arguments passed to the entry point. Defaults to None.
+            argv (list[str], optional): The command line seen by the entry point through sys.argv. Defaults to None.
+            pass_results (bool): Pass the values returned by the PYTHON tasks this task depends on
+                to the entry point as the "upstream" keyword argument. Defaults to False.
+            per_stack (bool): Run the task once for each output stack of the model. Defaults to False.
+            stack (int, optional): The stack an instance of a per-stack task runs for. Defaults to None.
         """
         self.__task_name = task_name
         self.__task_mode = task_mode
         self.__legacy_task_list = legacy_task_list
+        self.__depends_on = depends_on if depends_on is not None else []
+        self.__inputs = inputs if inputs is not None else []
+        self.__outputs = outputs if outputs is not None else []
+        self.__entry_point = entry_point
+        self.__args = args if args is not None else []
+        self.__kwargs = kwargs if kwargs is not None else {}
+        self.__argv = argv
+        self.__pass_results = pass_results
+        self.__per_stack = per_stack
+        self.__stack = stack
+
+    def __repr__(self) -> str:
+        """
+        String representation of the StofsTask instance.
+        """
+        return f"StofsTask(name={self.__task_name}, mode={self.__task_mode}, depends_on={self.__depends_on})"
 
     def name(self) -> str:
         """
@@ -55,3 +93,162 @@ class StofsTask:
             return self.__legacy_task_list
         msg = "Legacy task list is only available in LEGACY mode."
         raise ValueError(msg)
+
+    def depends_on(self) -> list[str]:
+        """
+        Get the names of the tasks which must complete before this task runs.
+
+        Returns:
+            list[str]: The names of the tasks this task depends on.
+        """
+        return self.__depends_on
+
+    def inputs(self) -> list[str]:
+        """
+        Get the files read by the task.
+
+        Returns:
+            list[str]: The paths of the files read by the task.
+        """
+        return self.__inputs
+
+    def outputs(self) -> list[str]:
+        """
+        Get the files written by the task.
+
+        Returns:
+            list[str]: The paths of the files written by the task.
+        """
+        return self.__outputs
+
+    def entry_point(self) -> str:
+        """
+        Get the entry point run by the task.
+
+        Returns:
+            str: The entry point as "module:function".
+        """
+        if self.__task_mode == ExecutionMode.PYTHON:
+            return self.__entry_point
+        msg = "Entry point is only available in PYTHON mode."
+        raise ValueError(msg)
+
+    def args(self) -> list[Any]:
+        """
+        Get the positional arguments passed to the entry point.
+
+        Returns:
+            list[Any]: The positional arguments.
+        """
+        return self.__args
+
+    def kwargs(self) -> dict[str, Any]:
+        """
+        Get the keyword arguments passed to the entry point.
+
+        Returns:
+            dict[str, Any]: The keyword arguments.
+        """
+        return self.__kwargs
+
+    def argv(self) -> Optional[list[str]]:
+        """
+        Get the command line seen by the entry point through sys.argv.
+
+        Returns:
+            Optional[list[str]]: The command line arguments, or None to leave sys.argv unchanged.
+        """
+        return self.__argv
+
+    def pass_results(self) -> bool:
+        """
+        Check whether the results of upstream PYTHON tasks are passed to the entry point.
+
+        Returns:
+            bool: True if the results are passed as the "upstream" keyword argument.
+        """
+        return self.__pass_results
+
+    def per_stack(self) -> bool:
+        """
+        Check whether the task runs once for each output stack of the model.
+
+        Returns:
+            bool: True if the task runs once for each stack.
+        """
+        return self.__per_stack
+
+    def stack(self) -> Optional[int]:
+        """
+        Get the stack this instance of a per-stack task runs for.
+
+        Returns:
+            Optional[int]: The stack number, or None if the task is not a stack instance.
+        """
+        return self.__stack
+
+    def for_stack(self, stack: int, stack_task_names: set[str]) -> "StofsTask":
+        """
+        Create the instance of a per-stack task which runs for one stack.
+
+        The instance is named <task>_<stack>. Dependencies on other per-stack
+        tasks become dependencies on their instances for the same stack, and
+        {stack} in the inputs, outputs and arguments is replaced by the stack number.
+
+        Args:
+            stack (int): The stack number.
+            stack_task_names (set[str]): The names of all of the per-stack tasks of the stage.
+
+        Returns:
+            StofsTask: The task instance for the stack.
+        """
+
+        def format_value(value: object) -> object:
+            return value.format(stack=stack) if isinstance(value, str) else value
+
+        return StofsTask(
+            f"{self.__task_name}_{stack}",
+            self.__task_mode,
+            self.__legacy_task_list,
+            depends_on=[
+                f"{name}_{stack}" if name in stack_task_names else name
+                for name in self.__depends_on
+            ],
+            inputs=[path.format(stack=stack) for path in self.__inputs],
+            outputs=[path.format(stack=stack) for path in self.__outputs],
+            entry_point=self.__entry_point,
+            args=[format_value(arg) for arg in self.__args],
+            kwargs={key: format_value(value) for key, value in self.__kwargs.items()},
+            argv=[arg.format(stack=stack) for arg in self.__argv]
+            if self.__argv is not None
+            else None,
+            pass_results=self.__pass_results,
+            stack=stack,
+        )
+
+    def without_dependencies(self, names: set[str]) -> "StofsTask":
+        """
+        Create a copy of the task which no longer depends on some tasks,
+        i.e. because they have already been run.
+
+        Args:
+            names (set[str]): The names of the dependencies to remove.
+
+        Returns:
+            StofsTask: The copy of the task.
+        """
+        return StofsTask(
+            self.__task_name,
+            self.__task_mode,
+            self.__legacy_task_list,
+            depends_on=[name for name in self.__depends_on if name not in names],
+            inputs=self.__inputs,
+            outputs=self.__outputs,
+            entry_point=self.__entry_point,
+            args=self.__args,
+            kwargs=self.__kwargs,
+            argv=self.__argv,
+            pass_results=self.__pass_results,
+            per_stack=self.__per_stack,
+            stack=self.__stack,
+        )
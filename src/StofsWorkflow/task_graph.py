@@ -0,0 +1,333 @@
+import heapq
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, Optional
+
+from .resources import ResourcePool, ResourceRequest
+from .stofs_logger import get_stofs_logger
+from .stofs_task import StofsTask
+
+log = get_stofs_logger()
+
+# Time between checks for resources released by tasks of other graphs
+RESOURCE_WAIT_INTERVAL = 1.0
+
+
+class TaskGraph:
+    """
+    Class representing the dependency graph of the tasks in a STOFS workflow stage.
+
+    Tasks are connected through the names listed in StofsTask.depends_on(). The
+    graph is validated on construction so that unknown dependencies and cycles
+    are reported before any work is started.
+    """
+
+    def __init__(self, tasks: list[StofsTask]) -> None:
+        """
+        Initialize the TaskGraph from a list of tasks.
+
+        Args:
+            tasks (list[StofsTask]): The tasks which make up the graph.
+        """
+        self.__tasks: dict[str, StofsTask] = {}
+        for task in tasks:
+            if task.name() in self.__tasks:
+                msg = f"Task {task.name()} is defined more than once"
+                raise ValueError(msg)
+            self.__tasks[task.name()] = task
+
+        self.__dependents: dict[str, list[str]] = {name: [] for name in self.__tasks}
+        for task in self.__tasks.values():
+            for dependency in task.depends_on():
+                if dependency not in self.__tasks:
+                    msg = f"Task {task.name()} depends on unknown task {dependency}"
+                    raise ValueError(msg)
+                self.__dependents[dependency].append(task.name())
+
+        self.__order = self.__topological_order()
+
+    def __len__(self) -> int:
+        """
+        Get the number of tasks in the graph.
+        """
+        return len(self.__tasks)
+
+    def task(self, name: str) -> StofsTask:
+        """
+        Get a task from the graph by name.
+
+        Args:
+            name (str): The name of the task.
+
+        Returns:
+            StofsTask: The task with the given name.
+        """
+        return self.__tasks[name]
+
+    def tasks(self) -> list[StofsTask]:
+        """
+        Get the tasks in the graph in a valid execution order.
+
+        Returns:
+            list[StofsTask]: The tasks, ordered so that dependencies come first.
+        """
+        return [self.__tasks[name] for name in self.__order]
+
+    def dependents(self, name: str) -> list[str]:
+        """
+        Get the names of the tasks which directly depend on a task.
+
+        Args:
+            name (str): The name of the task.
+
+        Returns:
+            list[str]: The names of the dependent tasks.
+        """
+        return self.__dependents[name]
+
+    def __topological_order(self) -> list[str]:
+        """
+        Compute an execution order for the graph, rejecting dependency cycles.
+
+        Returns:
+            list[str]: The task names, ordered so that dependencies come first.
+        """
+        remaining = {
+            name: len(task.depends_on()) for name, task in self.__tasks.items()
+        }
+        ready = [name for name, count in remaining.items() if count == 0]
+        order = []
+        while ready:
+            name = ready.pop(0)
+            order.append(name)
+            for dependent in self.__dependents[name]:
+                remaining[dependent] -= 1
+                if remaining[dependent] == 0:
+                    ready.append(dependent)
+
+        if len(order) != len(self.__tasks):
+            cycle = sorted(name for name, count in remaining.items() if count > 0)
+            msg = f"Task dependencies contain a cycle involving: {', '.join(cycle)}"
+            raise ValueError(msg)
+
+        return order
+
+    def priorities(self, estimates: dict[str, float]) -> dict[str, float]:
+        """
+        Compute the critical-path priority of each task.
+
+        The priority of a task is the expected duration of the longest chain of
+        tasks which starts with it (the "upward rank" used by HEFT scheduling),
+        so dispatching the highest priority first keeps the critical path busy.
+
+        Args:
+            estimates (dict[str, float]): The expected duration of each task in seconds.
+
+        Returns:
+            dict[str, float]: The priority of each task in seconds.
+        """
+        priority: dict[str, float] = {}
+        for name in reversed(self.__order):
+            longest_dependent = max(
+                (priority[dependent] for dependent in self.__dependents[name]),
+                default=0.0,
+            )
+            priority[name] = estimates.get(name, 0.0) + longest_dependent
+        return priority
+
+    def critical_path(self, estimates: dict[str, float]) -> list[str]:
+        """
+        Get the chain of tasks with the longest expected duration.
+
+        Args:
+            estimates (dict[str, float]): The expected duration of each task in seconds.
+
+        Returns:
+            list[str]: The names of the tasks on the critical path, in execution order.
+        """
+        priority = self.priorities(estimates)
+        path: list[str] = []
+        candidates = [
+            name for name, task in self.__tasks.items() if not task.depends_on()
+        ]
+        while candidates:
+            name = max(candidates, key=lambda n: priority[n])
+            path.append(name)
+            candidates = self.__dependents[name]
+        return path
+
+    def __next_ready(
+        self,
+        ready: list[str],
+        held: dict[str, ResourceRequest],
+        resource_pool: Optional[ResourcePool],
+        resources: Optional[Callable[[StofsTask], ResourceRequest]],
+    ) -> Optional[str]:
+        """
+        Choose the next task to start and hold its resources.
+
+        Args:
+            ready (list[str]): The names of the ready tasks, highest priority first.
+            held (dict[str, ResourceRequest]): The resources held by each running task.
+            resource_pool (ResourcePool, optional): The node resources shared by the running tasks.
+            resources (Callable[[StofsTask], ResourceRequest], optional): Gets the resources of a task.
+
+        Returns:
+            Optional[str]: The name of the task, or None if no ready task fits on the node.
+        """
+        if resource_pool is None or resources is None:
+            return ready[0]
+        for name in ready:
+            request = resources(self.__tasks[name])
+            if resource_pool.try_acquire(request):
+                held[name] = request
+                return name
+        return None
+
+    def predict_makespan(self, estimates: dict[str, float], jobs: int = 1) -> float:
+        """
+        Predict the wall time of the graph by simulating its execution.
+
+        Args:
+            estimates (dict[str, float]): The expected duration of each task in seconds.
+            jobs (int): The maximum number of tasks to run concurrently.
+
+        Returns:
+            float: The predicted wall time in seconds.
+        """
+        priority = self.priorities(estimates)
+        remaining = {
+            name: len(task.depends_on()) for name, task in self.__tasks.items()
+        }
+        ready = [
+            (-priority[name], name) for name in self.__order if remaining[name] == 0
+        ]
+        heapq.heapify(ready)
+        running: list[tuple[float, str]] = []
+        clock = 0.0
+
+        while ready or running:
+            while ready and len(running) < max(jobs, 1):
+                _, name = heapq.heappop(ready)
+                heapq.heappush(running, (clock + estimates.get(name, 0.0), name))
+            clock, name = heapq.heappop(running)
+            for dependent in self.__dependents[name]:
+                remaining[dependent] -= 1
+                if remaining[dependent] == 0:
+                    heapq.heappush(ready, (-priority[dependent], dependent))
+
+        return clock
+
+    def execute(
+        self,
+        run_task: Callable[[StofsTask], None],
+        jobs: int = 1,
+        estimates: Optional[dict[str, float]] = None,
+        resource_pool: Optional[ResourcePool] = None,
+        resources: Optional[Callable[[StofsTask], ResourceRequest]] = None,
+    ) -> None:
+        """
+        Execute the tasks in the graph, running up to jobs independent tasks at once.
+
+        A task is started only once all of its dependencies have completed
+        successfully. When expected durations are given, the ready task with the
+        longest remaining chain is started first. When a resource pool is given,
+        a task is also only started once its cores, memory and I/O slot fit on
+        the node, and the highest priority ready task which fits is started
+        instead of waiting for one which does not. After the first failure no
+        new tasks are started and the tasks already running are allowed to
+        finish. The exception of a single failed task is then raised as it
+        is, so callers see the ValueError or FileNotFoundError of the task,
+        while several failures raise a RuntimeError naming every failed and
+        unstarted task, chained from the first failure.
+
+        Args:
+            run_task (Callable[[StofsTask], None]): The function used to run a single task.
+            jobs (int): The maximum number of tasks to run concurrently.
+            estimates (dict[str, float], optional): The expected duration of each task in seconds.
+            resource_pool (ResourcePool, optional): The node resources shared by the running tasks.
+            resources (Callable[[StofsTask], ResourceRequest], optional): Gets the resources of a task.
+        """
+        priority = self.priorities(estimates if estimates is not None else {})
+        remaining = {
+            name: len(task.depends_on()) for name, task in self.__tasks.items()
+        }
+        ready = [name for name in self.__order if remaining[name] == 0]
+        running: dict[Future, str] = {}
+        held: dict[str, ResourceRequest] = {}
+        completed: list[str] = []
+        failed: dict[str, BaseException] = {}
+
+        log.info(f"Executing {len(self.__tasks)} tasks with {jobs} job(s)")
+
+        with ThreadPoolExecutor(max_workers=max(jobs, 1)) as pool:
+            while ready or running:
+                blocked = False
+                while ready and not failed and len(running) < max(jobs, 1):
+                    # Stable sort so that equal priorities keep the graph order
+                    ready.sort(key=lambda n: -priority[n])
+                    name = self.__next_ready(ready, held, resource_pool, resources)
+                    if name is None:
+                        blocked = True
+                        break
+                    ready.remove(name)
+                    log.info(f"Starting task {name}")
+                    running[pool.submit(run_task, self.__tasks[name])] = name
+
+                if not running:
+                    if blocked:
+                        # Only tasks of other graphs hold the resources
+                        resource_pool.wait(RESOURCE_WAIT_INTERVAL)
+                        continue
+                    break
+
+                done, _ = wait(
+                    running,
+                    timeout=RESOURCE_WAIT_INTERVAL if blocked else None,
+                    return_when=FIRST_COMPLETED,
+                )
+                for future in done:
+                    name = running.pop(future)
+                    if name in held:
+                        resource_pool.release(held.pop(name))
+                    error = future.exception()
+                    if error is not None:
+                        log.error(f"Task {name} failed: {error}")
+                        failed[name] = error
+                        continue
+
+                    log.info(f"Task {name} completed")
+                    completed.append(name)
+                    for dependent in self.__dependents[name]:
+                        remaining[dependent] -= 1
+                        if remaining[dependent] == 0:
+                            ready.append(dependent)
+
+        if failed:
+            self.__raise_failures(failed, completed)
+
+    def __raise_failures(
+        self, failed: dict[str, BaseException], completed: list[str]
+    ) -> None:
+        """
+        Raise the failures of an execution of the graph.
+
+        Args:
+            failed (dict[str, BaseException]): The exception of each failed task.
+            completed (list[str]): The names of the tasks which completed.
+        """
+        not_run = [
+            name
+            for name in self.__order
+            if name not in completed and name not in failed
+        ]
+        if not_run:
+            log.error(f"Tasks not run: {', '.join(not_run)}")
+        first = next(iter(failed.values()))
+        if len(failed) == 1:
+            raise first
+        msg = "Tasks failed: " + "; ".join(
+            f"{name}: {error}" for name, error in failed.items()
+        )
+        if not_run:
+            msg += f". Tasks not run: {', '.join(not_run)}"
+        raise RuntimeError(msg) from first
@@ -0,0 +1,68 @@
+from statistics import median
+from typing import Optional
+
+from .perf_database import PerfDatabase
+
+
+class TaskHistory:
+    """
+    Class representing the recorded durations of previously executed tasks.
+
+    Durations are read from the performance database so that the times
+    measured in earlier cycles can be used to order the tasks of the next.
+    Only the most recent successful runs of each task of the same model and
+    stage are considered.
+    """
+
+    MAX_SAMPLES = 10
+
+    def __init__(self, database: PerfDatabase, model: str, stage: str) -> None:
+        """
+        Initialize the TaskHistory.
+
+        Args:
+            database (PerfDatabase): The performance database holding the task durations.
+            model (str): The name of the model configuration the tasks belong to.
+            stage (str): The stage the tasks belong to.
+        """
+        self.__database = database
+        self.__model = model
+        self.__stage = stage
+
+    def estimate(self, task_name: str) -> Optional[float]:
+        """
+        Get the expected duration of a task from its recorded history.
+
+        Args:
+            task_name (str): The name of the task.
+
+        Returns:
+            Optional[float]: The median recorded duration in seconds, or None if the task has no history.
+        """
+        durations = self.__database.task_durations(
+            self.__model, self.__stage, task_name, TaskHistory.MAX_SAMPLES
+        )
+        if not durations:
+            return None
+        return median(durations)
+
+    def estimates(self, task_names: list[str]) -> dict[str, float]:
+        """
+        Get the expected durations for a list of tasks.
+
+        Tasks without any history are assumed to take as long as the average
+        of the tasks which do have history, or one second if none do.
+
+        Args:
+            task_names (list[str]): The names of the tasks.
+
+        Returns:
+            dict[str, float]: The expected duration of each task in seconds.
+        """
+        known = {name: self.estimate(name) for name in task_names}
+        measured = [value for value in known.values() if value is not None]
+        default = sum(measured) / len(measured) if measured else 1.0
+        return {
+            name: value if value is not None else default
+            for name, value in known.items()
+        }
@@ -0,0 +1,100 @@
+import json
+import os
+import threading
+from dataclasses import asdict, dataclass, field
+from typing import Optional, Union
+
+
+@dataclass
+class ResourceUsage:
+    """
+    Resources used by a script and all of the processes it started.
+
+    CPU times are in seconds, the peak resident set size is in kilobytes and
+    the I/O counters are in bytes. read_bytes and write_bytes count storage
+    I/O, while read_chars and write_chars include I/O satisfied by the page
+    cache and pipes.
+    """
+
+    wall_time: float = field(default=0.0)
+    user_time: float = field(default=0.0)
+    system_time: float = field(default=0.0)
+    max_rss_kb: int = field(default=0)
+    read_bytes: int = field(default=0)
+    write_bytes: int = field(default=0)
+    read_chars: int = field(default=0)
+    write_chars: int = field(default=0)
+
+    def to_dict(self) -> dict:
+        """
+        Convert the resource usage to a dictionary.
+
+        Returns:
+            dict: The resource usage values keyed by name.
+        """
+        return asdict(self)
+
+
+def read_proc_io(pid: Union[int, str]) -> Optional[dict[str, int]]:
+    """
+    Read the I/O counters of a process from /proc/<pid>/io.
+
+    When read from an exited but not yet reaped process, the counters include
+    the I/O of all of the children it waited for.
+
+    Args:
+        pid (Union[int, str]): The process id, or "<pid>/task/<tid>" for a single thread.
+
+    Returns:
+        Optional[dict[str, int]]: The counters by name, or None if they cannot be read.
+    """
+    try:
+        with open(f"/proc/{pid}/io") as f:
+            counters = {}
+            for line in f:
+                key, value = line.split(":", 1)
+                counters[key.strip()] = int(value)
+            return counters
+    except (OSError, ValueError):
+        return None
+
+
+class MetricsLog:
+    """
+    Class representing the metrics recorded for the scripts run in a cycle.
+
+    Metrics are appended as one JSON object per line to a file per cycle in
+    the state directory, so that the file can be read while the cycle runs.
+    """
+
+    def __init__(self, state_directory: str, cycle: str) -> None:
+        """
+        Initialize the MetricsLog for a cycle.
+
+        Args:
+            state_directory (str): The directory where workflow state is kept.
+            cycle (str): The cycle being run.
+        """
+        self.__filename = os.path.join(state_directory, "metrics", f"{cycle}.jsonl")
+        self.__lock = threading.Lock()
+
+    def filename(self) -> str:
+        """
+        Get the path of the metrics file.
+
+        Returns:
+            str: The path of the metrics file.
+        """
+        return self.__filename
+
+    def record(self, record: dict) -> None:
+        """
+        Append a record to the metrics file.
+
+        Args:
+            record (dict): The metrics to record.
+        """
+        with self.__lock:
+            os.makedirs(os.path.dirname(self.__filename), exist_ok=True)
+            with open(self.__filename, "a") as f:
+                f.write(json.dumps(record) + "\n")
@@ -0,0 +1,150 @@
+import json
+import os
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from typing import Optional
+
+# Thread ids used for each kind of span. Every concurrently running span of a
+# kind gets its own lane so that overlapping spans are drawn on separate rows.
+LANE_BASE = {"stage": 0, "task": 100, "script": 1000}
+
+
+class TraceRecorder:
+    """
+    Class which records the spans of a stage in the Chrome trace-event format.
+
+    Each stage, task and script becomes a complete ("X") event. Spans running at
+    the same time are placed on separate lanes (trace threads) so that the
+    concurrency of the stage is visible. Events are appended to a per-cycle file
+    using the JSON array format, which chrome://tracing and Perfetto load even
+    without a closing bracket, so every stage of a cycle ends up in one timeline.
+    """
+
+    def __init__(self, process_name: str) -> None:
+        """
+        Initialize the TraceRecorder.
+
+        Args:
+            process_name (str): The name shown for this process in the trace viewer.
+        """
+        self.__pid = os.getpid()
+        self.__lock = threading.Lock()
+        self.__busy_lanes: dict[str, set[int]] = {kind: set() for kind in LANE_BASE}
+        self.__named_lanes: set[int] = set()
+        self.__events: list[dict] = [
+            {
+                "name": "process_name",
+                "ph": "M",
+                "pid": self.__pid,
+                "args": {"name": process_name},
+            }
+        ]
+
+    @contextmanager
+    def span(self, name: str, kind: str, args: Optional[dict] = None) -> Iterator[dict]:
+        """
+        Record a span covering the body of a with statement.
+
+        Args:
+            name (str): The name of the span.
+            kind (str): The kind of span, one of "stage", "task" or "script".
+            args (dict, optional): Values shown with the span. The dictionary
+                yielded by the context manager can be updated inside the body.
+
+        Yields:
+            dict: The span's arguments.
+        """
+        span_args = dict(args) if args is not None else {}
+        tid = self.__acquire_lane(kind)
+        start = time.time()
+        try:
+            yield span_args
+        finally:
+            end = time.time()
+            self.__release_lane(kind, tid)
+            with self.__lock:
+                self.__events.append(
+                    {
+                        "name": name,
+                        "cat": kind,
+                        "ph": "X",
+                        "ts": start * 1e6,
+                        "dur": (end - start) * 1e6,
+                        "pid": self.__pid,
+                        "tid": tid,
+                        "args": span_args,
+                    }
+                )
+
+    def write(self, filename: str) -> None:
+        """
+        Append the recorded events to a trace file.
+
+        Args:
+            filename (str): The trace file, created if it does not exist.
+        """
+        with self.__lock:
+            events = self.__events
+            self.__events = []
+
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        text = "".join(json.dumps(event) + ",\n" for event in events)
+        fd = os.open(filename, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        try:
+            if os.fstat(fd).st_size == 0:
+                text = "[\n" + text
+            os.write(fd, text.encode())
+        finally:
+            os.close(fd)
+
+    def __acquire_lane(self, kind: str) -> int:
+        """
+        Get the lowest free lane for a kind of span.
+
+        Args:
+            kind (str): The kind of span.
+
+        Returns:
+            int: The trace thread id of the lane.
+        """
+        with self.__lock:
+            busy = self.__busy_lanes[kind]
+            lane = 0
+            while lane in busy:
+                lane += 1
+            busy.add(lane)
+            tid = LANE_BASE[kind] + lane
+            if tid not in self.__named_lanes:
+                self.__named_lanes.add(tid)
+                self.__events.append(
+                    {
+                        "name": "thread_name",
+                        "ph": "M",
+                        "pid": self.__pid,
+                        "tid": tid,
+                        "args": {"name": f"{kind} lane {lane}"},
+                    }
+                )
+                self.__events.append(
+                    {
+                        "name": "thread_sort_index",
+                        "ph": "M",
+                        "pid": self.__pid,
+                        "tid": tid,
+                        "args": {"sort_index": tid},
+                    }
+                )
+            return tid
+
+    def __release_lane(self, kind: str, tid: int) -> None:
+        """
+        Mark a lane as free.
+
+        Args:
+            kind (str): The kind of span.
+            tid (int): The trace thread id of the lane.
+        """
+        with self.__lock:
+            self.__busy_lanes[kind].discard(tid - LANE_BASE[kind])
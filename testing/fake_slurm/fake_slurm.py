@@ -0,0 +1,140 @@
+"""
+Stand-ins for the SLURM commands, used by the SLURM backend tests.
+
+sbatch runs each job at once, in the foreground, so every job has finished
+by the time the next one is submitted. A job whose afterok dependencies did
+not all complete is cancelled without running, as with --kill-on-invalid-dep.
+squeue lists every job it is asked about with its state, including the jobs
+which have finished, as the real squeue does until MinJobAge has passed.
+
+The jobs are kept in the directory named by $FAKE_SLURM_DIR, where every
+sbatch command line is also appended to sbatch.log.
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+
+def job_file(job_id: str) -> str:
+    """
+    Get the file a job is kept in.
+    """
+    return os.path.join(os.environ["FAKE_SLURM_DIR"], f"{job_id}.json")
+
+
+def read_job(job_id: str) -> dict:
+    """
+    Read a job, or an empty job if it is not known.
+    """
+    try:
+        with open(job_file(job_id)) as f:
+            return json.load(f)
+    except OSError:
+        return {}
+
+
+def options(args: list[str]) -> dict[str, str]:
+    """
+    Get the --name=value options of a command line.
+    """
+    return dict(arg[2:].partition("=")[::2] for arg in args if arg.startswith("--"))
+
+
+def sbatch(args: list[str]) -> int:
+    """
+    Run a batch script as a job.
+    """
+    directory = os.environ["FAKE_SLURM_DIR"]
+    with open(os.path.join(directory, "sbatch.log"), "a") as f:
+        f.write(json.dumps(args) + "\n")
+
+    counter = os.path.join(directory, "next_id")
+    job_id = "1000"
+    if os.path.exists(counter):
+        with open(counter) as f:
+            job_id = f.read()
+    with open(counter, "w") as f:
+        f.write(str(int(job_id) + 1))
+
+    settings = options(args[:-1])
+    script = args[-1]
+    indices = [None]
+    if "array" in settings:
+        indices = [int(i) for i in settings["array"].partition("%")[0].split(",")]
+    dependencies = settings.get("dependency", "").partition("afterok:")[2]
+
+    job = {"name": settings.get("job-name"), "array": "array" in settings}
+    if any(
+        read_job(dependency).get("state") != "COMPLETED"
+        for dependency in dependencies.split(":")
+        if dependency
+    ):
+        job["state"] = "CANCELLED"
+        job["exit_codes"] = {}
+    else:
+        exit_codes = {}
+        for index in indices:
+            env = dict(os.environ, SLURM_JOB_ID=job_id)
+            if index is not None:
+                env["SLURM_ARRAY_TASK_ID"] = str(index)
+            output = settings["output"].replace("%a", str(index)).replace("%j", job_id)
+            with open(output, "a") as out:
+                exit_codes[str(index or 0)] = subprocess.run(
+                    ["bash", script],
+                    stdout=out,
+                    stderr=subprocess.STDOUT,
+                    cwd=settings.get("chdir"),
+                    env=env,
+                    check=False,
+                ).returncode
+        job["exit_codes"] = exit_codes
+        job["state"] = "COMPLETED" if not any(exit_codes.values()) else "FAILED"
+    with open(job_file(job_id), "w") as f:
+        json.dump(job, f)
+    print(job_id)
+    return 0
+
+
+def squeue(args: list[str]) -> int:
+    """
+    List the jobs asked about, with their states.
+    """
+    for job_id in options(args).get("jobs", "").split(","):
+        job = read_job(job_id)
+        if job:
+            print(f"{job_id} {job['state']}")
+    return 0
+
+
+def sacct(args: list[str]) -> int:
+    """
+    Print the accounting of a job.
+    """
+    job_id = options(args)["jobs"]
+    job = read_job(job_id)
+    print(f"{job_id}|{job.get('state', '')}|0:0|1|")
+    for index, exit_code in job.get("exit_codes", {}).items():
+        name = f"{job_id}_{index}" if job["array"] else job_id
+        state = "COMPLETED" if exit_code == 0 else "FAILED"
+        print(f"{name}.batch|{state}|{exit_code}:0|1|2048K")
+    return 0
+
+
+def scancel(args: list[str]) -> int:
+    """
+    Cancel jobs.
+    """
+    for job_id in args:
+        job = read_job(job_id)
+        if job:
+            job["state"] = "CANCELLED"
+            with open(job_file(job_id), "w") as f:
+                json.dump(job, f)
+    return 0
+
+
+if __name__ == "__main__":
+    command = {"sbatch": sbatch, "squeue": squeue, "sacct": sacct, "scancel": scancel}
+    sys.exit(command[sys.argv[1]](sys.argv[2:]))
@@ -0,0 +1,125 @@
+import os
+
+import pytest
+import yaml
+
+from StofsWorkflow.backfill import Backfill, cycle_range
+from StofsWorkflow.fingerprint import FingerprintCache
+from StofsWorkflow.stofs_logger import setup_stofs_logging
+
+setup_stofs_logging()
+
+
+def test_cycle_range() -> None:
+    """
+    Test that the cycles of a range are listed inclusively, at the interval.
+    """
+    assert cycle_range("2025010100", "2025010300") == [
+        "2025010100",
+        "2025010200",
+        "2025010300",
+    ], "Wrong daily cycles"
+    assert cycle_range("2025013112", "2025020100", 6) == [
+        "2025013112",
+        "2025013118",
+        "2025020100",
+    ], "Wrong cycles across a month"
+
+    with pytest.raises(ValueError, match="YYYYMMDDHH"):
+        cycle_range("20250101", "2025010200")
+    with pytest.raises(ValueError, match="before the first cycle"):
+        cycle_range("2025010200", "2025010100")
+    with pytest.raises(ValueError, match="must be positive"):
+        cycle_range("2025010100", "2025010200", 0)
+
+
+def write_config(tmp_path: str) -> str:
+    """
+    Write a configuration with a task in each of three stages.
+    """
+    config_file = os.path.join(tmp_path, "config.yaml")
+    with open(config_file, "w") as f:
+        yaml.dump(
+            {
+                "type": "SCHISM",
+                "name": "test-backfill",
+                "version": "1.0",
+                "script_directory": tmp_path,
+                "state_directory": os.path.join(tmp_path, "state"),
+                "tasks": {
+                    stage: {"stage": stage, "scripts": [f"{stage}.sh"]}
+                    for stage in ("prep_forecast", "forecast", "post")
+                },
+            },
+            f,
+        )
+    return config_file
+
+
+def test_backfill_graph(tmp_path: str) -> None:
+    """
+    Test that the stages of a cycle run in order and that the only link
+    between cycles is the hotstart chain.
+    """
+    backfill = Backfill(
+        write_config(str(tmp_path)),
+        ["2025010100", "2025010200"],
+        stages=["post", "prep_forecast", "forecast"],
+    )
+    graph = backfill.graph()
+    depends_on = {task.name(): task.depends_on() for task in graph.tasks()}
+    assert depends_on == {
+        "prep_forecast@2025010100": [],
+        "forecast@2025010100": ["prep_forecast@2025010100"],
+        "post@2025010100": ["forecast@2025010100"],
+        "prep_forecast@2025010200": [],
+        "forecast@2025010200": ["prep_forecast@2025010200", "forecast@2025010100"],
+        "post@2025010200": ["forecast@2025010200"],
+    }, "Wrong backfill graph"
+
+    with pytest.raises(ValueError, match="not one of the stages"):
+        Backfill(
+            write_config(str(tmp_path)),
+            ["2025010100"],
+            stages=["post"],
+            hotstart_from="forecast",
+        )
+
+
+def test_backfill_environment(tmp_path: str, monkeypatch: pytest.MonkeyPatch) -> None:
+    """
+    Test that each cycle has its own DATA, shared by its stages, and each
+    stage of a cycle its own jobid.
+    """
+    monkeypatch.setenv("DATA", "/shared")
+    monkeypatch.setenv("DATAROOT", str(tmp_path))
+    backfill = Backfill(write_config(str(tmp_path)), ["2025010100", "2025010200"])
+
+    prep = backfill.environment("2025010100", "prep_forecast")
+    post = backfill.environment("2025010100", "post")
+    other = backfill.environment("2025010200", "post")
+    assert prep["DATA"] == os.path.join(str(tmp_path), "test-backfill.2025010100")
+    assert prep["DATA"] == post["DATA"], "Stages of a cycle do not share DATA"
+    assert post["DATA"] != other["DATA"], "Cycles share DATA"
+    assert prep["jobid"] != post["jobid"], "Stages share a jobid"
+    assert (other["PDY"], other["cyc"]) == ("20250102", "00"), "Wrong PDY and cyc"
+
+
+def test_fingerprints_merged_between_processes(tmp_path: str) -> None:
+    """
+    Test that caches saved by two workflow processes sharing the state
+    directory keep each other's tasks.
+    """
+    product = os.path.join(str(tmp_path), "out.txt")
+    with open(product, "w") as f:
+        f.write("output")
+
+    first = FingerprintCache(str(tmp_path))
+    second = FingerprintCache(str(tmp_path))
+    first.record("first", [], [product])
+    second.record("second", [], [product])
+
+    merged = FingerprintCache(str(tmp_path))
+    assert merged.is_up_to_date("first", [], [product]), "First task was lost"
+    assert merged.is_up_to_date("second", [], [product]), "Second task was lost"
+    assert not any(name.endswith(".tmp") for name in os.listdir(str(tmp_path)))
@@ -0,0 +1,104 @@
+import json
+import os
+
+import pytest
+import yaml
+
+from StofsWorkflow.batch import Batch
+from StofsWorkflow.stofs_logger import setup_stofs_logging
+from StofsWorkflow.stofs_run_options import StofsRunOptions
+
+setup_stofs_logging()
+
+
+def write_member(tmp_path: str, name: str, state_directory: str) -> str:
+    """
+    Write the configuration of a batch member with a task shared by every
+    member, which builds the same output from the same input, and a task of
+    its own which depends on it.
+    """
+    scripts = os.path.join(tmp_path, "scripts")
+    os.makedirs(scripts, exist_ok=True)
+    for script, body in (
+        (
+            "shared.sh",
+            f"echo shared >> {tmp_path}/runs; cp {tmp_path}/in.txt {tmp_path}/sflux.txt",
+        ),
+        (f"{name}.sh", f"echo {name} >> {tmp_path}/runs"),
+    ):
+        path = os.path.join(scripts, script)
+        with open(path, "w") as f:
+            f.write(f"#!/bin/bash\n{body}\n")
+        os.chmod(path, 0o755)
+
+    config_file = os.path.join(tmp_path, f"{name}.yaml")
+    with open(config_file, "w") as f:
+        yaml.dump(
+            {
+                "type": "SCHISM",
+                "name": name,
+                "version": "1.0",
+                "script_directory": scripts,
+                "state_directory": state_directory,
+                "tasks": {
+                    "sflux": {
+                        "stage": "prep_forecast",
+                        "scripts": ["shared.sh"],
+                        "inputs": [f"{tmp_path}/in.txt"],
+                        "outputs": [f"{tmp_path}/sflux.txt"],
+                    },
+                    "member": {
+                        "stage": "prep_forecast",
+                        "depends_on": ["sflux"],
+                        "scripts": [f"{name}.sh"],
+                    },
+                },
+            },
+            f,
+        )
+    return config_file
+
+
+def test_batch_runs_shared_tasks_once(tmp_path: str) -> None:
+    """
+    Test that a task which is identical in every member runs once, that the
+    copies in the other members are recorded as completed, and that the
+    members' own tasks all run.
+    """
+    tmp_path = str(tmp_path)
+    with open(os.path.join(tmp_path, "in.txt"), "w") as f:
+        f.write("gfs")
+    config_files = [
+        write_member(tmp_path, name, os.path.join(tmp_path, f"state_{name}"))
+        for name in ("east", "west")
+    ]
+
+    batch = Batch(config_files, "prep_forecast", StofsRunOptions(cycle="2025010100"))
+    assert batch.members() == ["east", "west"], "Wrong member names"
+    batch.run()
+
+    with open(os.path.join(tmp_path, "runs")) as f:
+        runs = f.read().split()
+    assert runs.count("shared") == 1, "Shared task ran more than once"
+    assert sorted(runs) == ["east", "shared", "west"], "Member tasks did not run"
+
+    for name in ("east", "west"):
+        state_file = os.path.join(
+            tmp_path, f"state_{name}", "runs", "2025010100", "prep_forecast.json"
+        )
+        with open(state_file) as f:
+            tasks = json.load(f)["tasks"]
+        assert tasks["sflux"]["status"] == "completed", f"{name} sflux not complete"
+
+
+def test_batch_rejects_shared_state(tmp_path: str) -> None:
+    """
+    Test that members which would share a state directory are rejected.
+    """
+    tmp_path = str(tmp_path)
+    state_directory = os.path.join(tmp_path, "state")
+    config_files = [
+        write_member(tmp_path, name, state_directory) for name in ("east", "west")
+    ]
+    with pytest.raises(ValueError, match="share the state directory"):
+        Batch(config_files, "prep_forecast")
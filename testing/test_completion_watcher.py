@@ -0,0 +1,75 @@
+import os
+import threading
+import time
+
+import pytest
+
+from StofsWorkflow.completion_watcher import (
+    CompletionCriteria,
+    CompletionWatcher,
+    Inotify,
+)
+from StofsWorkflow.stofs_logger import setup_stofs_logging
+
+setup_stofs_logging()
+
+
+def test_paused_final_file_is_not_complete(tmp_path: str) -> None:
+    """
+    Test that a final file which stops growing for a while is not complete
+    unless a settle time is set.
+    """
+    final_file = os.path.join(str(tmp_path), "out2d_4.nc")
+    with open(final_file, "wb") as f:
+        f.write(bytes(64))
+
+    watcher = CompletionWatcher(CompletionCriteria(final_file=final_file))
+    assert watcher.check() is None, "Final file was complete when first seen"
+    time.sleep(0.2)
+    assert watcher.check() is None, "Paused final file was complete"
+    with pytest.raises(TimeoutError, match="did not complete"):
+        CompletionWatcher(
+            CompletionCriteria(final_file=final_file, timeout=0.3, poll_interval=0.05)
+        ).wait()
+
+    watcher = CompletionWatcher(
+        CompletionCriteria(final_file=final_file, settle_time=0.1)
+    )
+    assert watcher.check() is None, "Final file was complete when first seen"
+    time.sleep(0.2)
+    assert "has not changed" in (watcher.check() or ""), (
+        "Stable final file was not complete with a settle time"
+    )
+
+
+def test_closed_final_file_is_complete(tmp_path: str) -> None:
+    """
+    Test that a final file is complete once it is written in bursts and
+    closed, and that the marker text completes the run.
+    """
+    try:
+        Inotify().close()
+    except OSError:
+        pytest.skip("inotify is not available")
+    final_file = os.path.join(str(tmp_path), "out2d_4.nc")
+
+    def write() -> None:
+        with open(final_file, "wb") as f:
+            for _ in range(3):
+                f.write(bytes(64))
+                f.flush()
+                time.sleep(0.1)
+
+    writer = threading.Thread(target=write)
+    writer.start()
+    reason = CompletionWatcher(
+        CompletionCriteria(final_file=final_file, timeout=5.0, poll_interval=0.05)
+    ).wait()
+    writer.join()
+    assert reason == f"{final_file} was closed", "Closed final file was not complete"
+
+    marker_file = os.path.join(str(tmp_path), "mirror.out")
+    with open(marker_file, "w") as f:
+        f.write("TIME STEP= 8640\nRun completed successfully\n")
+    reason = CompletionWatcher(CompletionCriteria(marker_file=marker_file)).check()
+    assert "Run completed" in (reason or ""), "Marker was not found"
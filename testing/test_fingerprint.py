@@ -0,0 +1,98 @@
+import os
+import time
+
+import yaml
+
+from StofsWorkflow.fingerprint import FingerprintCache, hash_file
+from StofsWorkflow.model_factory import model_factory
+from StofsWorkflow.stofs_config import StofsConfig
+from StofsWorkflow.stofs_logger import setup_stofs_logging
+from StofsWorkflow.stofs_run_options import StofsRunOptions
+
+setup_stofs_logging()
+
+
+def write_file(path: str, text: str, mtime: int) -> None:
+    """
+    Write a file with a given modification time in seconds.
+    """
+    with open(path, "w") as f:
+        f.write(text)
+    os.utime(path, (mtime, mtime))
+
+
+def test_fingerprint_up_to_date(tmp_path: str) -> None:
+    """
+    Test that outputs are up to date when newer than the inputs or when the
+    contents match those recorded when the task last succeeded.
+    """
+    source = os.path.join(str(tmp_path), "in.txt")
+    product = os.path.join(str(tmp_path), "out.txt")
+    write_file(source, "input", 1000)
+
+    cache = FingerprintCache(str(tmp_path))
+    assert not cache.is_up_to_date("t", [source], [product]), "Missing output is fine"
+
+    write_file(product, "output", 2000)
+    assert cache.is_up_to_date("t", [source], [product]), "Newer output is stale"
+
+    # An input touched after the output, with the same contents
+    cache.record("t", [source], [product])
+    write_file(source, "input", 3000)
+    assert cache.is_up_to_date("t", [source], [product]), "Unchanged contents rerun"
+
+    write_file(source, "changed", 3000)
+    assert not cache.is_up_to_date("t", [source], [product]), "Changed input skipped"
+
+    reloaded = FingerprintCache(str(tmp_path))
+    assert reloaded.fingerprint(product)["hash"] == hash_file(product)
+
+
+def test_fingerprint_skip_and_force(tmp_path: str) -> None:
+    """
+    Test that a task whose outputs are up to date is skipped, and run again with force.
+    """
+    scripts = os.path.join(str(tmp_path), "scripts")
+    os.makedirs(scripts)
+    source = os.path.join(str(tmp_path), "in.txt")
+    product = os.path.join(str(tmp_path), "out.txt")
+    counter = os.path.join(str(tmp_path), "counter")
+    write_file(source, "input", 1000)
+    script = os.path.join(scripts, "make.sh")
+    with open(script, "w") as f:
+        f.write(f"#!/bin/bash\necho run >> {counter}\ncp {source} {product}\n")
+    os.chmod(script, 0o755)
+
+    config_file = os.path.join(str(tmp_path), "config.yaml")
+    with open(config_file, "w") as f:
+        yaml.dump(
+            {
+                "type": "SCHISM",
+                "name": "test-fingerprint",
+                "version": "1.0",
+                "script_directory": scripts,
+                "state_directory": os.path.join(str(tmp_path), "state"),
+                "tasks": {
+                    "make": {
+                        "stage": "post",
+                        "scripts": ["make.sh"],
+                        "inputs": [source],
+                        "outputs": [product],
+                    }
+                },
+            },
+            f,
+        )
+
+    def runs() -> int:
+        with open(counter) as f:
+            return len(f.readlines())
+
+    for force, expected in ((False, 1), (False, 1), (True, 2)):
+        options = StofsRunOptions(cycle="2025010100", force=force)
+        model_factory(StofsConfig(config_file), options).post()
+        assert runs() == expected, f"Wrong number of runs with force={force}"
+
+    write_file(source, "changed", int(time.time()) + 10)
+    model_factory(StofsConfig(config_file), StofsRunOptions(cycle="2025010106")).post()
+    assert runs() == 3, "Task was skipped after its input changed"
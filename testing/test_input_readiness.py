@@ -0,0 +1,90 @@
+import os
+
+import pytest
+
+from StofsWorkflow.input_readiness import (
+    InputScanner,
+    UpstreamSource,
+    check_upstream,
+)
+from StofsWorkflow.stofs_logger import setup_stofs_logging
+
+setup_stofs_logging()
+
+
+def write_file(path: str, size: int) -> None:
+    """
+    Write a file of a given size for the tests.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(bytes(size))
+
+
+def test_windows_and_backups(tmp_path: str) -> None:
+    """
+    Test that the forecast hours of each window come from the cycle of the
+    window, and that the backup of an hour is the file of the backup cycle
+    valid at the same time.
+    """
+    source = UpstreamSource.from_dict(
+        "gfs",
+        {
+            "primary": os.path.join(str(tmp_path), "gfs.{pdy}{cyc}.f{hour:03d}"),
+            "backup_cycles": [-24],
+            "windows": [
+                {"cycle": -6, "first": 1, "last": 2},
+                {"first": 1, "last": 2},
+            ],
+            "min_size": "1K",
+        },
+    )
+    assert source.min_size == 1000, "Minimum size is not in bytes"
+    inputs = source.inputs("2025010112")
+    assert [os.path.basename(path) for path in inputs[0].candidates] == [
+        "gfs.2025010106.f001",
+        "gfs.2024123112.f019",
+    ], "Wrong files for an hour of an earlier cycle"
+    assert [upstream_input.name for upstream_input in inputs] == [
+        "gfs 2025010106 f001",
+        "gfs 2025010106 f002",
+        "gfs f001",
+        "gfs f002",
+    ], "Wrong inputs"
+
+
+def test_scanner_falls_back_to_backups(tmp_path: str) -> None:
+    """
+    Test that an hour whose primary file is missing or too small uses its
+    backup, that an hour with neither is missing, and that the scan fails
+    when more files are missing than the source allows.
+    """
+    tmp_path = str(tmp_path)
+    template = os.path.join(tmp_path, "gfs.{pdy}{cyc}.f{hour:03d}")
+    write_file(os.path.join(tmp_path, "gfs.2025010112.f001"), 2000)
+    write_file(os.path.join(tmp_path, "gfs.2025010112.f002"), 10)
+    write_file(os.path.join(tmp_path, "gfs.2025010106.f008"), 2000)
+    list_file = os.path.join(tmp_path, "gfs_files.txt")
+    attributes = {
+        "primary": template,
+        "backup_cycles": [-6],
+        "hours": {"first": 1, "last": 3},
+        "min_size": 1000,
+        "list_file": list_file,
+    }
+
+    source = UpstreamSource.from_dict("gfs", attributes)
+    result = InputScanner(min_size=source.min_size).scan(source.inputs("2025010112"))
+    assert result.sources == ["primary", "backup", "missing"], "Wrong sources"
+    assert os.path.basename(result.files[1]) == "gfs.2025010106.f008", "Wrong backup"
+
+    with pytest.raises(RuntimeError, match="gfs is missing 1 files"):
+        check_upstream([source], "2025010112", wait=False)
+
+    source = UpstreamSource.from_dict("gfs", attributes | {"allow_missing": 1})
+    check_upstream([source], "2025010112", wait=False)
+    with open(list_file) as f:
+        assert [os.path.basename(path) for path in f.read().split()] == [
+            "gfs.2025010112.f001",
+            "gfs.2025010106.f008",
+        ], "Wrong list of files"
@@ -0,0 +1,166 @@
+import errno
+import os
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from StofsWorkflow import product_cache
+from StofsWorkflow.product_cache import (
+    ProductCache,
+    build_products,
+    command_builder,
+    read_product_list,
+)
+from StofsWorkflow.stofs_logger import setup_stofs_logging
+
+setup_stofs_logging()
+
+
+def counting_builder(builds: list[str], delay: float = 0.0) -> Callable[[str], None]:
+    """
+    Get a builder which writes the product and records each build.
+    """
+    lock = threading.Lock()
+
+    def build(destination: str) -> None:
+        with lock:
+            builds.append(destination)
+        time.sleep(delay)
+        with open(destination, "w") as f:
+            f.write("subset")
+
+    return build
+
+
+def test_produce_builds_once(tmp_path: str) -> None:
+    """
+    Test that a product is built once for tasks which ask for it at the same
+    time, that links to the same source share the product, and that the copy
+    each task gets is its own.
+    """
+    tmp_path = str(tmp_path)
+    source = os.path.join(tmp_path, "rtofs_glo_2ds_n001.nc")
+    with open(source, "w") as f:
+        f.write("rtofs")
+    links = []
+    for builder in ("dir_3d_th", "dir_nudge"):
+        os.makedirs(os.path.join(tmp_path, builder))
+        links.append(os.path.join(tmp_path, builder, "RTOFS_2D_000.nc"))
+        os.symlink(source, links[-1])
+
+    cache = ProductCache(os.path.join(tmp_path, "cache"))
+    recipe = ["ncks -d X,2805,2923"]
+    keys = [cache.key([link], recipe) for link in links]
+    assert keys[0] == keys[1], "Links to the same source have different keys"
+
+    builds = []
+    build = counting_builder(builds, delay=0.5)
+    destinations = [os.path.join(os.path.dirname(link), "ssh.nc") for link in links]
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        hits = list(
+            pool.map(
+                lambda destination: cache.produce(keys[0], destination, build),
+                destinations,
+            )
+        )
+    assert len(builds) == 1, "Product was built more than once"
+    assert sorted(hits) == [False, True], "Waiting task did not take the product"
+
+    with open(destinations[0], "a") as f:
+        f.write(" edited")
+    with open(destinations[1]) as f:
+        assert f.read() == "subset", "Tasks share the same copy of the product"
+    with open(cache.entry(keys[0])) as f:
+        assert f.read() == "subset", "Editing a product changed the cache"
+
+
+def test_produce_without_flock(tmp_path: str, monkeypatch: pytest.MonkeyPatch) -> None:
+    """
+    Test that a product is still built and stored on a file system which does
+    not support flock.
+    """
+    tmp_path = str(tmp_path)
+    source = os.path.join(tmp_path, "source.nc")
+    with open(source, "w") as f:
+        f.write("rtofs")
+
+    def no_flock(fd: int, operation: int) -> None:
+        raise OSError(errno.ENOLCK, "No locks available")
+
+    monkeypatch.setattr(product_cache.fcntl, "flock", no_flock)
+    cache = ProductCache(os.path.join(tmp_path, "cache"))
+    key = cache.key([source], ["subset"])
+    builds = []
+    destination = os.path.join(tmp_path, "subset.nc")
+    assert not cache.produce(key, destination, counting_builder(builds)), (
+        "Product was not built"
+    )
+    assert os.path.exists(cache.entry(key)), "Product was not stored"
+    assert cache.produce(key, destination, counting_builder(builds)), (
+        "Stored product was not fetched"
+    )
+    assert len(builds) == 1, "Stored product was built again"
+
+
+def test_build_products_from_a_list(tmp_path: str) -> None:
+    """
+    Test that the products of a list are built by one command with their
+    source files, that every product is attempted when one fails, and that
+    the products built are taken from the cache the next time.
+    """
+    tmp_path = str(tmp_path)
+    sources = []
+    for hour in (1, 2):
+        sources.append(os.path.join(tmp_path, f"gfs.t12z.pgrb2.0p25.f00{hour}"))
+        with open(sources[-1], "w") as f:
+            f.write(f"hour {hour}")
+    list_file = os.path.join(tmp_path, "sflux.list")
+    with open(list_file, "w") as f:
+        for hour, source in enumerate(sources, start=1):
+            f.write(f"{tmp_path}/sflux_{hour}.nc {source}\n")
+        f.write(f"{tmp_path}/sflux_3.nc {tmp_path}/missing\n")
+
+    cache = ProductCache(os.path.join(tmp_path, "cache"))
+    products = read_product_list(list_file)
+    recipe = ["cp {source} {output}"]
+
+    def build(product_sources: list[str], destination: str) -> None:
+        command_builder(recipe[0], product_sources)(destination)
+
+    with pytest.raises(RuntimeError, match="1 of 3 products were not made"):
+        build_products(cache, products, recipe, build, workers=2)
+    for hour in (1, 2):
+        with open(os.path.join(tmp_path, f"sflux_{hour}.nc")) as f:
+            assert f.read() == f"hour {hour}", "Product was not built from its source"
+        os.unlink(os.path.join(tmp_path, f"sflux_{hour}.nc"))
+
+    del products[f"{tmp_path}/sflux_3.nc"]
+    hits = build_products(cache, products, recipe, build, workers=2)
+    assert all(hits.values()), "Built products were not taken from the cache"
+
+
+def test_produce_links_read_only_products(tmp_path: str) -> None:
+    """
+    Test that a product which is only read is linked into and out of the
+    cache rather than copied.
+    """
+    tmp_path = str(tmp_path)
+    source = os.path.join(tmp_path, "rtofs_glo_3dz_f006_6hrly_hvr_US_east.nc")
+    with open(source, "w") as f:
+        f.write("rtofs")
+    cache = ProductCache(os.path.join(tmp_path, "cache"))
+    key = cache.key([source], ["union subset"])
+
+    builds = []
+    destinations = [
+        os.path.join(tmp_path, builder, "merged_RTOFS_3D_union.nc")
+        for builder in ("dir_3d_th", "dir_nudge")
+    ]
+    for destination in destinations:
+        cache.produce(key, destination, counting_builder(builds), link=True)
+    assert len(builds) == 1, "Product was built more than once"
+    inodes = {os.stat(path).st_ino for path in [*destinations, cache.entry(key)]}
+    assert len(inodes) == 1, "Product was copied instead of linked"
@@ -0,0 +1,109 @@
+import os
+
+import pytest
+import yaml
+
+from StofsWorkflow.publisher import Manifest, Product, Publisher, publish_manifest
+from StofsWorkflow.stofs_logger import setup_stofs_logging
+
+setup_stofs_logging()
+
+
+def write_file(path: str, content: bytes) -> str:
+    """
+    Write a file for the tests.
+    """
+    with open(path, "wb") as f:
+        f.write(content)
+    return path
+
+
+def test_publish_verifies_and_renames(tmp_path: str) -> None:
+    """
+    Test that products are copied into place under their names without
+    sharing a file with their source, with no temporary files left behind,
+    and that their alerts are sent.
+    """
+    tmp_path = str(tmp_path)
+    outputs = os.path.join(tmp_path, "outputs")
+    comout = os.path.join(tmp_path, "com")
+    os.makedirs(outputs)
+    write_file(os.path.join(outputs, "out2d_1.nc"), b"\x89HDF\r\n\x1a\n" + bytes(64))
+    write_file(os.path.join(outputs, "staout_1"), b"1.0 2.0\n")
+    alerts = os.path.join(tmp_path, "alerts")
+
+    manifest_file = os.path.join(tmp_path, "manifest.yaml")
+    with open(manifest_file, "w") as f:
+        yaml.dump(
+            {
+                "directory": comout,
+                "alert_command": f"bash -c 'echo $0 $1 >> {alerts}' {{alert}} {{destination}}",
+                "products": [
+                    {
+                        "source": os.path.join(outputs, "out2d_*.nc"),
+                        "alert": "STOFS_NETCDF",
+                    },
+                    {
+                        "source": os.path.join(outputs, "staout_1"),
+                        "name": "stofs_3d_atl.t12z.staout_1",
+                        "min_size": 4,
+                    },
+                ],
+            },
+            f,
+        )
+    results = publish_manifest(manifest_file)
+
+    assert sorted(os.listdir(comout)) == [
+        "out2d_1.nc",
+        "stofs_3d_atl.t12z.staout_1",
+    ], "Wrong products or temporary files left in COMOUT"
+    for result in results:
+        assert result.method in ("reflink", "copy"), "Product was hard linked"
+        assert os.stat(result.destination).st_ino != os.stat(result.source).st_ino, (
+            "Product shares its file with the source"
+        )
+    with open(os.path.join(comout, "stofs_3d_atl.t12z.staout_1"), "rb") as f:
+        assert f.read() == b"1.0 2.0\n", "Product was not copied intact"
+    with open(alerts) as f:
+        assert f.read().split() == [
+            "STOFS_NETCDF",
+            os.path.join(comout, "out2d_1.nc"),
+        ], "Wrong alerts sent"
+
+
+def test_publish_rejects_invalid_products(tmp_path: str) -> None:
+    """
+    Test that every product is attempted, that invalid required products fail
+    the run without reaching their destination, and that products which are
+    not required are skipped when missing, too small or without a header.
+    """
+    tmp_path = str(tmp_path)
+    comout = os.path.join(tmp_path, "com")
+    good = write_file(os.path.join(tmp_path, "good.txt"), b"complete")
+    small = write_file(os.path.join(tmp_path, "small.txt"), b"x")
+    truncated = write_file(os.path.join(tmp_path, "truncated.nc"), b"partial")
+    manifest = Manifest(
+        products=[
+            Product.from_dict(product, comout)
+            for product in (
+                {"source": small, "min_size": 4},
+                {"source": truncated},
+                {"source": good},
+                {
+                    "source": small,
+                    "name": "optional.txt",
+                    "min_size": 4,
+                    "required": False,
+                },
+                {"source": os.path.join(tmp_path, "missing.nc"), "required": False},
+                {"source": truncated, "name": "optional.nc", "required": False},
+            )
+        ]
+    )
+
+    with pytest.raises(RuntimeError, match="2 of 6 files were not published") as e:
+        Publisher(manifest).publish()
+    assert "smaller than the minimum" in str(e.value), "Size was not checked"
+    assert "NetCDF header" in str(e.value), "Header was not checked"
+    assert os.listdir(comout) == ["good.txt"], "Invalid products were published"
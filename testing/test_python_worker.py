@@ -0,0 +1,64 @@
+import os
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from StofsWorkflow.python_worker import PythonWorkerPool, run_entry_point
+from StofsWorkflow.stofs_logger import setup_stofs_logging
+
+setup_stofs_logging()
+
+
+def test_run_entry_point(tmp_path: str) -> None:
+    """
+    Test that the result and resources of a call are returned and its output
+    is written to the log file.
+    """
+    log_file = os.path.join(str(tmp_path), "logs", "echo.log")
+    outcome = run_entry_point("os:system", log_file, args=["echo hello"])
+    assert outcome["exit_code"] == 0, "Call did not succeed"
+    assert outcome["worker_max_rss_kb"] > 0, "Worker peak memory was not recorded"
+    with open(log_file) as f:
+        assert "hello\n" in f.read(), "Output is not in the log file"
+
+    outcome = run_entry_point("sys:exit", log_file, args=[4])
+    assert outcome["exit_code"] == 4, "sys.exit code was not returned"
+
+
+def test_pool_restarts_after_worker_dies(tmp_path: str) -> None:
+    """
+    Test that a worker which dies fails only its own call, and that the next
+    calls run on a new pool.
+    """
+    pool = PythonWorkerPool(1, [], [])
+    try:
+        pool.warm()
+        future = pool.submit("os:_exit", os.path.join(str(tmp_path), "a.log"), args=[1])
+        with pytest.raises(BrokenProcessPool):
+            future.result()
+
+        outcome = pool.submit(
+            "os:getpid", os.path.join(str(tmp_path), "b.log")
+        ).result()
+        assert outcome["exit_code"] == 0, "Pool was not restarted"
+    finally:
+        pool.shutdown()
+
+
+def test_pool_limits_worker_threads(tmp_path: str) -> None:
+    """
+    Test that the workers' thread pools are limited when they start, unless
+    the variable was already exported.
+    """
+    if "OPENBLAS_NUM_THREADS" in os.environ:
+        pytest.skip("OPENBLAS_NUM_THREADS is exported")
+    pool = PythonWorkerPool(1, [], [], threads=3)
+    try:
+        outcome = pool.submit(
+            "os:getenv",
+            os.path.join(str(tmp_path), "getenv.log"),
+            args=["OPENBLAS_NUM_THREADS"],
+        ).result()
+        assert outcome["result"] == "3", "Worker threads were not limited"
+    finally:
+        pool.shutdown()
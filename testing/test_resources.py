@@ -0,0 +1,147 @@
+import os
+
+import pytest
+import yaml
+
+from StofsWorkflow.model_factory import model_factory
+from StofsWorkflow.resources import (
+    NodeCapacity,
+    ResourcePool,
+    ResourceRequest,
+    parse_memory,
+    parse_size,
+    thread_environment,
+)
+from StofsWorkflow.stofs_config import StofsConfig
+from StofsWorkflow.stofs_logger import setup_stofs_logging
+from StofsWorkflow.stofs_run_options import StofsRunOptions
+
+setup_stofs_logging()
+
+
+def test_parse_memory() -> None:
+    """
+    Test that memory sizes are converted to megabytes.
+    """
+    assert parse_memory("512M") == 512.0, "Megabytes were not kept"
+    assert parse_memory("2GB") == 2048.0, "Gigabytes were not converted"
+    assert parse_memory(100) == 100.0, "Numbers are not megabytes"
+    with pytest.raises(ValueError, match="Invalid memory size"):
+        parse_memory("lots")
+
+
+def test_parse_size() -> None:
+    """
+    Test that file sizes are converted to bytes, with decimal units.
+    """
+    assert parse_size(2000000) == 2000000, "Numbers are not bytes"
+    assert parse_size("500M") == 500000000, "Megabytes are not decimal"
+    assert parse_size("1.5KB") == 1500, "Kilobytes were not converted"
+    with pytest.raises(ValueError, match="Invalid file size"):
+        parse_size("big")
+
+
+def test_resource_pool_packing() -> None:
+    """
+    Test that tasks start only while their cores, memory and I/O slots fit,
+    and that a task larger than the node runs alone.
+    """
+    pool = ResourcePool(NodeCapacity(cores=4, memory_mb=1000.0, io_slots={"nco": 2}))
+    big = ResourceRequest(cores=3, memory_mb=100.0)
+    assert pool.try_acquire(big), "First task did not start"
+    assert not pool.try_acquire(ResourceRequest(cores=2)), "Cores oversubscribed"
+    small = ResourceRequest(cores=1, memory_mb=100.0)
+    assert pool.try_acquire(small), "Task which fits did not start"
+    pool.release(big)
+    pool.release(small)
+
+    hungry = ResourceRequest(cores=1, memory_mb=900.0)
+    assert pool.try_acquire(hungry), "Task did not start on an empty node"
+    assert not pool.try_acquire(ResourceRequest(memory_mb=200.0)), (
+        "Memory oversubscribed"
+    )
+    pool.release(hungry)
+
+    nco = ResourceRequest(cores=1, io_class="nco")
+    assert pool.try_acquire(nco), "First I/O task did not start"
+    assert pool.try_acquire(nco), "Second I/O slot was not used"
+    assert not pool.try_acquire(nco), "I/O slots oversubscribed"
+    assert pool.try_acquire(ResourceRequest(cores=1, io_class="other")), (
+        "I/O classes share their slots"
+    )
+    for _ in range(2):
+        pool.release(nco)
+    pool.release(ResourceRequest(cores=1, io_class="other"))
+
+    huge = ResourceRequest(cores=16)
+    assert pool.try_acquire(huge), "Task larger than the node never starts"
+    assert not pool.try_acquire(ResourceRequest()), "Task started beside a huge one"
+
+
+def test_thread_environment_keeps_exported(monkeypatch: pytest.MonkeyPatch) -> None:
+    """
+    Test that thread variables exported before the workflow starts are kept.
+    """
+    monkeypatch.setenv("OMP_NUM_THREADS", "7")
+    monkeypatch.delenv("MKL_NUM_THREADS", raising=False)
+    environment = thread_environment(2)
+    assert environment["OMP_NUM_THREADS"] == "7", "Exported value was overwritten"
+    assert environment["MKL_NUM_THREADS"] == "2", "Unset variable was not limited"
+
+
+def test_threads_only_for_declared_cores(
+    tmp_path: str, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """
+    Test that the thread variables of a script are only set when its task
+    declares cores, to the task's cores shared between its scripts.
+    """
+    monkeypatch.delenv("OMP_NUM_THREADS", raising=False)
+    scripts = os.path.join(str(tmp_path), "scripts")
+    os.makedirs(scripts)
+    for name in ("a.sh", "b.sh"):
+        path = os.path.join(scripts, name)
+        with open(path, "w") as f:
+            f.write(
+                "#!/bin/bash\n"
+                f'echo "$1 ${{OMP_NUM_THREADS:-unset}}" >> {tmp_path}/threads\n'
+            )
+        os.chmod(path, 0o755)
+
+    config_file = os.path.join(str(tmp_path), "config.yaml")
+    with open(config_file, "w") as f:
+        yaml.dump(
+            {
+                "type": "SCHISM",
+                "name": "test-threads",
+                "version": "1.0",
+                "script_directory": scripts,
+                "state_directory": os.path.join(str(tmp_path), "state"),
+                "node": {"cores": 8},
+                "tasks": {
+                    "declared": {
+                        "stage": "post",
+                        "policy": "mpmd",
+                        "max_concurrent": 2,
+                        "cores": 8,
+                        "scripts": ["a.sh declared", "b.sh declared"],
+                    },
+                    "undeclared": {
+                        "stage": "post",
+                        "depends_on": ["declared"],
+                        "policy": "mpmd",
+                        "scripts": ["a.sh undeclared"],
+                    },
+                },
+            },
+            f,
+        )
+    model_factory(StofsConfig(config_file), StofsRunOptions(cycle="2025010100")).post()
+
+    with open(os.path.join(str(tmp_path), "threads")) as f:
+        lines = sorted(f.read().splitlines())
+    assert lines == [
+        "declared 4",
+        "declared 4",
+        "undeclared unset",
+    ], "Wrong thread limits"
@@ -0,0 +1,94 @@
+import json
+import os
+
+import pytest
+import yaml
+
+from StofsWorkflow.model_factory import model_factory
+from StofsWorkflow.run_state import RunState
+from StofsWorkflow.script_runner import ScriptError
+from StofsWorkflow.stofs_config import StofsConfig
+from StofsWorkflow.stofs_logger import setup_stofs_logging
+from StofsWorkflow.stofs_run_options import StofsRunOptions
+
+setup_stofs_logging()
+
+
+def write_script(directory: str, name: str, body: str) -> None:
+    """
+    Write an executable bash script for the tests.
+    """
+    path = os.path.join(directory, name)
+    with open(path, "w") as f:
+        f.write(f"#!/bin/bash\n{body}\n")
+    os.chmod(path, 0o755)
+
+
+def test_run_state_resume(tmp_path: str) -> None:
+    """
+    Test that a resumed run state keeps what succeeded and a new one does not.
+    """
+    state = RunState(str(tmp_path), "2025010100", "post")
+    state.start_task("a")
+    state.finish_script("a", 0, "a.sh", 0)
+    state.finish_script("a", 1, "b.sh", 2)
+    state.finish_task("a", 2)
+    state.start_task("b")
+    state.finish_task("b", 0, ["out.nc"])
+
+    resumed = RunState(str(tmp_path), "2025010100", "post", resume=True)
+    assert resumed.is_task_complete("b"), "Completed task was not kept"
+    assert not resumed.is_task_complete("a"), "Failed task counts as complete"
+    assert resumed.is_script_complete("a", 0, "a.sh"), "Completed script was not kept"
+    assert not resumed.is_script_complete("a", 1, "b.sh"), "Failed script is complete"
+    assert not resumed.is_script_complete("a", 0, "b.sh"), "Script matched by index"
+
+    fresh = RunState(str(tmp_path), "2025010100", "post")
+    assert not fresh.is_task_complete("b"), "New run state kept the old run"
+
+
+def test_resume_records_exit_code(tmp_path: str) -> None:
+    """
+    Test that a failed task records the exit code of its script, and that
+    --resume reruns only the scripts which did not succeed.
+    """
+    scripts = os.path.join(str(tmp_path), "scripts")
+    os.makedirs(scripts)
+    counter = os.path.join(str(tmp_path), "counter")
+    write_script(scripts, "first.sh", f"echo run >> {counter}")
+    write_script(scripts, "second.sh", "exit 3")
+
+    config_file = os.path.join(str(tmp_path), "config.yaml")
+    with open(config_file, "w") as f:
+        yaml.dump(
+            {
+                "type": "SCHISM",
+                "name": "test-resume",
+                "version": "1.0",
+                "script_directory": scripts,
+                "state_directory": os.path.join(str(tmp_path), "state"),
+                "tasks": {
+                    "scripts": {"stage": "post", "scripts": ["first.sh", "second.sh"]}
+                },
+            },
+            f,
+        )
+
+    model = model_factory(StofsConfig(config_file), StofsRunOptions(cycle="2025010100"))
+    with pytest.raises(ScriptError, match="return code 3") as error:
+        model.post()
+    assert error.value.exit_code() == 3, "Exit code is not carried on the error"
+
+    state_file = os.path.join(str(tmp_path), "state", "runs", "2025010100", "post.json")
+    with open(state_file) as f:
+        task_state = json.load(f)["tasks"]["scripts"]
+    assert task_state["status"] == RunState.STATUS_FAILED, "Task is not failed"
+    assert task_state["exit_code"] == 3, "Task exit code is not that of the script"
+
+    write_script(scripts, "second.sh", "exit 0")
+    model = model_factory(
+        StofsConfig(config_file), StofsRunOptions(cycle="2025010100", resume=True)
+    )
+    model.post()
+    with open(counter) as f:
+        assert len(f.readlines()) == 1, "Completed script was run again on resume"
@@ -0,0 +1,67 @@
+import os
+
+import pytest
+
+from StofsWorkflow.scratch import ScratchArea, ScratchSettings
+from StofsWorkflow.stofs_logger import setup_stofs_logging
+
+setup_stofs_logging()
+
+
+def test_staged_inputs_are_copies(tmp_path: str) -> None:
+    """
+    Test that a task which edits a staged input in place changes neither the
+    input nor the copy staged for the next task.
+    """
+    tmp_path = str(tmp_path)
+    grid = os.path.join(tmp_path, "hgrid.nc")
+    with open(grid, "w") as f:
+        f.write("grid")
+
+    scratch = ScratchArea(
+        ScratchSettings(directory=os.path.join(tmp_path, "scratch")),
+        "2025010100",
+        "post",
+    )
+    first = scratch.stage_inputs("first", [grid], [])
+    with open(os.path.join(first, "hgrid.nc"), "a") as f:
+        f.write(" edited")
+
+    second = scratch.stage_inputs("second", [grid], [])
+    with open(os.path.join(second, "hgrid.nc")) as f:
+        assert f.read() == "grid", "Edit changed the cached input"
+    with open(grid) as f:
+        assert f.read() == "grid", "Edit changed the input"
+    assert scratch.close() == [], "Scratch area did not close cleanly"
+
+
+def test_published_outputs_are_copies(tmp_path: str) -> None:
+    """
+    Test that a published output does not share its file with the copy in
+    scratch, and that outputs with the same file name are rejected.
+    """
+    tmp_path = str(tmp_path)
+    output = os.path.join(tmp_path, "com", "fields.nc")
+    scratch = ScratchArea(
+        ScratchSettings(directory=os.path.join(tmp_path, "scratch"), keep=True),
+        "2025010100",
+        "post",
+    )
+    with pytest.raises(ValueError, match=r"two outputs named fields\.nc"):
+        scratch.stage_inputs(
+            "fields", [], [output, os.path.join(tmp_path, "other", "fields.nc")]
+        )
+
+    work_directory = scratch.stage_inputs("fields", [], [output])
+    local = os.path.join(work_directory, "fields.nc")
+    with open(local, "w") as f:
+        f.write("fields")
+    published = []
+    scratch.publish("fields", [output], on_published=lambda: published.append(1))
+    assert scratch.close() == [], "Output was not published"
+    assert published == [1], "Publication was not reported"
+
+    with open(local, "a") as f:
+        f.write(" edited")
+    with open(output) as f:
+        assert f.read() == "fields", "Published output shares the scratch file"
@@ -0,0 +1,133 @@
+import os
+import signal
+import time
+
+import pytest
+import yaml
+
+from StofsWorkflow.model_factory import model_factory
+from StofsWorkflow.script_runner import ProcessSupervisor, ScriptError
+from StofsWorkflow.stofs_config import StofsConfig
+from StofsWorkflow.stofs_logger import setup_stofs_logging
+from StofsWorkflow.stofs_run_options import StofsRunOptions
+
+setup_stofs_logging()
+
+
+def is_running(pid: int) -> bool:
+    """
+    Check whether a process exists.
+    """
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    return True
+
+
+def test_supervisor_exit_codes(tmp_path: str) -> None:
+    """
+    Test that the exit code of the command is returned and its output is
+    streamed to the log file and kept in the tail.
+    """
+    log_file = os.path.join(str(tmp_path), "logs", "ok.log")
+    supervisor = ProcessSupervisor(
+        ["bash", "-c", "echo out; echo err >&2; exit 3"], log_file
+    )
+    assert supervisor.run() == 3, "Exit code was not returned"
+    assert not supervisor.timed_out(), "Command counted as timed out"
+    assert supervisor.tail() == ["out", "[stderr] err"], "Output is not in the tail"
+    with open(log_file) as f:
+        text = f.read()
+    assert "out\n" in text, "stdout is not in the log file"
+    assert "[stderr] err\n" in text, "stderr is not in the log file"
+
+    supervisor = ProcessSupervisor(["bash", "-c", "kill -KILL $$"], log_file)
+    assert supervisor.run() == -signal.SIGKILL, "Signal is not a negative exit code"
+
+
+def test_supervisor_timeout_kills_process_group(tmp_path: str) -> None:
+    """
+    Test that a command which exceeds its timeout is killed together with the
+    processes it started in the background.
+    """
+    pid_file = os.path.join(str(tmp_path), "child.pid")
+    supervisor = ProcessSupervisor(
+        ["bash", "-c", f"sleep 60 & echo $! > {pid_file}; wait"],
+        os.path.join(str(tmp_path), "timeout.log"),
+        timeout=0.5,
+    )
+    start_time = time.monotonic()
+    exit_code = supervisor.run()
+    assert time.monotonic() - start_time < 10, "Command was not killed at its timeout"
+    assert supervisor.timed_out(), "Command was not reported as timed out"
+    assert exit_code == -signal.SIGTERM, "Command was not terminated"
+
+    with open(pid_file) as f:
+        child = int(f.read())
+    for _ in range(50):
+        if not is_running(child):
+            break
+        time.sleep(0.1)
+    assert not is_running(child), "Background child survived the timeout"
+
+
+def test_task_timeout_and_retries(tmp_path: str) -> None:
+    """
+    Test that a script is retried after failing and that a script which keeps
+    timing out fails the task with the exit code of the kill.
+    """
+    scripts = os.path.join(str(tmp_path), "scripts")
+    os.makedirs(scripts)
+    marker = os.path.join(str(tmp_path), "failed_once")
+    for name, body in (
+        ("flaky.sh", f"[ -e {marker} ] && exit 0; touch {marker}; exit 1"),
+        ("hang.sh", "sleep 60"),
+    ):
+        path = os.path.join(scripts, name)
+        with open(path, "w") as f:
+            f.write(f"#!/bin/bash\n{body}\n")
+        os.chmod(path, 0o755)
+
+    config_file = os.path.join(str(tmp_path), "config.yaml")
+    state_directory = os.path.join(str(tmp_path), "state")
+    with open(config_file, "w") as f:
+        yaml.dump(
+            {
+                "type": "SCHISM",
+                "name": "test-retries",
+                "version": "1.0",
+                "script_directory": scripts,
+                "state_directory": state_directory,
+                "tasks": {
+                    "flaky": {
+                        "stage": "post",
+                        "scripts": ["flaky.sh"],
+                        "retries": 1,
+                        "retry_backoff": 0,
+                    },
+                    "hang": {
+                        "stage": "forecast",
+                        "scripts": ["hang.sh"],
+                        "timeout": 0.5,
+                        "retries": 1,
+                        "retry_backoff": 0,
+                    },
+                },
+            },
+            f,
+        )
+
+    model = model_factory(StofsConfig(config_file), StofsRunOptions(cycle="2025010100"))
+    model.post()
+    assert os.path.exists(marker), "Flaky script did not run"
+
+    with pytest.raises(ScriptError) as error:
+        model.run_forecast()
+    assert error.value.exit_code() == -signal.SIGTERM, "Wrong exit code for timeout"
+
+    log_file = os.path.join(
+        state_directory, "logs", "2025010100", "flaky.0.flaky.sh.log"
+    )
+    with open(log_file) as f:
+        assert f.read().count("==== ") == 2, "Both attempts are not in the log file"
@@ -0,0 +1,143 @@
+import json
+import os
+
+import pytest
+import yaml
+
+from StofsWorkflow.model_factory import model_factory
+from StofsWorkflow.stofs_config import StofsConfig
+from StofsWorkflow.stofs_logger import setup_stofs_logging
+from StofsWorkflow.stofs_run_options import StofsRunOptions
+
+setup_stofs_logging()
+
+# The stand-ins for the SLURM commands
+FAKE_SLURM = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_slurm")
+
+
+def write_script(directory: str, name: str, body: str) -> None:
+    """
+    Write an executable bash script for the tests.
+    """
+    path = os.path.join(directory, name)
+    with open(path, "w") as f:
+        f.write(f"#!/bin/bash\n{body}\n")
+    os.chmod(path, 0o755)
+
+
+def make_config(tmp_path: str, monkeypatch: pytest.MonkeyPatch) -> str:
+    """
+    Write a configuration with an array task and a task which depends on it,
+    both run through the stand-in SLURM commands.
+    """
+    fake_directory = os.path.join(tmp_path, "slurm")
+    os.makedirs(fake_directory)
+    monkeypatch.setenv("FAKE_SLURM_DIR", fake_directory)
+
+    scripts = os.path.join(tmp_path, "scripts")
+    os.makedirs(scripts)
+    runs = os.path.join(tmp_path, "runs")
+    write_script(scripts, "one.sh", f"echo 1 >> {runs}")
+    write_script(scripts, "two.sh", f"echo 2 >> {runs}")
+    write_script(
+        scripts, "flaky.sh", f"[ -e {tmp_path}/fixed ] || exit 5; echo 3 >> {runs}"
+    )
+    write_script(scripts, "after.sh", f"echo after >> {runs}")
+
+    config_file = os.path.join(tmp_path, "config.yaml")
+    with open(config_file, "w") as f:
+        yaml.dump(
+            {
+                "type": "SCHISM",
+                "name": "test-slurm",
+                "version": "1.0",
+                "script_directory": scripts,
+                "state_directory": os.path.join(tmp_path, "state"),
+                "backend": "slurm",
+                "slurm": {
+                    command: os.path.join(FAKE_SLURM, command)
+                    for command in ("sbatch", "squeue", "sacct", "scancel")
+                }
+                | {"poll_interval": 0.1},
+                "tasks": {
+                    "array": {
+                        "stage": "post",
+                        "policy": "parallel",
+                        "max_concurrent": 2,
+                        "scripts": ["one.sh", "two.sh", "flaky.sh"],
+                    },
+                    "after": {
+                        "stage": "post",
+                        "depends_on": ["array"],
+                        "scripts": ["after.sh"],
+                    },
+                },
+            },
+            f,
+        )
+    return config_file
+
+
+def submitted(tmp_path: str) -> list[list[str]]:
+    """
+    Get the sbatch command lines, in the order they were run.
+    """
+    with open(os.path.join(tmp_path, "slurm", "sbatch.log")) as f:
+        return [json.loads(line) for line in f]
+
+
+def runs(tmp_path: str) -> list[str]:
+    """
+    Get the steps which ran, in order.
+    """
+    with open(os.path.join(tmp_path, "runs")) as f:
+        return f.read().split()
+
+
+def test_slurm_array_and_afterok(
+    tmp_path: str, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """
+    Test that a parallel task is submitted as a job array and the task which
+    depends on it with an afterok dependency, and that finished jobs which
+    squeue still lists are not waited for.
+    """
+    tmp_path = str(tmp_path)
+    config_file = make_config(tmp_path, monkeypatch)
+    open(os.path.join(tmp_path, "fixed"), "w").close()
+
+    model = model_factory(StofsConfig(config_file), StofsRunOptions(cycle="2025010100"))
+    model.post()
+
+    array_job, after_job = submitted(tmp_path)
+    assert "--array=0,1,2%2" in array_job, "Task was not submitted as an array"
+    assert "--dependency=afterok:1000" in after_job, "Dependency is not afterok"
+    assert runs(tmp_path) == ["1", "2", "3", "after"], "Wrong steps ran"
+
+
+def test_slurm_failed_dependency_and_resume(
+    tmp_path: str, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """
+    Test that a job whose dependency failed does not run, and that a resumed
+    run submits only the steps which did not succeed.
+    """
+    tmp_path = str(tmp_path)
+    config_file = make_config(tmp_path, monkeypatch)
+
+    model = model_factory(StofsConfig(config_file), StofsRunOptions(cycle="2025010100"))
+    with pytest.raises(RuntimeError, match="Tasks failed: array, after"):
+        model.post()
+    assert runs(tmp_path) == ["1", "2"], "Task ran after its dependency failed"
+
+    open(os.path.join(tmp_path, "fixed"), "w").close()
+    model = model_factory(
+        StofsConfig(config_file), StofsRunOptions(cycle="2025010100", resume=True)
+    )
+    model.post()
+    array_job, after_job = submitted(tmp_path)[2:]
+    assert not any(arg.startswith("--array") for arg in array_job), (
+        "Single remaining step was submitted as an array"
+    )
+    assert "--dependency=afterok:1002" in after_job, "Resumed dependency is wrong"
+    assert runs(tmp_path) == ["1", "2", "3", "after"], "Completed steps ran again"
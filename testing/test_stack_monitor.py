@@ -0,0 +1,75 @@
+import os
+
+import pytest
+import yaml
+
+from StofsWorkflow.stack_monitor import StackMonitor, StackSettings
+from StofsWorkflow.stofs_config import StofsConfig
+from StofsWorkflow.stofs_logger import setup_stofs_logging
+
+setup_stofs_logging()
+
+
+def write_stack(directory: str, stack: int) -> None:
+    """
+    Write a stack file with a NetCDF-4 header.
+    """
+    with open(os.path.join(directory, f"out2d_{stack}.nc"), "wb") as f:
+        f.write(b"\x89HDF\r\n\x1a\n" + bytes(64))
+
+
+def test_stack_complete_when_next_appears(tmp_path: str) -> None:
+    """
+    Test that a stack is complete once the next stack appears, and that a
+    file which has stopped growing is only complete when a settle time is set.
+    """
+    directory = str(tmp_path)
+    write_stack(directory, 1)
+    write_stack(directory, 2)
+
+    settings = StackSettings(
+        directory=directory,
+        files=["out2d_{stack}.nc"],
+        count=2,
+        poll_interval=0.05,
+        timeout=0.5,
+    )
+    stacks = []
+    with pytest.raises(TimeoutError, match="Stack 2"):
+        stacks.extend(StackMonitor(settings).stacks())
+    assert stacks == [1], "Last stack was complete without being closed"
+
+    settings.settle_time = 0.0
+    stacks = list(StackMonitor(settings).stacks())
+    assert stacks == [1, 2], "Stable stack was not complete with a settle time"
+
+
+def test_per_stack_tasks_need_an_end(tmp_path: str) -> None:
+    """
+    Test that per-stack tasks are rejected when the stacks have no count and
+    there are no completion criteria.
+    """
+    config_file = os.path.join(str(tmp_path), "config.yaml")
+    config = {
+        "type": "SCHISM",
+        "name": "test-stacks",
+        "version": "1.0",
+        "script_directory": str(tmp_path),
+        "stacks": {"directory": str(tmp_path), "files": ["out2d_{stack}.nc"]},
+        "tasks": {"slab": {"stage": "post", "per_stack": True, "scripts": ["slab.sh"]}},
+    }
+    with open(config_file, "w") as f:
+        yaml.dump(config, f)
+    with pytest.raises(ValueError, match="no count"):
+        StofsConfig(config_file)
+
+    config["stacks"]["count"] = 4
+    with open(config_file, "w") as f:
+        yaml.dump(config, f)
+    assert StofsConfig(config_file).stacks.count == 4, "Stack count was not read"
+
+    config["stacks"]["stage"] = "forecast"
+    with open(config_file, "w") as f:
+        yaml.dump(config, f)
+    with pytest.raises(ValueError, match="no stacks are configured"):
+        StofsConfig(config_file)
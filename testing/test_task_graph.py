@@ -0,0 +1,148 @@
+import threading
+import time
+
+import pytest
+
+from StofsWorkflow.execution_policy import ExecutionMode
+from StofsWorkflow.perf_database import PerfDatabase
+from StofsWorkflow.stofs_logger import setup_stofs_logging
+from StofsWorkflow.stofs_task import StofsTask
+from StofsWorkflow.task_graph import TaskGraph
+from StofsWorkflow.task_history import TaskHistory
+
+setup_stofs_logging()
+
+
+def make_task(name: str, depends_on: list[str]) -> StofsTask:
+    """
+    Make a legacy task with dependencies for the graph tests.
+    """
+    return StofsTask(name, ExecutionMode.LEGACY, [], depends_on=depends_on)
+
+
+def test_task_graph_order() -> None:
+    """
+    Test that the dependencies of a task are always run before it.
+    """
+    graph = TaskGraph(
+        [
+            make_task("post", ["forecast", "nowcast"]),
+            make_task("forecast", ["prep"]),
+            make_task("nowcast", ["prep"]),
+            make_task("prep", []),
+        ]
+    )
+    order = [task.name() for task in graph.tasks()]
+    assert order[0] == "prep", "Task without dependencies is not first"
+    assert order[-1] == "post", "Task depending on every other task is not last"
+
+    ran = []
+    lock = threading.Lock()
+
+    def run_task(task: StofsTask) -> None:
+        with lock:
+            for dependency in task.depends_on():
+                assert dependency in ran, f"{task.name()} ran before {dependency}"
+            ran.append(task.name())
+
+    graph.execute(run_task, jobs=4)
+    assert sorted(ran) == sorted(order), "Not every task was run"
+
+
+def test_task_graph_rejects_cycles() -> None:
+    """
+    Test that cycles and unknown dependencies are reported on construction.
+    """
+    with pytest.raises(ValueError, match="cycle involving: a, b"):
+        TaskGraph([make_task("a", ["b"]), make_task("b", ["a"]), make_task("c", [])])
+
+    with pytest.raises(ValueError, match="unknown task"):
+        TaskGraph([make_task("a", ["missing"])])
+
+    with pytest.raises(ValueError, match="more than once"):
+        TaskGraph([make_task("a", []), make_task("a", [])])
+
+
+def test_task_graph_fail_fast() -> None:
+    """
+    Test that no task is started after a failure, that running tasks finish,
+    and that the exception of a single failed task reaches the caller unchanged.
+    """
+    graph = TaskGraph(
+        [
+            make_task("bad", []),
+            make_task("slow", []),
+            make_task("after_bad", ["bad"]),
+            make_task("after_slow", ["slow"]),
+        ]
+    )
+    ran = []
+
+    def run_task(task: StofsTask) -> None:
+        if task.name() == "bad":
+            msg = "missing input"
+            raise FileNotFoundError(msg)
+        if task.name() == "slow":
+            time.sleep(0.2)
+        ran.append(task.name())
+
+    with pytest.raises(FileNotFoundError, match="missing input"):
+        graph.execute(run_task, jobs=2)
+    assert ran == ["slow"], "Tasks were started after the failure"
+
+
+def test_task_graph_several_failures() -> None:
+    """
+    Test that several failures are reported together, chained from the first.
+    """
+    graph = TaskGraph([make_task("a", []), make_task("b", []), make_task("c", ["a"])])
+    barrier = threading.Barrier(2)
+
+    def run_task(task: StofsTask) -> None:
+        barrier.wait(timeout=5)
+        msg = f"{task.name()} is broken"
+        raise ValueError(msg)
+
+    with pytest.raises(RuntimeError, match="Tasks not run: c") as error:
+        graph.execute(run_task, jobs=2)
+    assert isinstance(error.value.__cause__, ValueError), "Failure is not chained"
+
+
+def test_task_graph_priorities() -> None:
+    """
+    Test that the task at the head of the longest chain is dispatched first.
+    """
+    graph = TaskGraph(
+        [
+            make_task("short", []),
+            make_task("head", []),
+            make_task("tail", ["head"]),
+        ]
+    )
+    estimates = {"short": 5.0, "head": 2.0, "tail": 10.0}
+    priority = graph.priorities(estimates)
+    assert priority == {"short": 5.0, "head": 12.0, "tail": 10.0}, "Wrong priorities"
+    assert graph.critical_path(estimates) == ["head", "tail"], "Wrong critical path"
+    assert graph.predict_makespan(estimates, jobs=2) == 12.0, "Wrong makespan"
+
+    ran = []
+    graph.execute(lambda task: ran.append(task.name()), jobs=1, estimates=estimates)
+    assert ran == ["head", "tail", "short"], "Critical path was not run first"
+
+
+def test_task_history_by_model_and_stage(tmp_path: str) -> None:
+    """
+    Test that the durations of tasks with the same name are kept apart by
+    model and by stage.
+    """
+    database = PerfDatabase(str(tmp_path))
+    database.record_task("adcirc", "2025010100", "post", "post", 100.0)
+    database.record_task("schism", "2025010100", "post", "post", 10.0)
+    database.record_task("schism", "2025010100", "prep_forecast", "post", 50.0)
+    database.record_task("schism", "2025010106", "post", "post", 30.0)
+    database.record_task("schism", "2025010112", "post", "post", 99.0, exit_code=1)
+
+    history = TaskHistory(database, "schism", "post")
+    assert history.estimate("post") == 20.0, "History mixes models or stages"
+    assert TaskHistory(database, "other", "post").estimate("post") is None
+    assert history.estimates(["post", "new"]) == {"post": 20.0, "new": 20.0}
@@ -19,6 +19,10 @@ def get_zcor_interp_coefficient(zcor, zinter, kbp):
         -k1[np]: integer, k-level at each node
         -coeff[np]: interpolation coefficient
     '''
+    nvrt=zcor.shape[1]
+    k1=np.full((zcor.shape[0]), np.nan)
+    coeff=np.full((zcor.shape[0]), np.nan)
+
     #surface
     idxs=zinter>=zcor[:,-1]
     k1[idxs]=nvrt-2
@@ -39,8 +43,7 @@ def get_zcor_interp_coefficient(zcor, zinter, kbp):
     return np.array(k1).astype('int'), np.array(coeff)
 
 
-if __name__ == '__main__':
-
+def main(argv=None):
     '''
     Example Usage: python extract_slab_fcst_netcdf4.py --date 2000-01-01-12 --stack 1
     (extract from the 1st stack, *_1.nc)
@@ -72,7 +75,7 @@ if __name__ == '__main__':
     argparser = argparse.ArgumentParser()
     argparser.add_argument('--date', type=datetime.fromisoformat, help='input file date')
     argparser.add_argument('--stack', type=int, required=True)
-    args = argparser.parse_args()
+    args = argparser.parse_args(argv)
 
     # -------------------------- input paramters  ----------------------------------
     # Input (1), command line input: date (e.g., 2000-01-01, yyyy-mm-dd-HH)
@@ -372,3 +375,6 @@ if __name__ == '__main__':
 
     print(f'It took {time()-t0} to interpolate')
 
+
+if __name__ == '__main__':
+    main()
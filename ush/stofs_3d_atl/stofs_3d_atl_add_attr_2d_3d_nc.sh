@@ -128,47 +128,73 @@ ict=${i_cnt_file}
 
 
 # ------------------> archive
+#   When STOFS_CONFIG is set the products are published by "stofs publish",
+#   which copies them to COMOUT in parallel, verifies each copy and renames it
+#   into place before sending its alert. Otherwise they are copied one at a
+#   time with cpreq. Either way files which are missing, smaller than
+#   file_size_cr or (with stofs publish) without a NetCDF header are skipped.
     fn_prefix=${RUN}.${cycle}.fields
 
     list_var=("out2d" "temperature" "salinity" "horizontalVelX" "horizontalVelY" "zCoordinates")
 
-
-    
-    list_file_cnt=(${i_cnt_file})
     list_file_nf_hr=(n001_012 n013_024 f001_012 f013_024 f025_036 f037_048 f049_060 f061_072 f073_084 f085_096)
 
+    file_size_cr=100000000
 
-    cd ${DATA}/outputs
+    let cnt=${i_cnt_file}-1
+    str_n_f_k=${list_file_nf_hr[${cnt}]}
+
+    if [ -n "${STOFS_CONFIG}" ]; then
+      fn_manifest=${DATA}/outputs/publish_fields_${i_cnt_file}.yaml
+      {
+        echo "directory: ${COMOUT}"
+        echo "workers: ${#list_var[@]}"
+        echo "alert_command: '${DBNROOT}/bin/dbn_alert MODEL {alert} ${job} {destination}'"
+        echo "products:"
+        for var_k in ${list_var[@]}
+        do
+           echo "  - source: ${DATA}/outputs/${var_k}_${i_cnt_file}.nc"
+           echo "    name: ${fn_prefix}.${var_k}_${str_n_f_k}.nc"
+           echo "    min_size: ${file_size_cr}"
+           echo "    required: false"
+           if [ ${var_k} = out2d ]; then
+              echo "    alert: STOFS_NETCDF"
+           fi
+        done
+      } > ${fn_manifest}
 
-    file_size_cr=100000000
+      opt_alert=""
+      if [ "$SENDDBN" != YES ]; then
+         opt_alert="--no-alert"
+      fi
 
-    for k_d in ${list_file_cnt[@]}
-    do
-  
-      let cnt=$k_d-1
-      str_n_f_k=${list_file_nf_hr[${cnt}]}
- 
-      for var_k in ${list_var[@]} 
+      stofs publish --manifest ${fn_manifest} ${opt_alert}
+      export err=$?; err_chk
+
+    else
+      cd ${DATA}/outputs
+
+      for var_k in ${list_var[@]}
       do
-         fn_k_src=${var_k}_${k_d}.nc
+         fn_k_src=${var_k}_${i_cnt_file}.nc
          fn_k_std=${fn_prefix}.${var_k}_${str_n_f_k}.nc
 
-         echo $fn_k_src; echo $fn_k_std; echo 
+         echo $fn_k_src; echo $fn_k_std; echo
 
          if [ -f ${fn_k_src} ]; then
             sz_fn_link_src=`wc -c ${fn_k_src} | awk '{print $1}'`
 
             if [ $sz_fn_link_src -ge ${file_size_cr} ]; then
                cpreq -pf ${fn_k_src} ${COMOUT}/${fn_k_std}
-            
-	       if [ $SENDDBN = YES ] && [ ${var_k} = out2d ]; then
+
+               if [ $SENDDBN = YES ] && [ ${var_k} = out2d ]; then
                  $DBNROOT/bin/dbn_alert MODEL STOFS_NETCDF $job ${COMOUT}/${fn_k_std}
                  export err=$?; err_chk
-               fi 
-	    
-	    fi
+               fi
+
+            fi
 
-            echo "${fn_k_std} is created"         
+            echo "${fn_k_std} is created"
 
          else
            echo "${fn_k_src}/${fn_k_std} NOT created or file size is too small"
@@ -176,8 +202,7 @@ ict=${i_cnt_file}
          fi
 
       done
-
-    done
+    fi
 
 
 echo 
@@ -381,67 +381,12 @@ if [[ ${#LIST_fn_final_3d[@]} -ge ${N_min_rtofs_cr} ]] && [[ ${#LIST_fn_final_2d
   echo "N_list_fn_2ds_new= ${#list_fn_2ds_new[@]}"
   echo "N_list_fn_3dz_new= ${#list_fn_3dz_new[@]}"
 
-  list_var_oi='MT,Date,Longitude,Latitude,ssh'
-  for fn_2ds in ${list_fn_2ds_new[@]}
-  do
-
-    echo "begin: ${fn_2ds} ..."	  
-    fn_in=$fn_2ds
-    fn_out=rio_ssh_$fn_in
-    ncks -O -d X,$idx_x1_2ds,$idx_x2_2ds -d Y,$idx_y1_2ds,$idx_y2_2ds -v $list_var_oi  $fn_in  $fn_out   
-
-  done
-
-  list_var_oi='MT,Date,Longitude,Latitude,temperature,salinity,u,v'
-  for fn_3dz  in ${list_fn_3dz_new[@]}
-  do
-    echo "begin: ${fn_3dz} ..."	  
-    fn_in=$fn_3dz
-    fn_out=rio_tsuv_$fn_in
-    ncks -O -d X,$idx_x1_3dz,$idx_x2_3dz -d Y,$idx_y1_3dz,$idx_y2_3dz -v $list_var_oi  $fn_in  $fn_out   
-
-  done
-
-  # merge into correct sequence
-  rm -f merged_RTOFS_*${cycle}*.nc
-
-  fn_merged_2ds=merged_RTOFS_2D_${cycle}.nc
-  list_fn_2D_n_f_rio=`ls rio_ssh_RTOFS_2D_???.nc | sort`
-  ncrcat -C $list_fn_2D_n_f_rio  $fn_merged_2ds
-
-
-  fn_merged_3dz=merged_RTOFS_3D_${cycle}.nc
-  list_fn_3D_n_f_rio=`ls rio_tsuv_RTOFS_3D_???.nc | sort`
-  ncrcat -C $list_fn_3D_n_f_rio  $fn_merged_3dz
-
-
-  fn_SSH_1_nc=SSH_1_${yyyymmdd_today}_${cycle}.nc
-  fn_SSH_1_nc_rtofs_only=SSH_1_rtofs_only.nc
-
-  fn_TSUV_1_nc=TSUV_1_${yyyymmdd_today}_${cycle}.nc
-
-
-  # create schsim SSH_1.nc & TSUV_1.nc
-  rm -f test0?_3Dth_nu.nc
-
-  rm -f ${fn_SSH_1_nc_rtofs_only}
-
-  ncatted -O -a _FillValue,ssh,d,, -a missing_value,ssh,d,, $fn_merged_2ds  test01_3Dth_nu.nc
-  ncap2 -O -s 'where(ssh>10000) ssh=-30000' test01_3Dth_nu.nc test02_3Dth_nu.nc
-  ncatted -O -a _FillValue,ssh,a,f,-30000 -a missing_value,ssh,a,f,-30000 test02_3Dth_nu.nc test03_3Dth_nu.nc
-  ncrename -d MT,time -d X,xlon -d Y,ylat  test03_3Dth_nu.nc
-  ncap2 -O -S $fn_nco_ssh test03_3Dth_nu.nc test04_3Dth_nu.nc
-  
-  ncks -CO -x -v Date,MT,X,Y  test04_3Dth_nu.nc  $fn_SSH_1_nc_rtofs_only  
+  # Subset & merge the RTOFS files into SSH_1_rtofs_only.nc & TSUV_1.nc with the
+  # commands shared by both open boundary builders
+  . ${USHstofs3d}/stofs_3d_atl_subset_rtofs_obc.sh
 
   cp -pf $fn_SSH_1_nc_rtofs_only SSH_1_raw_RTOFS.nc
 
-  rm -f tmp0?_3Dth_nu.nc
-  rm -f $fn_TSUV_1_nc
-  ncrename -d MT,time -d Depth,lev -d X,xlon -d Y,ylat  -v u,water_u -v v,water_v  $fn_merged_3dz  tmp01_3Dth_nu.nc
-  ncap2 -O -S $fn_nco_tsuv  tmp01_3Dth_nu.nc tmp02_3Dth_nu.nc
-  ncks -O -x -v Depth,Date,MT,X,Y tmp02_3Dth_nu.nc  $fn_TSUV_1_nc
-
 
 # --------------------------> SSH_1.nc: combine rtofs_only with ADT 
 
@@ -242,6 +242,31 @@ if [[ ${N_LIST_fn_final_qa_sz} -gt ${N_dim_cr_min_cntList} ]]; then
   echo "N_LIST_fn_final_qa_sz = ${N_LIST_fn_final_qa_sz}"
   echo   
 
+ if [ -n "${STOFS_CONFIG}" ]; then
+   # The subset of a GFS file does not depend on the cycle, so it is kept
+   # in the gfs_sflux cache and made once for all the cycles which read it.
+   # One call makes the subsets of every forecast hour, several at once.
+   fn_list_subset=GFS_voi_rio_0rename.list
+   rm -f ${fn_list_subset}
+
+   let cnt="hr_1st_file-1"
+   for fn_gfs_k in ${LIST_fn_final_qa_sz[@]}
+   do
+     let cnt=$cnt+1
+     str_xxx_cnt=`seq -f "%03g" $cnt 1 $cnt`
+     echo "GFS_voi_rio_0rename_${str_xxx_cnt}.nc $fn_gfs_k" >> ${fn_list_subset}
+   done
+
+   cmd_subset="$WGRIB2 -s {source} | egrep '${list_var_oi}' | $WGRIB2 -i {source} -grib {output}.voi.grb2"
+   cmd_subset+=" && $WGRIB2 {output}.voi.grb2 -small_grib ${LONMIN}:${LONMAX} ${LATMIN}:${LATMAX} {output}.roi.grb2"
+   cmd_subset+=" && $WGRIB2 {output}.roi.grb2 -netcdf {output}"
+   cmd_subset+="; rc=\$?; rm -f {output}.voi.grb2 {output}.roi.grb2; exit \$rc"
+
+   stofs cache build --config ${STOFS_CONFIG} --name gfs_sflux --list ${fn_list_subset} \
+         --workers ${OMP_NUM_THREADS:-1} --command "bash -c \"${cmd_subset}\""  >> $pgmout 2> errfile
+   export err=$?; err_chk
+ fi
+
  let cnt="hr_1st_file-1"
  for fn_gfs_k in ${LIST_fn_final_qa_sz[@]}
  do
@@ -253,16 +278,20 @@ if [[ ${N_LIST_fn_final_qa_sz} -gt ${N_dim_cr_min_cntList} ]]; then
 
 
    fn_varOI=GFS_voi_${str_xxx_cnt}.grb2
+   fn_roi=iGFS_voi_rio_${str_xxx_cnt}.grb2
+   fn_0_rnVar=GFS_voi_rio_0rename_${str_xxx_cnt}.nc
+
+   # With STOFS_CONFIG set the subset was made from the gfs_sflux cache above
+   if [ -z "${STOFS_CONFIG}" ]; then
       $WGRIB2  -s  $fn_gfs_k  | egrep "$list_var_oi" | $WGRIB2  -i  $fn_gfs_k  -grib  $fn_varOI  >> $pgmout 2> errfile
       export err=$?;
 
-   fn_roi=iGFS_voi_rio_${str_xxx_cnt}.grb2
       $WGRIB2  $fn_varOI  -small_grib ${LONMIN}:${LONMAX} ${LATMIN}:${LATMAX} $fn_roi   >> $pgmout 2> errfile
       export err=$?;
 
-   fn_0_rnVar=GFS_voi_rio_0rename_${str_xxx_cnt}.nc
       $WGRIB2  $fn_roi -netcdf $fn_0_rnVar  >> $pgmout 2> errfile
       export err=$?;
+   fi
 
    fn_out=GFS_sflux_no_${str_xxx_cnt}.nc
 
@@ -0,0 +1,77 @@
+#!/bin/bash
+
+##################################################################################
+#  Name: stofs_3d_atl_subset_rtofs_obc.sh                                        #
+#  Sourced by stofs_3d_atl_create_obc_3d_th.sh and                               #
+#  stofs_3d_atl_create_obc_nudge.sh to subset and merge the RTOFS files linked   #
+#  into the builder's directory, list_fn_2ds_new and list_fn_3dz_new, into       #
+#  SSH_1_rtofs_only.nc and TSUV_1_<yyyymmdd>_<cycle>.nc, with the 3D window of   #
+#  the builder, idx_{x1,x2,y1,y2}_3dz.                                           #
+#                                                                                #
+#  Remarks:                                                                      #
+#  With STOFS_CONFIG set, the SSH file and the merged 3D subset over the union   #
+#  of the windows of both builders are made in the rtofs_obc cache: whichever    #
+#  builder asks first makes them, and the other waits and takes them from the    #
+#  cache. Each builder then cuts its own 3D window from the local merged file.   #
+##################################################################################
+
+
+  fn_SSH_1_nc=SSH_1_${yyyymmdd_today}_${cycle}.nc
+  fn_SSH_1_nc_rtofs_only=SSH_1_rtofs_only.nc
+
+  fn_TSUV_1_nc=TSUV_1_${yyyymmdd_today}_${cycle}.nc
+
+  # v6 RTOFS-3D, union of the 3D th [482  600   94  821] and nudge [422  600   94  835] windows
+  idx_x1_3dz_union=422
+  idx_x2_3dz_union=600
+  idx_y1_3dz_union=94
+  idx_y2_3dz_union=835
+
+  # subset & merge the RTOFS files, then create schsim SSH_1.nc & TSUV_1.nc
+  list_var_oi_2ds='MT,Date,Longitude,Latitude,ssh'
+  fn_merged_2ds=merged_RTOFS_2D_${cycle}.nc
+
+  cmd_ssh="for fn_in in ${list_fn_2ds_new[*]}; do ncks -O -d X,$idx_x1_2ds,$idx_x2_2ds -d Y,$idx_y1_2ds,$idx_y2_2ds -v $list_var_oi_2ds \$fn_in rio_ssh_\$fn_in || exit 1; done"
+  cmd_ssh+=" && ncrcat -O -C rio_ssh_RTOFS_2D_???.nc $fn_merged_2ds"
+  cmd_ssh+=" && ncatted -O -a _FillValue,ssh,d,, -a missing_value,ssh,d,, $fn_merged_2ds test01_3Dth_nu.nc"
+  cmd_ssh+=" && ncap2 -O -s 'where(ssh>10000) ssh=-30000' test01_3Dth_nu.nc test02_3Dth_nu.nc"
+  cmd_ssh+=" && ncatted -O -a _FillValue,ssh,a,f,-30000 -a missing_value,ssh,a,f,-30000 test02_3Dth_nu.nc test03_3Dth_nu.nc"
+  cmd_ssh+=" && ncrename -d MT,time -d X,xlon -d Y,ylat test03_3Dth_nu.nc"
+  cmd_ssh+=" && ncap2 -O -S $fn_nco_ssh test03_3Dth_nu.nc test04_3Dth_nu.nc"
+  cmd_ssh+=" && ncks -CO -x -v Date,MT,X,Y test04_3Dth_nu.nc {output}"
+
+  list_var_oi_3dz='MT,Date,Longitude,Latitude,temperature,salinity,u,v'
+  fn_merged_3dz=merged_RTOFS_3D_${cycle}.nc
+  fn_merged_3dz_union=merged_RTOFS_3D_union_${cycle}.nc
+
+  rm -f ${fn_SSH_1_nc_rtofs_only} $fn_TSUV_1_nc $fn_merged_3dz $fn_merged_3dz_union
+
+  if [ -n "${STOFS_CONFIG}" ]; then
+    cmd_3dz="for fn_in in ${list_fn_3dz_new[*]}; do ncks -O -d X,$idx_x1_3dz_union,$idx_x2_3dz_union -d Y,$idx_y1_3dz_union,$idx_y2_3dz_union -v $list_var_oi_3dz \$fn_in rio_tsuv_\$fn_in || exit 1; done"
+    cmd_3dz+=" && ncrcat -O -C rio_tsuv_RTOFS_3D_???.nc {output}"
+
+    stofs cache run --config ${STOFS_CONFIG} --name rtofs_obc --source ${list_fn_2ds_new[@]} \
+          --output ${fn_SSH_1_nc_rtofs_only} --command "bash -c \"${cmd_ssh}\""
+    export err=$?; err_chk
+
+    # The union subset is only read, so it is linked into and out of the cache
+    stofs cache run --config ${STOFS_CONFIG} --name rtofs_obc --source ${list_fn_3dz_new[@]} \
+          --output ${fn_merged_3dz_union} --link --command "bash -c \"${cmd_3dz}\""
+    export err=$?; err_chk
+
+    # The indices of the merged file count from the corner of the union window
+    ncks -O -d X,$((idx_x1_3dz-idx_x1_3dz_union)),$((idx_x2_3dz-idx_x1_3dz_union)) \
+            -d Y,$((idx_y1_3dz-idx_y1_3dz_union)),$((idx_y2_3dz-idx_y1_3dz_union)) \
+            $fn_merged_3dz_union $fn_merged_3dz
+
+  else
+    cmd_3dz="for fn_in in ${list_fn_3dz_new[*]}; do ncks -O -d X,$idx_x1_3dz,$idx_x2_3dz -d Y,$idx_y1_3dz,$idx_y2_3dz -v $list_var_oi_3dz \$fn_in rio_tsuv_\$fn_in || exit 1; done"
+    cmd_3dz+=" && ncrcat -O -C rio_tsuv_RTOFS_3D_???.nc $fn_merged_3dz"
+
+    bash -c "${cmd_ssh//\{output\}/${fn_SSH_1_nc_rtofs_only}}"
+    bash -c "${cmd_3dz}"
+  fi
+
+  ncrename -d MT,time -d Depth,lev -d X,xlon -d Y,ylat -v u,water_u -v v,water_v $fn_merged_3dz tmp01_3Dth_nu.nc
+  ncap2 -O -S $fn_nco_tsuv tmp01_3Dth_nu.nc tmp02_3Dth_nu.nc
+  ncks -O -x -v Depth,Date,MT,X,Y tmp02_3Dth_nu.nc $fn_TSUV_1_nc